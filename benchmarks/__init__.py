@@ -0,0 +1,7 @@
+"""Бенчмарки горячих путей бота.
+
+Запуск из корня репозитория против локальной БД из настроек бота:
+
+    PYTHONPATH=src python -m benchmarks --output bench.json
+    PYTHONPATH=src python -m benchmarks --compare bench.json
+"""
@@ -0,0 +1,102 @@
+import argparse
+import asyncio
+import datetime as dt
+import json
+import platform
+import subprocess
+import sys
+from pathlib import Path
+
+from app import db, utils
+from app.config import settings
+from benchmarks import cases
+from benchmarks.runner import compare, measure
+
+
+def get_revision() -> str | None:
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            capture_output=True,
+            check=True,
+            text=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+async def run(
+        names: list[str] | None,
+        repeat: int,
+        warmup: int,
+) -> dict[str, dict[str, float]]:
+    bot = await cases.setup()
+    try:
+        results = {}
+        for name, benchmark in cases.get_benchmarks(bot).items():
+            if names and not any(pattern in name for pattern in names):
+                continue
+            result = results[name] = await measure(benchmark, repeat, warmup)
+            print(
+                f'{name:<40} median {result["median_us"]:>10.1f} us, '
+                f'p95 {result["p95_us"]:>10.1f} us'
+            )
+        return results
+    finally:
+        await bot.shutdown()
+        await db.async_engine.dispose()
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description='Бенчмарки горячих путей бота.')
+    parser.add_argument(
+        'names',
+        nargs='*',
+        help='Запустить только бенчмарки, имя которых содержит подстроку.',
+    )
+    parser.add_argument(
+        '--repeat', type=int, default=200, help='Количество замеров каждого бенчмарка.'
+    )
+    parser.add_argument(
+        '--warmup', type=int, default=20, help='Количество прогревочных запусков.'
+    )
+    parser.add_argument(
+        '--output', type=Path, help='Файл для сохранения результатов в JSON.'
+    )
+    parser.add_argument(
+        '--compare', type=Path, help='Файл с результатами базовой ревизии.'
+    )
+    parser.add_argument(
+        '--threshold', type=float, default=0.2, help='Допустимый рост медианы, доля.'
+    )
+    args = parser.parse_args()
+
+    if settings.MODE == 'prod':
+        parser.error('Бенчмарки записывают данные в БД и не запускаются с MODE=prod.')
+
+    results = asyncio.run(run(args.names, args.repeat, args.warmup))
+    report = {
+        'revision': get_revision(),
+        'created_at': dt.datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'timetable_in_memory': settings.TIMETABLE_IN_MEMORY,
+        'metro_is_closed': asyncio.run(utils.metro_is_closed()),
+        'results': results,
+    }
+    if args.output:
+        args.output.write_text(json.dumps(report, indent=2, ensure_ascii=False))
+
+    if args.compare:
+        baseline = json.loads(args.compare.read_text())
+        print(f'\nСравнение с ревизией {baseline.get("revision")}:')
+        if regressions := compare(baseline['results'], results, args.threshold):
+            print(
+                f'Медиана выросла больше чем на {args.threshold:.0%}: '
+                f'{", ".join(regressions)}'
+            )
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,137 @@
+"""Бенчмарки горячих путей бота."""
+from pathlib import PurePath
+
+from sqlalchemy import text
+from telegram import User
+from telegram.ext import ExtBot
+
+from app import (
+    bootstrap,
+    cache,
+    commands,
+    db,
+    handlers,
+    keyboards,
+    stations,
+    timetable,
+    users,
+    utils,
+)
+from app.config import settings
+from app.models import Base
+from benchmarks import fakes
+from benchmarks.runner import Benchmark
+
+FROM_STATION_ID = 1
+TO_STATION_ID = 9
+FAVORITE_ROUTES = ((1, 9), (9, 1))
+
+
+async def seed_db() -> None:
+    """Создает таблицы и заполняет их данными из populate_db.sql.
+
+    Команды populate_db.sql не меняют уже существующие строки, поэтому повторный
+    запуск безопасен.
+    """
+    sql_commands_file = PurePath.joinpath(settings.BASE_DIR, 'data', 'populate_db.sql')
+    with open(sql_commands_file) as f:
+        sql_commands = f.read().split('\n\n')
+
+    async with db.async_engine.begin() as connection:
+        await connection.run_sync(Base.metadata.create_all)
+        for command in sql_commands:
+            await connection.execute(text(command))
+
+
+async def setup() -> ExtBot[None]:
+    """Готовит БД и состояние бота так же, как перед обработкой обновлений.
+
+    Returns:
+        Бот, запросы которого к Bot API обрабатываются без обращения к сети.
+    """
+    await seed_db()
+    await bootstrap.bootstrap()
+
+    telegram_user = User(
+        id=fakes.BENCHMARK_USER_ID, first_name='Benchmark', is_bot=False
+    )
+    await users.USERS_BUFFER.ensure(telegram_user)
+    await db.delete_favorites(telegram_user)
+    for from_station_id, to_station_id in FAVORITE_ROUTES:
+        await db.insert_favorite(telegram_user, from_station_id, to_station_id)
+
+    return await fakes.make_bot()
+
+
+def get_benchmarks(bot: ExtBot[None]) -> dict[str, Benchmark]:
+    """Возвращает бенчмарки, где ключом является имя измеряемой функции."""
+    favorites_update = fakes.make_command_update(bot, f'/{commands.FAVORITES}')
+    schedule_update = fakes.make_callback_update(bot, str(TO_STATION_ID))
+
+    async def timetable_next_trains() -> None:
+        if (current_timetable := timetable.get_timetable()) is not None:
+            current_timetable.next_trains(
+                FROM_STATION_ID, TO_STATION_ID, await utils.is_weekend()
+            )
+
+    async def get_text_with_time_to_train() -> None:
+        await handlers.get_text_with_time_to_train(FROM_STATION_ID, TO_STATION_ID)
+
+    async def favorites() -> None:
+        await handlers.favorites(favorites_update, fakes.make_context(bot))
+
+    async def complete_conv() -> None:
+        chat_data = {
+            'command': f'/{commands.SCHEDULE}',
+            'from_station_id': FROM_STATION_ID,
+        }
+        await handlers.complete_conv(
+            schedule_update, fakes.make_context(bot, chat_data)
+        )
+
+    benchmarks: dict[str, Benchmark] = {
+        **get_data_benchmarks(),
+        'handlers.get_text_with_time_to_train': get_text_with_time_to_train,
+        'handlers.favorites': favorites,
+        'handlers.complete_conv': complete_conv,
+    }
+    if (current_timetable := timetable.get_timetable()) is not None:
+        name = type(current_timetable).__name__
+        benchmarks[f'timetable.{name}.next_trains'] = timetable_next_trains
+    return benchmarks
+
+
+def get_data_benchmarks() -> dict[str, Benchmark]:
+    """Возвращает бенчмарки доступа к данным бота, не требующие обновлений."""
+    stations_dict = stations.get_stations_dict()
+
+    async def select_schedule() -> None:
+        await db.select_schedule(FROM_STATION_ID, TO_STATION_ID)
+
+    async def cached_select_schedule() -> None:
+        await cache.SCHEDULE_CACHE.select_schedule(FROM_STATION_ID, TO_STATION_ID)
+
+    async def load_stations_dict() -> None:
+        await stations.load_stations_dict()
+
+    async def get_stations_dict() -> None:
+        stations.get_stations_dict()
+
+    async def build_keyboards() -> None:
+        keyboards.build_keyboards(stations_dict)
+
+    async def is_weekend() -> None:
+        await utils.is_weekend()
+
+    async def metro_is_closed() -> None:
+        await utils.metro_is_closed()
+
+    return {
+        'db.select_schedule': select_schedule,
+        'cache.SCHEDULE_CACHE.select_schedule': cached_select_schedule,
+        'stations.load_stations_dict': load_stations_dict,
+        'stations.get_stations_dict': get_stations_dict,
+        'keyboards.build_keyboards': build_keyboards,
+        'utils.is_weekend': is_weekend,
+        'utils.metro_is_closed': metro_is_closed,
+    }
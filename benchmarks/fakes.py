@@ -0,0 +1,248 @@
+"""Поддельные объекты Telegram для вызова обработчиков бота без Bot API.
+
+FakeBotApiRequest используют тесты и бенчмарки, а FakeBotApiServer отвечает так же
+по HTTP при нагрузочном тестировании.
+"""
+import asyncio
+import json
+import socket
+import threading
+import types
+import typing as t
+from collections import Counter
+
+import tornado.httpserver
+import tornado.netutil
+import tornado.web
+from telegram import Update
+from telegram.ext import ExtBot
+from telegram.request import BaseRequest, RequestData
+
+BOT_USER = {
+    'id': 1,
+    'is_bot': True,
+    'first_name': 'Next train',
+    'username': 'next_train_bot',
+}
+BENCHMARK_USER_ID = 900_000_001
+
+
+class FakeBotApiRequest(BaseRequest):
+    """Отвечает на запросы к Bot API без обращения к сети и сохраняет вызовы.
+
+    Ответ можно задержать на latency секунд, чтобы имитировать сетевую задержку до
+    Bot API при нагрузочном тестировании.
+
+    Attributes:
+        calls: Вызванные методы Bot API с параметрами запроса в порядке вызова.
+    """
+
+    def __init__(self, latency: float = 0) -> None:
+        self._latency = latency
+        self.calls: list[tuple[str, dict[str, t.Any]]] = []
+
+    async def initialize(self) -> None:
+        pass
+
+    async def shutdown(self) -> None:
+        pass
+
+    def count_calls(self) -> dict[str, int]:
+        """Возвращает количество вызовов каждого метода Bot API."""
+        return dict(Counter(endpoint for endpoint, _ in self.calls))
+
+    async def do_request(
+            self, url, method, request_data: RequestData | None = None, *args, **kwargs
+    ):
+        endpoint = url.rsplit('/', 1)[-1]
+        parameters = request_data.parameters if request_data else {}
+        return 200, await self.answer(endpoint, parameters)
+
+    async def answer(self, endpoint: str, parameters: dict[str, t.Any]) -> bytes:
+        """Сохраняет вызов метода Bot API и возвращает тело ответа в JSON."""
+        self.calls.append((endpoint, parameters))
+        if self._latency:
+            await asyncio.sleep(self._latency)
+
+        if endpoint == 'getMe':
+            result: t.Any = BOT_USER
+        elif endpoint in ('sendMessage', 'editMessageText', 'sendDocument'):
+            result = {
+                'message_id': len(self.calls),
+                'date': 0,
+                'chat': {'id': parameters.get('chat_id', 0), 'type': 'private'},
+                'from': BOT_USER,
+                'text': str(parameters.get('text', '')),
+            }
+        elif endpoint == 'getUpdates':
+            result = []
+        else:
+            result = True
+        return json.dumps({'ok': True, 'result': result}).encode()
+
+
+class FakeBotApiHandler(tornado.web.RequestHandler):
+    def initialize(self, api: FakeBotApiRequest) -> None:
+        self.api = api
+
+    async def post(self, endpoint: str) -> None:
+        # Bot API получает параметры формой, сложные значения закодированы в JSON
+        parameters = {}
+        for name, values in self.request.body_arguments.items():
+            value = values[0].decode()
+            try:
+                parameters[name] = json.loads(value)
+            except ValueError:
+                parameters[name] = value
+        self.set_header('Content-Type', 'application/json')
+        self.finish(await self.api.answer(endpoint, parameters))
+
+
+class FakeBotApiServer:
+    """Локальный HTTP-сервер, отвечающий на запросы к Bot API как FakeBotApiRequest.
+
+    Запросы бота проходят через настоящий HTTP-клиент с пулом соединений и
+    сериализацией параметров. Сервер работает в отдельном потоке со своим циклом
+    событий, чтобы не занимать цикл событий бота.
+
+    Attributes:
+        api: Объект, который формирует ответы и сохраняет вызовы методов Bot API.
+        base_url: Адрес сервера для ApplicationBuilder.base_url, задается в start.
+    """
+
+    def __init__(self, latency: float = 0) -> None:
+        self.api = FakeBotApiRequest(latency)
+        self.base_url = ''
+        self._thread: threading.Thread | None = None
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._stop_event: asyncio.Event | None = None
+
+    def start(self) -> str:
+        """Запускает сервер на свободном порту и возвращает адрес для base_url."""
+        sockets = tornado.netutil.bind_sockets(0, '127.0.0.1', family=socket.AF_INET)
+        started = threading.Event()
+        self._thread = threading.Thread(
+            target=asyncio.run, args=(self._serve(sockets, started),)
+        )
+        self._thread.start()
+        started.wait()
+        self.base_url = f'http://127.0.0.1:{sockets[0].getsockname()[1]}/bot'
+        return self.base_url
+
+    def stop(self) -> None:
+        if self._loop is not None and self._stop_event is not None:
+            self._loop.call_soon_threadsafe(self._stop_event.set)
+        if self._thread is not None:
+            self._thread.join()
+
+    async def _serve(
+            self,
+            sockets: list[socket.socket],
+            started: threading.Event,
+    ) -> None:
+        self._loop = asyncio.get_running_loop()
+        self._stop_event = asyncio.Event()
+        app = tornado.web.Application(
+            [(r'/bot[^/]+/(\w+)', FakeBotApiHandler, {'api': self.api})]
+        )
+        server = tornado.httpserver.HTTPServer(app)
+        server.add_sockets(sockets)
+        started.set()
+        await self._stop_event.wait()
+        server.stop()
+        await server.close_all_connections()
+
+
+async def make_bot() -> ExtBot[None]:
+    """Создает и инициализирует бота с запросами к Bot API через FakeBotApiRequest."""
+    request = FakeBotApiRequest()
+    bot: ExtBot[None] = ExtBot(
+        '123:benchmark', request=request, get_updates_request=request
+    )
+    await bot.initialize()
+    return bot
+
+
+def make_user(
+        user_id: int = BENCHMARK_USER_ID,
+        first_name: str = 'Benchmark',
+) -> dict[str, t.Any]:
+    return {
+        'id': user_id,
+        'is_bot': False,
+        'first_name': first_name,
+        'username': 'benchmark',
+    }
+
+
+def make_command_data(
+        update_id: int,
+        command: str,
+        user_id: int = BENCHMARK_USER_ID,
+        first_name: str = 'Benchmark',
+) -> dict[str, t.Any]:
+    """Создает обновление с командой пользователя в формате Bot API."""
+    return {
+        'update_id': update_id,
+        'message': {
+            'message_id': update_id,
+            'date': 0,
+            'chat': {'id': user_id, 'type': 'private'},
+            'from': make_user(user_id, first_name),
+            'text': command,
+            'entities': [
+                {'type': 'bot_command', 'offset': 0, 'length': len(command.split()[0])},
+            ],
+        },
+    }
+
+
+def make_callback_data(
+        update_id: int,
+        callback_data: str,
+        user_id: int = BENCHMARK_USER_ID,
+        first_name: str = 'Benchmark',
+) -> dict[str, t.Any]:
+    """Создает обновление с нажатием на кнопку под сообщением бота в формате Bot API."""
+    return {
+        'update_id': update_id,
+        'callback_query': {
+            'id': str(update_id),
+            'from': make_user(user_id, first_name),
+            'chat_instance': str(user_id),
+            'data': callback_data,
+            'message': {
+                'message_id': update_id,
+                'date': 0,
+                'chat': {'id': user_id, 'type': 'private'},
+                'from': BOT_USER,
+                'text': '',
+            },
+        },
+    }
+
+
+def make_command_update(
+        bot: ExtBot[None],
+        command: str,
+        user_id: int = BENCHMARK_USER_ID,
+) -> Update:
+    """Создает обновление с командой пользователя."""
+    return t.cast(Update, Update.de_json(make_command_data(1, command, user_id), bot))
+
+
+def make_callback_update(
+        bot: ExtBot[None],
+        callback_data: str,
+        user_id: int = BENCHMARK_USER_ID,
+) -> Update:
+    """Создает обновление с нажатием на кнопку под сообщением бота."""
+    data = make_callback_data(2, callback_data, user_id)
+    return t.cast(Update, Update.de_json(data, bot))
+
+
+def make_context(bot: ExtBot[None], chat_data: dict[str, t.Any] | None = None) -> t.Any:
+    """Создает контекст с атрибутами, которые используют обработчики бота."""
+    return types.SimpleNamespace(
+        bot=bot, chat_data=chat_data if chat_data is not None else {}
+    )
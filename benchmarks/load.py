@@ -0,0 +1,424 @@
+"""Нагрузочное тестирование бота воспроизведением команд пользователей.
+
+Команды берутся из лога бота (строки LOGGER_TEXT, которые пишет write_log, в текстовом
+или JSON формате) или генерируются по типичным сценариям. Обновления проходят через
+настоящее Application, а запросы к Bot API по HTTP принимает локальный
+fakes.FakeBotApiServer с задержкой ответа --api-latency. Состояние диалогов хранится
+в памяти, чтобы не захватывать блокировку PostgresPersistence работающего бота.
+
+Запуск из корня репозитория:
+
+    PYTHONPATH=src python -m benchmarks.load --log src/data/bot.log --rate 200
+    PYTHONPATH=src python -m benchmarks.load --users 500 --sessions 4 --output load.json
+"""
+import argparse
+import asyncio
+import dataclasses
+import json
+import random
+import re
+import statistics
+import sys
+import time
+import typing as t
+from collections import defaultdict
+from pathlib import Path
+
+from telegram import Update
+from telegram.ext import DictPersistence, PersistenceInput
+
+from app import (
+    bootstrap,
+    bot,
+    commands,
+    db,
+    keyboards,
+    metrics,
+    processors,
+    stations,
+    users,
+)
+from app.config import settings
+from benchmarks import cases, fakes
+from benchmarks.runner import percentile
+
+# Обработчики команд, в которые попадают сообщения при воспроизведении
+COMMAND_HANDLERS = {
+    f'/{commands.START}': 'start',
+    f'/{commands.HELP}': 'help_handler',
+    f'/{commands.SCHEDULE}': 'stations',
+    f'/{commands.TRIP}': 'stations',
+    f'/{commands.ADD_FAVORITE}': 'stations',
+    f'/{commands.NOTIFY}': 'stations',
+    f'/{commands.FAVORITES}': 'favorites',
+    f'/{commands.CLEAR_FAVORITES}': 'clear_favorites',
+}
+
+
+@dataclasses.dataclass(frozen=True)
+class Command:
+    """Команда или нажатие кнопки пользователем."""
+
+    user_id: int
+    first_name: str
+    text: str
+
+
+def get_log_pattern() -> re.Pattern[str]:
+    """Строит регулярное выражение для сообщения лога по шаблону LOGGER_TEXT."""
+    pattern = re.escape(settings.LOGGER_TEXT)
+    for name, group in (('first_name', r'.*?'), ('id', r'\d+'), ('command', r'.*')):
+        pattern = pattern.replace(re.escape(f'{{{name}}}'), f'(?P<{name}>{group})')
+    return re.compile(pattern + '$')
+
+
+def parse_log(lines: t.Iterable[str]) -> list[Command]:
+    """Извлекает команды пользователей из строк лога бота.
+
+    Args:
+        lines: Строки лога в текстовом формате или в формате JSON.
+
+    Returns:
+        Команды в порядке их записи в лог. Строки без команд пропускаются.
+    """
+    log_pattern = get_log_pattern()
+    parsed_commands = []
+    for line in lines:
+        line = line.strip()
+        if line.startswith('{'):
+            message = json.loads(line).get('message', '')
+        else:
+            message = line.partition(' => ')[2]
+        if (match := log_pattern.search(message)) is None:
+            continue
+        text = match['command']
+        if text.startswith(f'/{commands.DOWNLOAD_LOG}') or text == 'None':
+            continue
+        parsed_commands.append(Command(int(match['id']), match['first_name'], text))
+    return parsed_commands
+
+
+def synthesize(
+        users_count: int,
+        sessions: int,
+        stations_dict: dict[int, str],
+        seed: int,
+) -> list[Command]:
+    """Генерирует команды пользователей по типичным сценариям работы с ботом.
+
+    Сценарии одного пользователя идут по порядку, а сценарии разных пользователей
+    перемешаны между собой.
+
+    Args:
+        users_count: Количество пользователей.
+        sessions: Количество сценариев на одного пользователя.
+        stations_dict: Словарь станций, по которому выбираются кнопки.
+        seed: Начальное значение генератора случайных чисел.
+    """
+    rng = random.Random(seed)
+    station_ids = list(stations_dict)
+    end_station_ids = list(keyboards.END_STATION_DIRECTION)
+
+    def choose_route() -> list[str]:
+        from_station_id = rng.choice(station_ids)
+        if from_station_id in end_station_ids:
+            return [str(from_station_id)]
+        return [str(from_station_id), str(rng.choice(end_station_ids))]
+
+    scenarios: list[tuple[float, t.Callable[[], list[str]]]] = [
+        (0.4, lambda: [f'/{commands.SCHEDULE}', *choose_route()]),
+        (0.25, lambda: [f'/{commands.FAVORITES}']),
+        (0.1, lambda: [f'/{commands.TRIP}', *map(str, rng.sample(station_ids, 2))]),
+        (0.1, lambda: [f'/{commands.ADD_FAVORITE}', str(rng.choice(end_station_ids))]),
+        (0.05, lambda: [
+            f'/{commands.NOTIFY}',
+            *choose_route(),
+            f'{rng.choice(keyboards.ALERT_MINUTES)}:{rng.randint(0, 1)}',
+        ]),
+        (0.05, lambda: [f'/{commands.START}']),
+        (0.05, lambda: [f'/{commands.HELP}']),
+    ]
+    weights, builders = zip(*scenarios)
+
+    queues = {
+        user_id: [
+            text
+            for _ in range(sessions)
+            for text in rng.choices(builders, weights)[0]()
+        ]
+        for user_id in range(
+            fakes.BENCHMARK_USER_ID, fakes.BENCHMARK_USER_ID + users_count
+        )
+    }
+    synthesized = []
+    while queues:
+        user_id = rng.choice(list(queues))
+        synthesized.append(Command(user_id, f'User {user_id}', queues[user_id].pop(0)))
+        if not queues[user_id]:
+            del queues[user_id]
+    return synthesized
+
+
+def make_update(update_id: int, command: Command) -> dict[str, t.Any]:
+    """Создает обновление в формате Bot API: сообщение с командой или нажатие кнопки.
+
+    Команда начинается с '/', остальной текст считается данными нажатой кнопки.
+    """
+    if command.text.startswith('/'):
+        make_data = fakes.make_command_data
+    else:
+        make_data = fakes.make_callback_data
+    return make_data(update_id, command.text, command.user_id, command.first_name)
+
+
+def get_handler_names(replayed_commands: list[Command]) -> list[str]:
+    """Определяет обработчик бота, в который попадет каждая команда.
+
+    Нажатия кнопок после команды начала диалога попадают в этапы диалога по порядку,
+    а для /notify последним этапом всегда является выбор уведомления.
+    """
+    end_station_ids = set(map(str, keyboards.END_STATION_DIRECTION))
+    dialogs: dict[int, list[str]] = {}
+    handler_names = []
+    for command in replayed_commands:
+        if command.text.startswith('/'):
+            name = command.text.split()[0]
+            handler_name = COMMAND_HANDLERS.get(name, 'wrong_command')
+            dialogs[command.user_id] = [name] if handler_name == 'stations' else []
+        elif not (dialog := dialogs.get(command.user_id)):
+            handler_name = 'complete_conv'
+        else:
+            dialog.append(command.text)
+            is_notify = dialog[0] == f'/{commands.NOTIFY}'
+            if len(dialog) == 2:
+                handler_name = 'directions'
+            elif is_notify and (len(dialog) == 4 or dialog[1] in end_station_ids):
+                handler_name = 'save_alert'
+            else:
+                handler_name = 'complete_conv'
+        handler_names.append(handler_name)
+    return handler_names
+
+
+class RecordingUpdateProcessor(processors.ChatOrderedUpdateProcessor):
+    """Запоминает время завершения обработки каждого обновления."""
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.finished: dict[int, float] = {}
+
+    async def do_process_update(
+            self,
+            update: object,
+            coroutine: t.Awaitable[t.Any],
+    ) -> None:
+        try:
+            await super().do_process_update(update, coroutine)
+        finally:
+            if isinstance(update, Update):
+                self.finished[update.update_id] = time.perf_counter()
+
+
+async def sample_pool(samples: list[int], interval: float) -> None:
+    """Периодически сохраняет количество занятых соединений пула БД."""
+    while True:
+        samples.append(db.async_engine.pool.checkedout())  # type: ignore[attr-defined]
+        await asyncio.sleep(interval)
+
+
+def summarize(latencies: list[float]) -> dict[str, float]:
+    latencies = sorted(latencies)
+    return {
+        'count': len(latencies),
+        'mean_ms': statistics.fmean(latencies),
+        'p50_ms': percentile(latencies, 0.5),
+        'p95_ms': percentile(latencies, 0.95),
+        'p99_ms': percentile(latencies, 0.99),
+        'max_ms': latencies[-1],
+    }
+
+
+async def replay(args: argparse.Namespace) -> dict[str, t.Any]:
+    await cases.seed_db()
+    stations_dict = await stations.load_stations_dict()
+    keyboards.build_keyboards(stations_dict)
+
+    if args.log:
+        with open(args.log, encoding='utf-8') as f:
+            replayed_commands = parse_log(f)
+    else:
+        replayed_commands = synthesize(
+            args.users, args.sessions, stations_dict, args.seed
+        )
+    if args.limit:
+        replayed_commands = replayed_commands[:args.limit]
+    if not replayed_commands:
+        raise SystemExit('Нет команд для воспроизведения.')
+    handler_names = get_handler_names(replayed_commands)
+
+    bot_api_server = fakes.FakeBotApiServer(latency=args.api_latency / 1000)
+    update_processor = RecordingUpdateProcessor()
+    application = bot.build_application(
+        base_url=bot_api_server.start(),
+        update_processor=update_processor,
+        rate_limit=not args.no_rate_limit,
+        bot_persistence=DictPersistence(
+            store_data=PersistenceInput(
+                bot_data=False, user_data=False, callback_data=False
+            ),
+        ),
+    )
+    pool_samples: list[int] = []
+    enqueued: dict[int, float] = {}
+
+    try:
+        async with application:
+            await bootstrap.bootstrap()
+            await application.start()
+            sampler = asyncio.create_task(sample_pool(pool_samples, 0.01))
+
+            start = time.perf_counter()
+            for update_id, command in enumerate(replayed_commands, start=1):
+                if args.rate:
+                    send_at = start + (update_id - 1) / args.rate
+                    await asyncio.sleep(max(0.0, send_at - time.perf_counter()))
+                enqueued[update_id] = time.perf_counter()
+                update_data = make_update(update_id, command)
+                update = Update.de_json(update_data, application.bot)
+                await application.update_queue.put(update)
+
+            deadline = time.perf_counter() + args.timeout
+            while (
+                len(update_processor.finished) < len(enqueued)
+                and time.perf_counter() < deadline
+            ):
+                await asyncio.sleep(0.01)
+            duration = max(update_processor.finished.values(), default=start) - start
+
+            sampler.cancel()
+            await application.stop()
+    finally:
+        bot_api_server.stop()
+    await users.USERS_BUFFER.flush()
+    await db.async_engine.dispose()
+
+    latencies: dict[str, list[float]] = defaultdict(list)
+    for update_id, handler_name in enumerate(handler_names, start=1):
+        if (finished := update_processor.finished.get(update_id)) is not None:
+            latency = (finished - enqueued[update_id]) * 1000
+            latencies[handler_name].append(latency)
+            latencies['all'].append(latency)
+
+    processed = len(update_processor.finished)
+    pool_capacity = settings.DB_POOL_SIZE + settings.DB_MAX_OVERFLOW
+    saturated = sum(sample >= pool_capacity for sample in pool_samples)
+    update_wait = metrics.METRICS.update_wait
+    return {
+        'updates': len(enqueued),
+        'processed': processed,
+        'duration_s': duration,
+        'updates_per_second': processed / duration if duration else 0.0,
+        'latency': {
+            name: summarize(values) for name, values in sorted(latencies.items())
+        },
+        'db_pool': {
+            'capacity': pool_capacity,
+            'max_checked_out': max(pool_samples, default=0),
+            'mean_checked_out': statistics.fmean(pool_samples) if pool_samples else 0.0,
+            'saturated_share': saturated / max(len(pool_samples), 1),
+        },
+        'update_wait': {
+            'mean_ms': (
+                update_wait.sum / update_wait.count * 1000 if update_wait.count else 0.0
+            ),
+            'p95_ms': update_wait.quantile(0.95) * 1000,
+        },
+        'bot_api_calls': bot_api_server.api.count_calls(),
+        'bot_api_throttled': dict(metrics.METRICS.bot_api_throttled),
+    }
+
+
+def print_report(report: dict[str, t.Any]) -> None:
+    print(
+        f'Обработано {report["processed"]} из {report["updates"]} обновлений '
+        f'за {report["duration_s"]:.2f} с '
+        f'({report["updates_per_second"]:.1f} обновлений/с)'
+    )
+    print(
+        f'\n{"обработчик":<20} {"кол-во":>8} {"p50, мс":>10} {"p95, мс":>10} '
+        f'{"p99, мс":>10} {"max, мс":>10}'
+    )
+    for name, latency in report['latency'].items():
+        print(
+            f'{name:<20} {latency["count"]:>8} {latency["p50_ms"]:>10.1f} '
+            f'{latency["p95_ms"]:>10.1f} {latency["p99_ms"]:>10.1f} '
+            f'{latency["max_ms"]:>10.1f}'
+        )
+    db_pool = report['db_pool']
+    print(
+        f'\nПул БД: занято до {db_pool["max_checked_out"]} из {db_pool["capacity"]} '
+        f'соединений, в среднем {db_pool["mean_checked_out"]:.1f}, '
+        f'пул исчерпан {db_pool["saturated_share"]:.0%} времени'
+    )
+    update_wait = report['update_wait']
+    print(
+        f'Очередь обновлений: среднее ожидание {update_wait["mean_ms"]:.1f} мс, '
+        f'p95 ≤{update_wait["p95_ms"]:g} мс'
+    )
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description='Нагрузочное тестирование бота.')
+    parser.add_argument(
+        '--log', type=Path, help='Лог бота, команды из которого нужно воспроизвести.'
+    )
+    parser.add_argument(
+        '--users', type=int, default=200, help='Количество пользователей без --log.'
+    )
+    parser.add_argument(
+        '--sessions',
+        type=int,
+        default=3,
+        help='Количество сценариев на пользователя без --log.',
+    )
+    parser.add_argument(
+        '--seed', type=int, default=0, help='Начальное значение генератора сценариев.'
+    )
+    parser.add_argument('--limit', type=int, help='Максимальное количество обновлений.')
+    parser.add_argument(
+        '--rate',
+        type=float,
+        default=0,
+        help='Обновлений в секунду, 0 - без ограничения.',
+    )
+    parser.add_argument(
+        '--api-latency', type=float, default=50, help='Задержка ответа Bot API, мс.'
+    )
+    parser.add_argument(
+        '--no-rate-limit',
+        action='store_true',
+        help='Отключить ограничение частоты запросов к Bot API.',
+    )
+    parser.add_argument(
+        '--timeout', type=float, default=120, help='Время ожидания обработки, с.'
+    )
+    parser.add_argument(
+        '--output', type=Path, help='Файл для сохранения отчета в JSON.'
+    )
+    args = parser.parse_args()
+
+    if settings.MODE == 'prod':
+        parser.error(
+            'Нагрузочное тестирование записывает данные в БД '
+            'и не запускается с MODE=prod.'
+        )
+
+    report = asyncio.run(replay(args))
+    print_report(report)
+    if args.output:
+        args.output.write_text(json.dumps(report, indent=2, ensure_ascii=False))
+    return 0 if report['processed'] == report['updates'] else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
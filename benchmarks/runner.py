@@ -0,0 +1,76 @@
+"""Замер времени выполнения бенчмарков и сравнение результатов."""
+import statistics
+import time
+import typing as t
+
+Benchmark = t.Callable[[], t.Awaitable[t.Any]]
+
+
+def percentile(sorted_values: t.Sequence[float], share: float) -> float:
+    """Возвращает перцентиль отсортированной по возрастанию последовательности.
+
+    Args:
+        sorted_values: Непустая отсортированная последовательность.
+        share: Доля значений, не превышающих результат, например 0.95.
+    """
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * share))]
+
+
+async def measure(benchmark: Benchmark, repeat: int, warmup: int) -> dict[str, float]:
+    """Выполняет бенчмарк repeat раз после warmup прогревочных запусков.
+
+    Args:
+        benchmark: Асинхронная функция без аргументов.
+        repeat: Количество замеров.
+        warmup: Количество запусков перед замерами.
+
+    Returns:
+        Словарь со статистикой времени одного запуска в микросекундах.
+    """
+    for _ in range(warmup):
+        await benchmark()
+
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter_ns()
+        await benchmark()
+        timings.append((time.perf_counter_ns() - start) / 1000)
+
+    timings.sort()
+    return {
+        'repeat': repeat,
+        'min_us': timings[0],
+        'median_us': statistics.median(timings),
+        'mean_us': statistics.fmean(timings),
+        'p95_us': percentile(timings, 0.95),
+        'max_us': timings[-1],
+    }
+
+
+def compare(
+        baseline: dict[str, dict[str, float]],
+        current: dict[str, dict[str, float]],
+        threshold: float,
+) -> list[str]:
+    """Сравнивает медианы бенчмарков с базовыми результатами.
+
+    Args:
+        baseline: Результаты базовой ревизии.
+        current: Результаты текущей ревизии.
+        threshold: Допустимый относительный рост медианы, например 0.2 для 20%.
+
+    Returns:
+        Список бенчмарков, медиана которых выросла больше допустимого.
+    """
+    regressions = []
+    for name, result in current.items():
+        if name not in baseline:
+            continue
+        ratio = result['median_us'] / baseline[name]['median_us']
+        print(
+            f'{name:<40} {baseline[name]["median_us"]:>12.1f} '
+            f'{result["median_us"]:>12.1f} {ratio:>8.2f}x'
+        )
+        if ratio > 1 + threshold:
+            regressions.append(name)
+    return regressions
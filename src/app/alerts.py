@@ -0,0 +1,154 @@
+"""Модуль содержит расчет времени отправки уведомлений о поездах по подпискам.
+
+Подписки и время отправки уведомлений хранятся в таблице 'alert'. Одна задача
+JobQueue каждого процесса бота раз в ALERTS_TICK_INTERVAL секунд захватывает в БД
+все наступившие уведомления и отправляет их пакетом, поэтому количество задач не
+растет с количеством подписок, а каждое уведомление отправляет один процесс.
+"""
+import asyncio
+import datetime as dt
+import logging
+import typing as t
+
+from app import db
+from app.config import settings
+from app.models import Alert
+from app.timetable import to_service_seconds
+
+logger = logging.getLogger(__name__)
+
+DAY = dt.timedelta(days=1)
+# Сколько суток после текущих просматривается в поисках поезда ежедневного уведомления
+RECURRING_SEARCH_DAYS = 7
+
+
+def get_next_departure(
+        departure_times: dict[bool, list[dt.time]],
+        earliest: dt.datetime,
+) -> dt.datetime | None:
+    """Находит ближайший поезд, отправляющийся не раньше earliest.
+
+    Поезда после полуночи относятся к суткам работы метрополитена, начавшимся в
+    OPEN_TIME_METRO предыдущего дня, а расписание выходного дня выбирается по дате
+    начала этих суток.
+
+    Args:
+        departure_times: Время отправления поездов маршрута по признаку расписания
+          выходного дня, как возвращает db.select_departure_times.
+        earliest: Самое раннее допустимое время отправления.
+
+    Returns:
+        Дата и время отправления поезда или None, если поездов нет ни в текущие, ни
+        в следующие сутки работы метрополитена.
+    """
+    open_time = settings.OPEN_TIME_METRO
+    open_delta = dt.timedelta(hours=open_time.hour, minutes=open_time.minute)
+    service_date = (earliest - open_delta).date()
+    for date in (service_date, service_date + DAY):
+        day_start = dt.datetime.combine(date, dt.time.min)
+        times = departure_times.get(date.isoweekday() > 5, [])
+        for seconds in sorted(map(to_service_seconds, times)):
+            if (departure_at := day_start + dt.timedelta(seconds=seconds)) >= earliest:
+                return departure_at
+    return None
+
+
+def get_recurring_departure(
+        alert: Alert,
+        departure_times: dict[bool, list[dt.time]],
+        now: dt.datetime,
+) -> dt.datetime | None:
+    """Находит поезд для следующей отправки ежедневного уведомления.
+
+    Для каждых суток берется первый поезд не раньше времени отправления, выбранного
+    при подписке, по расписанию этих суток, поэтому в выходной уведомление придет о
+    поезде из расписания выходного дня.
+
+    Args:
+        alert: Ежедневная подписка.
+        departure_times: Время отправления поездов маршрута подписки.
+        now: Текущее время.
+
+    Returns:
+        Дата и время отправления поезда позже уже отправленного уведомления, до
+        которого еще не наступило время отправки уведомления, или None, если такого
+        поезда нет.
+    """
+    minutes_before = dt.timedelta(minutes=alert.minutes_before)
+    for days in range(-1, RECURRING_SEARCH_DAYS + 1):
+        earliest = dt.datetime.combine(now.date() + days * DAY, alert.departure_time)
+        departure_at = get_next_departure(departure_times, earliest)
+        if (
+            departure_at is not None
+            and departure_at > alert.departure_at
+            and departure_at - minutes_before > now
+        ):
+            return departure_at
+    return None
+
+
+async def claim_due(now: dt.datetime | None = None) -> t.Sequence[Alert]:
+    """Захватывает в БД наступившие уведомления на ALERTS_CLAIM_TIMEOUT секунд."""
+    now = now or dt.datetime.now()
+    claim_until = now + dt.timedelta(seconds=settings.ALERTS_CLAIM_TIMEOUT)
+    return await db.claim_due_alerts(now, claim_until)
+
+
+async def reschedule(
+        sent: t.Iterable[Alert],
+        failed: t.Iterable[Alert],
+        finished_ids: t.Iterable[int] = (),
+        now: dt.datetime | None = None,
+) -> None:
+    """Планирует следующую отправку захваченных уведомлений и удаляет завершенные.
+
+    Неотправленное уведомление повторяется на следующем тике, пока поезд не
+    отправился. Ежедневное уведомление переносится на поезд следующих суток по их
+    расписанию, а отправленные разовые уведомления удаляются из БД.
+
+    Args:
+        sent: Отправленные уведомления.
+        failed: Уведомления, которые не удалось отправить.
+        finished_ids: id подписок, которые нужно удалить без отправки.
+        now: Текущее время.
+    """
+    now = now or dt.datetime.now()
+    finished_ids = list(finished_ids)
+    fire_times: dict[int, tuple[dt.datetime, dt.datetime]] = {}
+    recurring = []
+    for alert in failed:
+        if now < alert.departure_at:
+            fire_times[alert.alert_id] = (now, alert.departure_at)
+        elif alert.is_recurring:
+            recurring.append(alert)
+        else:
+            logger.warning(
+                'Уведомление %s не отправлено до отправления поезда', alert.alert_id
+            )
+            finished_ids.append(alert.alert_id)
+    for alert in sent:
+        if alert.is_recurring:
+            recurring.append(alert)
+        else:
+            finished_ids.append(alert.alert_id)
+
+    routes = list(dict.fromkeys(
+        (alert.from_station_id, alert.to_station_id) for alert in recurring
+    ))
+    departure_times = dict(zip(
+        routes,
+        await asyncio.gather(*(db.select_departure_times(*route) for route in routes)),
+    ))
+    for alert in recurring:
+        route = (alert.from_station_id, alert.to_station_id)
+        departure_at = get_recurring_departure(alert, departure_times[route], now)
+        if departure_at is None:
+            logger.warning('Для ежедневного уведомления %s нет поездов', alert.alert_id)
+            finished_ids.append(alert.alert_id)
+        else:
+            fire_at = departure_at - dt.timedelta(minutes=alert.minutes_before)
+            fire_times[alert.alert_id] = (fire_at, departure_at)
+
+    await db.update_alert_fire_times(fire_times)
+    if finished_ids:
+        await db.delete_alerts(finished_ids)
@@ -0,0 +1,107 @@
+"""Модуль содержит этап запуска бота, выполняемый перед обработкой обновлений."""
+import asyncio
+import logging
+import time
+import typing as t
+
+from app import (
+    db,
+    keyboards,
+    stations,
+    timetable,
+    timetable_artifact,
+    timetable_versions,
+    trips,
+    users,
+)
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+T = t.TypeVar('T')
+
+
+async def _timed(name: str, timings: dict[str, float], coroutine: t.Awaitable[T]) -> T:
+    """Выполняет корутину и сохраняет время ее выполнения в секундах."""
+    start = time.perf_counter()
+    result = await coroutine
+    timings[name] = time.perf_counter() - start
+    return result
+
+
+async def _load_artifact(
+        timings: dict[str, float],
+        active_version_id: int | None,
+) -> timetable_artifact.TimetableArtifact | None:
+    """Загружает скомпилированное расписание, если оно задано в TIMETABLE_ARTIFACT.
+
+    Если файла нет, он поврежден или собран не из активной версии расписания, то
+    возвращает None и расписание загружается из БД.
+    """
+    if settings.TIMETABLE_ARTIFACT is None or not settings.TIMETABLE_IN_MEMORY:
+        return None
+
+    try:
+        return await _timed('artifact', timings, timetable_artifact.load_checked(
+            settings.TIMETABLE_ARTIFACT,
+            active_version_id,
+            check_db=settings.TIMETABLE_ARTIFACT_CHECK_DB,
+        ))
+    except (OSError, timetable_artifact.ArtifactError) as error:
+        logger.warning(
+            'Скомпилированное расписание не загружено, '
+            'расписание загружается из БД: %s',
+            error,
+        )
+        return None
+
+
+async def bootstrap() -> dict[str, float]:
+    """Загружает данные, необходимые боту, и строит клавиатуры.
+
+    Станции, расписание и известные пользователи загружаются из БД параллельно
+    через асинхронный движок, после чего по станциям строятся клавиатуры и
+    планировщик поездок. Если задан актуальный файл TIMETABLE_ARTIFACT, то станции
+    и расписание читаются из него. Время каждого этапа записывается в лог. Перед
+    загрузкой запоминается активная версия расписания, по смене которой данные
+    перезагружаются без перезапуска бота.
+
+    Returns:
+        Словарь с временем выполнения каждого этапа в секундах.
+    """
+    timings: dict[str, float] = {}
+    start = time.perf_counter()
+
+    timetable_versions.RELOADER.version = await _timed(
+        'version', timings, db.select_active_timetable_version()
+    )
+    artifact = await _load_artifact(timings, timetable_versions.RELOADER.version)
+    if artifact is not None:
+        stations.set_stations_dict(artifact.stations_dict)
+        timetable.set_timetable(artifact.timetable)
+        stations_dict = artifact.stations_dict
+        await _timed('users', timings, users.USERS_BUFFER.warm_up())
+    else:
+        loaders: list[t.Awaitable[t.Any]] = [
+            _timed('stations', timings, stations.load_stations_dict()),
+            _timed('users', timings, users.USERS_BUFFER.warm_up()),
+        ]
+        if settings.TIMETABLE_IN_MEMORY:
+            loaders.append(_timed('timetable', timings, timetable.load_timetable()))
+        stations_dict, *_ = await asyncio.gather(*loaders)
+
+    keyboards_start = time.perf_counter()
+    keyboards.build_keyboards(stations_dict)
+    timings['keyboards'] = time.perf_counter() - keyboards_start
+    await _timed('trips', timings, trips.load_planner())
+    timings['total'] = time.perf_counter() - start
+
+    logger.info(
+        'Запуск бота завершен за %.3f с (%s)',
+        timings['total'],
+        ', '.join(
+            f'{name}: {seconds:.3f} с'
+            for name, seconds in timings.items() if name != 'total'
+        ),
+    )
+    return timings
@@ -1,11 +1,27 @@
 from telegram.ext import (
+    Application,
     ApplicationBuilder,
+    BasePersistence,
+    BaseUpdateProcessor,
     CommandHandler,
+    InlineQueryHandler,
     MessageHandler,
     filters,
 )
+from telegram.request import BaseRequest
 
-from app import commands, handlers
+from app import (
+    bootstrap,
+    commands,
+    errors,
+    handlers,
+    metrics,
+    persistence,
+    processors,
+    rate_limiter,
+    timetable_versions,
+    users,
+)
 from app.config import settings
 
 COMMAND_HANDLERS = {
@@ -13,12 +29,81 @@ COMMAND_HANDLERS = {
     commands.HELP: handlers.help_handler,
     commands.FAVORITES: handlers.favorites,
     commands.CLEAR_FAVORITES: handlers.clear_favorites,
+    commands.CLEAR_NOTIFY: handlers.clear_alerts,
 }
 
 
-def start_bot() -> None:
-    """Главная функция, стартующая бота."""
-    application = ApplicationBuilder().token(settings.BOT_TOKEN).build()
+async def post_init(application: Application) -> None:
+    """
+    Загружает станции и расписание поездов перед началом обработки обновлений.
+    Если задан METRICS_PORT, то запускает HTTP-сервер с метриками бота.
+    """
+    await bootstrap.bootstrap()
+    if settings.METRICS_PORT is not None:
+        application.bot_data['metrics_server'] = metrics.start_http_server(
+            settings.METRICS_LISTEN,
+            settings.METRICS_PORT,
+        )
+
+
+async def post_shutdown(application: Application) -> None:
+    """Записывает в БД накопленных пользователей перед остановкой бота."""
+    await users.USERS_BUFFER.flush()
+    if (metrics_server := application.bot_data.pop('metrics_server', None)) is not None:
+        metrics_server.stop()
+
+
+def build_application(
+        request: BaseRequest | None = None,
+        base_url: str = settings.BOT_API_BASE_URL,
+        update_processor: BaseUpdateProcessor | None = None,
+        rate_limit: bool = settings.RATE_LIMIT_ENABLED,
+        bot_persistence: BasePersistence | None = None,
+) -> Application:
+    """Создает приложение бота и регистрирует в нем обработчики.
+
+    Args:
+        request: Объект для запросов к Bot API. Позволяет подменить Bot API при
+          локальной проверке бота.
+        base_url: Адрес Bot API, к которому добавляется токен бота.
+        update_processor: Обработчик очереди обновлений. По умолчанию
+          ChatOrderedUpdateProcessor.
+        rate_limit: Ограничивать частоту запросов к Bot API через
+          TokenBucketRateLimiter.
+        bot_persistence: Хранилище состояния диалогов. По умолчанию
+          PostgresPersistence, если PERSISTENCE_ENABLED.
+    """
+    update_processor = update_processor or processors.ChatOrderedUpdateProcessor()
+    if isinstance(update_processor, processors.ChatOrderedUpdateProcessor):
+        processor_stats = update_processor.stats
+        metrics.METRICS.register_gauge(
+            'bot_updates_queue_depth',
+            'Обновления, ожидающие обработки.',
+            lambda: processor_stats()['queue_depth'],
+        )
+    builder = (
+        ApplicationBuilder()
+        .token(settings.BOT_TOKEN)
+        .base_url(base_url)
+        .concurrent_updates(update_processor)
+        .post_init(post_init)
+        .post_shutdown(post_shutdown)
+    )
+    if request is not None:
+        builder = builder.request(request).get_updates_request(request)
+    if rate_limit:
+        bot_rate_limiter = rate_limiter.TokenBucketRateLimiter()
+        builder = builder.rate_limiter(bot_rate_limiter)
+        metrics.METRICS.register_gauge(
+            'bot_api_queue_depth',
+            'Запросы к Bot API, ожидающие токен общей корзины.',
+            lambda: bot_rate_limiter.queue_depth,
+        )
+    if bot_persistence is None and settings.PERSISTENCE_ENABLED:
+        bot_persistence = persistence.PostgresPersistence()
+    if bot_persistence is not None:
+        builder = builder.persistence(bot_persistence)
+    application = builder.build()
     for command, callback in COMMAND_HANDLERS.items():
         application.add_handler(CommandHandler(command, callback))
     application.add_handler(
@@ -28,7 +113,49 @@ def start_bot() -> None:
             filters.User(settings.DEVELOPER_TG_ID),
         ),
     )
+    application.add_handler(
+        CommandHandler(
+            commands.STATS,
+            handlers.stats,
+            filters.User(settings.DEVELOPER_TG_ID),
+        ),
+    )
     application.add_handler(handlers.CONVERSATION_HANDLER)
+    application.add_handler(InlineQueryHandler(handlers.inline_query))
     application.add_handler(MessageHandler(filters.ALL, handlers.wrong_command))
     application.add_error_handler(handlers.error_handler)
-    application.run_polling()
+    if application.job_queue is not None:
+        application.job_queue.run_repeating(
+            users.USERS_BUFFER.flush_job, interval=settings.USERS_FLUSH_INTERVAL
+        )
+        application.job_queue.run_repeating(
+            handlers.send_alerts, interval=settings.ALERTS_TICK_INTERVAL
+        )
+        application.job_queue.run_repeating(
+            errors.ERRORS.digest_job, interval=settings.ERRORS_DIGEST_INTERVAL
+        )
+        application.job_queue.run_repeating(
+            timetable_versions.RELOADER.reload_job,
+            interval=settings.TIMETABLE_POLL_INTERVAL,
+        )
+    return application
+
+
+def start_bot() -> None:
+    """
+    Главная функция, стартующая бота.
+    В режиме webhook обновления принимает встроенный HTTP-сервер: он проверяет
+     секретный токен из заголовка X-Telegram-Bot-Api-Secret-Token, сразу отвечает
+     200 и помещает обновление в очередь на обработку.
+    """
+    application = build_application()
+    if settings.UPDATES_MODE == 'webhook':
+        application.run_webhook(
+            listen=settings.WEBHOOK_LISTEN,
+            port=settings.WEBHOOK_PORT,
+            url_path=settings.WEBHOOK_PATH,
+            webhook_url=settings.WEBHOOK_URL,
+            secret_token=settings.WEBHOOK_SECRET_TOKEN,
+        )
+    else:
+        application.run_polling()
@@ -0,0 +1,154 @@
+"""Модуль содержит кэши, снижающие количество запросов к БД."""
+import asyncio
+import datetime as dt
+import functools
+import time
+import typing as t
+
+from app import db, metrics, utils
+from app.config import settings
+
+T = t.TypeVar('T')
+RouteKey = tuple[int, int, bool]
+SelectSchedule = t.Callable[..., t.Awaitable[t.Sequence[dt.time]]]
+
+
+class ScheduleCache:
+    """Кэш ближайших отправлений поездов перед db.select_schedule.
+
+    Ключом кэша является маршрут (from_station_id, to_station_id, is_weekend), а
+    значением срез ближайших отправлений. Запись устаревает в момент отправления
+    первого поезда из среза, но не позже чем через SCHEDULE_CACHE_TTL секунд.
+    Одновременные промахи по одному ключу объединяются в один запрос к БД. Каждая
+    очистка кэша начинает новое поколение, и результаты запросов, начатых в
+    предыдущем поколении, в кэш не записываются.
+    """
+
+    def __init__(
+            self,
+            select_schedule: SelectSchedule = db.select_schedule,
+            ttl: int = settings.SCHEDULE_CACHE_TTL,
+    ) -> None:
+        self._select_schedule = select_schedule
+        self._ttl = dt.timedelta(seconds=ttl)
+        self._entries: dict[RouteKey, tuple[dt.datetime, t.Sequence[dt.time]]] = {}
+        self._in_flight: dict[RouteKey, asyncio.Task[t.Sequence[dt.time]]] = {}
+        self._generation = 0
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def hit_ratio(self) -> float:
+        """Доля попаданий в кэш среди всех обращений."""
+        requests = self.hits + self.misses
+        return self.hits / requests if requests else 0.0
+
+    async def select_schedule(
+            self,
+            from_station_id: int,
+            to_station_id: int,
+    ) -> t.Sequence[dt.time]:
+        """Возвращает ближайшие отправления из кэша или запрашивает их из БД.
+
+        Args:
+            from_station_id: id станции отправления поезда.
+            to_station_id: id конечной станции направления движения поездов.
+
+        Returns:
+            Время ближайших отправлений по порядку.
+        """
+        key = (from_station_id, to_station_id, await utils.is_weekend())
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] > dt.datetime.now():
+            self.hits += 1
+            return entry[1]
+
+        self.misses += 1
+        if (task := self._in_flight.get(key)) is None:
+            task = asyncio.create_task(self._fetch(key, self._generation))
+            self._in_flight[key] = task
+            task.add_done_callback(functools.partial(self._forget, key))
+        return await asyncio.shield(task)
+
+    def clear(self) -> None:
+        """Удаляет все записи кэша, например после смены версии расписания.
+
+        Обращения после очистки не ожидают запросов к БД, начатых до нее, а
+        результаты этих запросов не записываются в кэш.
+        """
+        self._generation += 1
+        self._entries.clear()
+        self._in_flight.clear()
+
+    def _forget(self, key: RouteKey, task: asyncio.Task[t.Sequence[dt.time]]) -> None:
+        if self._in_flight.get(key) is task:
+            del self._in_flight[key]
+
+    async def _fetch(self, key: RouteKey, generation: int) -> t.Sequence[dt.time]:
+        from_station_id, to_station_id, is_weekend = key
+        departure_times = await self._select_schedule(
+            from_station_id, to_station_id, is_weekend=is_weekend
+        )
+        if generation != self._generation:
+            return departure_times
+
+        now = dt.datetime.now()
+        expires_at = now + self._ttl
+        if departure_times:
+            time_to_train = utils.get_time_to_train(departure_times[0], now)
+            expires_at = min(expires_at, now + time_to_train)
+        self._entries[key] = (expires_at, departure_times)
+        return departure_times
+
+
+SCHEDULE_CACHE = ScheduleCache()
+metrics.METRICS.register_gauge(
+    'bot_schedule_cache_hit_ratio',
+    'Доля попаданий в кэш ближайших отправлений.',
+    lambda: SCHEDULE_CACHE.hit_ratio,
+)
+
+
+class BucketCache(t.Generic[T]):
+    """Кэш значения, которое вычисляется не чаще одного раза за интервал времени.
+
+    Время делится на интервалы по bucket секунд. Все обращения в пределах одного
+    интервала получают одно и то же значение, а одновременные обращения в начале
+    нового интервала ожидают одного вычисления. Если вычисление завершилось
+    ошибкой, то следующее обращение вычисляет значение заново.
+    """
+
+    def __init__(self, compute: t.Callable[[], t.Awaitable[T]], bucket: float) -> None:
+        self._compute = compute
+        self._bucket = bucket
+        self._entry: tuple[int, asyncio.Task[T]] | None = None
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def hit_ratio(self) -> float:
+        """Доля попаданий в кэш среди всех обращений."""
+        requests = self.hits + self.misses
+        return self.hits / requests if requests else 0.0
+
+    async def get(self) -> T:
+        bucket = int(time.time() // self._bucket)
+        if self._entry is not None and self._entry[0] == bucket:
+            self.hits += 1
+            task = self._entry[1]
+        else:
+            self.misses += 1
+            task = asyncio.create_task(self._compute())
+            task.add_done_callback(self._evict_failed)
+            self._entry = (bucket, task)
+        return await asyncio.shield(task)
+
+    def clear(self) -> None:
+        self._entry = None
+
+    def _evict_failed(self, task: asyncio.Task[T]) -> None:
+        """Удаляет из кэша вычисление, завершившееся ошибкой или отмененное."""
+        if not task.cancelled() and task.exception() is None:
+            return
+        if self._entry is not None and self._entry[1] is task:
+            self._entry = None
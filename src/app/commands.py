@@ -3,7 +3,11 @@
 START = 'start'
 HELP = 'help'
 SCHEDULE = 'schedule'
+TRIP = 'trip'
 FAVORITES = 'favorites'
 ADD_FAVORITE = 'add_favorite'
 CLEAR_FAVORITES = 'clear_favorites'
+NOTIFY = 'notify'
+CLEAR_NOTIFY = 'clear_notify'
 DOWNLOAD_LOG = 'download_log'
+STATS = 'stats'
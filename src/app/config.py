@@ -1,5 +1,5 @@
 import datetime
-import logging
+import typing as t
 from pathlib import (
     Path,
     PurePath,
@@ -23,22 +23,98 @@ class Settings(ps.BaseSettings):
     TZ: str
     MODE: str
 
+    # updates params
+    BOT_API_BASE_URL: str = 'https://api.telegram.org/bot'
+    UPDATES_MODE: t.Literal['polling', 'webhook'] = 'polling'
+    WEBHOOK_LISTEN: str = '0.0.0.0'
+    WEBHOOK_PORT: int = 8443
+    WEBHOOK_PATH: str = 'webhook'
+    WEBHOOK_URL: str | None = None
+    WEBHOOK_SECRET_TOKEN: str | None = p.Field(
+        default=None, pattern=r'^[A-Za-z0-9_-]{1,256}$'
+    )
+
+    # db params
+    DB_ECHO: bool = False
+    DB_POOL_SIZE: int = p.Field(default=5, ge=1)
+    DB_MAX_OVERFLOW: int = p.Field(default=10, ge=0)
+    DB_POOL_PRE_PING: bool = True
+    DB_POOL_RECYCLE: int = p.Field(default=30 * 60, ge=-1)
+    DB_STATEMENT_CACHE_SIZE: int = p.Field(default=100, ge=0)
+
     # path variables
     BASE_DIR: p.DirectoryPath = Path(__file__).parents[1]
 
     # logger params
     LOG_FILENAME: PurePath = PurePath.joinpath(BASE_DIR, 'data', 'bot.log')
     LOGGER_TEXT: str = 'Пользователь {first_name} ({id}) отправил команду "{command}"'
+    LOG_FORMAT: t.Literal['text', 'json'] = 'text'
+    LOG_ROTATION: t.Literal['size', 'time'] = 'size'
+    LOG_MAX_BYTES: int = p.Field(default=10 * 1024 * 1024, ge=1024)
+    LOG_ROTATION_WHEN: str = 'midnight'
+    LOG_BACKUP_COUNT: int = p.Field(default=5, ge=1)
 
     # bot params
     OPEN_TIME_METRO: datetime.time = datetime.time(hour=5, minute=30)
     CLOSE_TIME_METRO: datetime.time = datetime.time(hour=0, minute=30)
     CHOICE_DIRECTION: int = p.Field(default=0, ge=0)
     FINAL_STAGE: int = p.Field(default=1, ge=0)
+    ALERT_STAGE: int = p.Field(default=2, ge=0)
     CONVERSATION_TIMEOUT: int = p.Field(default=60 * 3, ge=60, le=3600)
     MAX_WAITING_TIME: int = p.Field(default=60, ge=15, le=60)
     LIMIT_ROW: int = p.Field(default=2, ge=1)
     LIMIT_FAVORITES: int = p.Field(default=2, ge=1)
+    LIMIT_ALERTS: int = p.Field(default=5, ge=1)
+
+    # alerts params
+    ALERTS_TICK_INTERVAL: int = p.Field(default=10, ge=1)
+    ALERTS_SEND_CONCURRENCY: int = p.Field(default=20, ge=1)
+    ALERTS_CLAIM_TIMEOUT: int = p.Field(default=60, ge=1)
+
+    # inline mode params
+    INLINE_BUCKET_SECONDS: float = p.Field(default=1, gt=0)
+    INLINE_CACHE_TIME: int = p.Field(default=5, ge=0)
+
+    # rate limit params
+    RATE_LIMIT_ENABLED: bool = True
+    RATE_LIMIT_OVERALL: float = p.Field(default=30, gt=0)
+    RATE_LIMIT_CHAT: float = p.Field(default=1, gt=0)
+    RATE_LIMIT_CHAT_BURST: int = p.Field(default=3, ge=1)
+    RATE_LIMIT_GROUP_PER_MINUTE: float = p.Field(default=20, gt=0)
+    RATE_LIMIT_MAX_RETRIES: int = p.Field(default=3, ge=0)
+
+    # update processing params
+    MAX_CONCURRENT_UPDATES: int = p.Field(default=32, ge=1)
+    MAX_PENDING_UPDATES: int = p.Field(default=1024, ge=1)
+
+    # errors params
+    ERRORS_DIGEST_INTERVAL: int = p.Field(default=10 * 60, ge=60)
+    ERRORS_MAX_FINGERPRINTS: int = p.Field(default=1000, ge=1)
+
+    # metrics params
+    METRICS_LISTEN: str = '0.0.0.0'
+    METRICS_PORT: int | None = None
+
+    # persistence params
+    PERSISTENCE_ENABLED: bool = True
+    PERSISTENCE_UPDATE_INTERVAL: float = p.Field(default=5, gt=0)
+
+    # bot users params
+    KNOWN_USERS_CACHE_SIZE: int = p.Field(default=100_000, ge=1)
+    USERS_FLUSH_INTERVAL: int = p.Field(default=10, ge=1)
+    USERS_MAX_PENDING: int = p.Field(default=10_000, ge=1)
+
+    # favorites cache params
+    FAVORITES_CACHE_SIZE: int = p.Field(default=10_000, ge=1)
+    FAVORITES_CACHE_TTL: int = p.Field(default=60, ge=1)
+
+    # timetable params
+    TIMETABLE_IN_MEMORY: bool = True
+    TIMETABLE_COMPRESSION: bool = False
+    TIMETABLE_ARTIFACT: Path | None = None
+    TIMETABLE_ARTIFACT_CHECK_DB: bool = False
+    TIMETABLE_POLL_INTERVAL: int = p.Field(default=60, ge=1)
+    SCHEDULE_CACHE_TTL: int = p.Field(default=60, ge=1)
 
     model_config = ps.SettingsConfigDict(
         env_file=(
@@ -49,14 +125,15 @@ class Settings(ps.BaseSettings):
         extra="ignore",
     )
 
+    @p.model_validator(mode='after')
+    def check_webhook(self) -> 'Settings':
+        if self.UPDATES_MODE != 'webhook':
+            return self
+        if not self.WEBHOOK_URL or not self.WEBHOOK_URL.startswith('https://'):
+            raise ValueError('Для режима webhook нужен WEBHOOK_URL с https://')
+        if not self.WEBHOOK_SECRET_TOKEN:
+            raise ValueError('Для режима webhook нужен WEBHOOK_SECRET_TOKEN')
+        return self
 
-settings = Settings()
 
-logging.basicConfig(
-    filename=settings.LOG_FILENAME,
-    format='[%(asctime)s] - [%(name)s] - [%(levelname)s] => %(message)s',
-    datefmt='%d.%m.%Y %H:%M:%S',
-    level=logging.INFO,
-    encoding='utf-8',
-)
-logging.getLogger('httpx').setLevel(logging.WARNING)
+settings = Settings()
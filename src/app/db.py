@@ -3,66 +3,116 @@ import typing as t
 
 from sqlalchemy import (
     URL,
-    Engine,
+    Integer,
+    Row,
     asc,
-    create_engine,
+    bindparam,
+    cast,
     delete,
     func,
+    lambda_stmt,
+    literal,
     select,
+    text,
+    tuple_,
+    update,
 )
-from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.dialects.postgresql import aggregate_order_by, insert
 from sqlalchemy.ext.asyncio import (
+    AsyncConnection,
     AsyncEngine,
     AsyncSession,
     async_sessionmaker,
     create_async_engine,
 )
-from sqlalchemy.orm import (
-    Session,
-    sessionmaker,
-)
 
 from telegram import User
 
-from app import utils
+from app import metrics, utils
 from app.config import settings
 from app.models import (
+    Alert,
     BotUser,
+    ChatData,
+    ConversationState,
     Favorite,
     Schedule,
+    ScheduleStaging,
     Station,
+    StationStaging,
+    TimetableVersion,
 )
 
-URL_DB_SYNC: URL = URL.create(
-    drivername=settings.DB_DRIVERNAME_SYNC,
+URL_DB_ASYNC: URL = URL.create(
+    drivername=settings.DB_DRIVERNAME_ASYNC,
     username=settings.POSTGRES_USER,
     password=settings.POSTGRES_PASSWORD,
     host=settings.DB_HOST,
     port=settings.DB_PORT,
     database=settings.DB_NAME,
 )
-URL_DB_ASYNC: URL = URL_DB_SYNC.set(drivername=settings.DB_DRIVERNAME_ASYNC)
-sync_engine: Engine = create_engine(url=URL_DB_SYNC, echo=True)
-sync_session: sessionmaker[Session] = sessionmaker(bind=sync_engine, expire_on_commit=False)
-async_engine: AsyncEngine = create_async_engine(url=URL_DB_ASYNC, echo=True)
+# Горячие запросы (select_schedule, select_favorites, favorites_limited) строятся через
+# lambda_stmt, поэтому их SQL не меняется между вызовами и asyncpg выполняет их как
+# подготовленные на сервере выражения из кэша соединения.
+async_engine: AsyncEngine = create_async_engine(
+    url=URL_DB_ASYNC.update_query_dict(
+        {'prepared_statement_cache_size': str(settings.DB_STATEMENT_CACHE_SIZE)},
+    ),
+    echo=settings.DB_ECHO,
+    pool_size=settings.DB_POOL_SIZE,
+    max_overflow=settings.DB_MAX_OVERFLOW,
+    pool_pre_ping=settings.DB_POOL_PRE_PING,
+    pool_recycle=settings.DB_POOL_RECYCLE,
+    poolclass=metrics.TimedQueuePool,
+)
+metrics.instrument_engine(async_engine.sync_engine)
+metrics.METRICS.register_gauge(
+    'bot_db_pool_checked_out',
+    'Занятые соединения пула БД.',
+    lambda: async_engine.pool.checkedout(),  # type: ignore[attr-defined]
+)
 async_session: async_sessionmaker[AsyncSession] = async_sessionmaker(async_engine, expire_on_commit=False)
 
+# Количество строк в одном запросе insert_users: 5 параметров на строку, а asyncpg
+# допускает не больше 32767 параметров в запросе.
+INSERT_USERS_CHUNK_SIZE = 1000
+
+# Ключ advisory-блокировки, которую удерживает единственный процесс бота, записывающий
+# состояние диалогов, см. persistence.PostgresPersistence.
+PERSISTENCE_LOCK_ID = 0x6E657874
+
+# Кэш избранных маршрутов, где ключом является id пользователя бота. Обновляется при
+# добавлении и удалении избранного через функции этого модуля, а изменения, сделанные
+# другими экземплярами бота, становятся видны через FAVORITES_CACHE_TTL секунд.
+FAVORITES_CACHE: utils.LRUCache[int, t.Sequence[Favorite]] = utils.LRUCache(
+    maxsize=settings.FAVORITES_CACHE_SIZE,
+    ttl=settings.FAVORITES_CACHE_TTL,
+)
+# Счетчик изменений избранного. select_favorites не сохраняет в кэш результат
+# запроса, во время которого избранное менялось, чтобы не затереть более новые данные.
+_favorites_writes: int = 0
+metrics.METRICS.register_gauge(
+    'bot_favorites_cache_hit_ratio',
+    'Доля попаданий в кэш избранного.',
+    lambda: FAVORITES_CACHE.hit_ratio,
+)
+
 
-def get_stations(
-        current_session: sessionmaker[Session] = sync_session
+async def select_stations(
+        current_session: async_sessionmaker[AsyncSession] = async_session,
 ) -> t.Sequence[Station]:
     """Извлекает данные из таблицы 'station'.
 
     Args:
-        current_session: Фабрика для синхронной сессии.
+        current_session: Фабрика для асинхронной сессии.
 
     Returns:
         Коллекция объектов Station.
     """
-    statement = select(Station)
+    statement = select(Station).order_by(Station.station_id)
 
-    with current_session() as session:
-        return session.scalars(statement).all()
+    async with current_session() as session:
+        return (await session.scalars(statement)).all()
 
 
 async def insert_user(
@@ -93,39 +143,186 @@ async def insert_user(
         await session.commit()
 
 
+async def insert_users(
+        telegram_users: t.Sequence[User],
+        current_session: async_sessionmaker[AsyncSession] = async_session,
+) -> None:
+    """Добавляет новых пользователей бота в таблицу 'bot_user'.
+
+    Пользователи записываются запросами по INSERT_USERS_CHUNK_SIZE строк, т.к.
+    asyncpg ограничивает количество параметров одного запроса. Каждая часть
+    фиксируется отдельно, поэтому при ошибке уже записанные части сохраняются.
+
+    Args:
+        telegram_users: Пользователи бота.
+        current_session: Фабрика для асинхронной сессии.
+
+    Returns:
+        None
+    """
+    if not telegram_users:
+        return
+
+    async with current_session() as session:
+        for start in range(0, len(telegram_users), INSERT_USERS_CHUNK_SIZE):
+            chunk = telegram_users[start:start + INSERT_USERS_CHUNK_SIZE]
+            statement = insert(
+                BotUser
+            ).values([
+                {
+                    'bot_user_id': telegram_user.id,
+                    'first_name': telegram_user.first_name,
+                    'last_name': telegram_user.last_name,
+                    'username': telegram_user.username,
+                    'is_bot': telegram_user.is_bot,
+                }
+                for telegram_user in chunk
+            ]).on_conflict_do_nothing()
+            await session.execute(statement)
+            await session.commit()
+
+
+async def select_bot_user_ids(
+        limit: int,
+        current_session: async_sessionmaker[AsyncSession] = async_session,
+) -> t.Sequence[int]:
+    """Извлекает id последних добавленных пользователей из таблицы 'bot_user'.
+
+    Args:
+        limit: Максимальное количество пользователей.
+        current_session: Фабрика для асинхронной сессии.
+
+    Returns:
+        Коллекция id пользователей бота.
+    """
+    statement = select(
+        BotUser.bot_user_id
+    ).order_by(
+        BotUser.created_at.desc()
+    ).limit(
+        limit
+    )
+
+    async with current_session() as session:
+        return (await session.scalars(statement)).all()
+
+
 async def select_schedule(
         from_station_id: int,
         to_station_id: int,
         current_session: async_sessionmaker[AsyncSession] = async_session,
-) -> t.Sequence[Schedule | None]:
-    """Извлекает данные из таблицы 'schedule'.
+        is_weekend: bool | None = None,
+        now: datetime.datetime | None = None,
+) -> list[datetime.time]:
+    """Извлекает время ближайших отправлений из таблицы 'schedule'.
 
-    Функция делает запрос к БД с переданными id станций и возвращает список с объектами
-    Schedule при наличии подходящих под временной интервал.
+    Функция делает запрос к БД с переданными id станций и возвращает время отправления
+    поездов, подходящих под временной интервал. Запрос выбирает только столбец
+    departure_time, без объектов Schedule и присоединенных к ним станций: названия
+    станций для ответа берутся из словаря станций.
+
+    Время отправления фильтруется по диапазону, поэтому запрос выполняется поиском по
+    индексу schedule_unique (from_station_id, to_station_id, is_weekend,
+    departure_time) без сортировки. Если время ожидания переходит через полночь, то
+    поезда после полуночи извлекаются вторым запросом по диапазону от начала суток.
 
     Args:
         from_station_id: id станции отправления поезда.
         to_station_id: id конечной станции направления движения поездов.
         current_session: Фабрика для асинхронной сессии.
+        is_weekend: Признак расписания выходного дня, по умолчанию определяется по
+          текущей дате.
+        now: Текущее время, по умолчанию берется системное.
+
+    Returns:
+        Список времени отправления по порядку, пустой при отсутствии поездов.
+    """
+    if is_weekend is None:
+        is_weekend = await utils.is_weekend()
+
+    departure_times: list[datetime.time] = []
+    async with current_session() as session:
+        for start, end in utils.get_departure_ranges(now):
+            limit = settings.LIMIT_ROW - len(departure_times)
+            statement = lambda_stmt(
+                lambda: select(
+                    Schedule.departure_time
+                ).where(
+                    Schedule.from_station_id == from_station_id,
+                    Schedule.to_station_id == to_station_id,
+                    Schedule.is_weekend == is_weekend,
+                    Schedule.departure_time >= start,
+                    Schedule.departure_time < end,
+                ).order_by(
+                    asc(Schedule.departure_time)
+                ).limit(
+                    limit
+                )
+            )
+            departure_times += (await session.scalars(statement)).all()
+            if len(departure_times) >= settings.LIMIT_ROW:
+                break
+    return departure_times
+
+
+async def select_timetable(
+        current_session: async_sessionmaker[AsyncSession] = async_session,
+) -> t.Sequence[Row[tuple[int, int, bool, datetime.time]]]:
+    """Извлекает всё расписание из таблицы 'schedule'.
+
+    Функция используется для загрузки расписания в память при старте бота, поэтому
+    извлекает только необходимые столбцы без объединения с таблицей 'station'.
+
+    Args:
+        current_session: Фабрика для асинхронной сессии.
 
     Returns:
-        Коллекция объектов Schedule соответствующих запросу из БД или None.
+        Коллекция строк (from_station_id, to_station_id, is_weekend, departure_time).
     """
     statement = select(
-        Schedule
-    ).where(
-        Schedule.from_station_id == from_station_id,
-        Schedule.to_station_id == to_station_id,
-        Schedule.is_weekend.is_(await utils.is_weekend()),
-        Schedule.time_to_train < datetime.timedelta(minutes=settings.MAX_WAITING_TIME),
-    ).order_by(
-        asc(Schedule.time_to_train)
-    ).limit(
-        settings.LIMIT_ROW
+        Schedule.from_station_id,
+        Schedule.to_station_id,
+        Schedule.is_weekend,
+        Schedule.departure_time,
     )
 
     async with current_session() as session:
-        return (await session.scalars(statement)).all()
+        return (await session.execute(statement)).all()
+
+
+async def select_schedule_checksum(
+        current_session: async_sessionmaker[AsyncSession] = async_session,
+) -> str:
+    """Вычисляет контрольную сумму расписания в таблице 'schedule' на стороне БД.
+
+    Строки вида 'from_station_id,to_station_id,is_weekend,HH:MM:SS', упорядоченные по
+    всем столбцам и соединенные переводом строки, хешируются MD5. Позволяет проверить
+    актуальность скомпилированного расписания без загрузки всех строк.
+
+    Args:
+        current_session: Фабрика для асинхронной сессии.
+
+    Returns:
+        MD5 в шестнадцатеричном виде.
+    """
+    row = func.concat_ws(
+        ',',
+        Schedule.from_station_id,
+        Schedule.to_station_id,
+        cast(Schedule.is_weekend, Integer),
+        func.to_char(Schedule.departure_time, 'HH24:MI:SS'),
+    )
+    ordering = (
+        Schedule.from_station_id,
+        Schedule.to_station_id,
+        Schedule.is_weekend,
+        Schedule.departure_time,
+    )
+    rows = func.string_agg(row, aggregate_order_by(literal('\n'), *ordering))
+    statement = select(func.md5(func.coalesce(rows, '')))
+
+    async with current_session() as session:
+        return await session.scalar(statement)
 
 
 async def insert_favorite(
@@ -138,7 +335,7 @@ async def insert_favorite(
 
     Функция делает запрос к БД и добавляет избранный маршрут пользователя в таблицу
     'favorite'. При уникальности маршрута возвращает новую запись в виде объектов
-    Favorite. Иначе возвращает None.
+    Favorite и добавляет ее в кэш избранного. Иначе возвращает None.
 
     Args:
         telegram_user: Пользователь бота.
@@ -161,11 +358,15 @@ async def insert_favorite(
         Favorite
     )
 
+    global _favorites_writes
     async with current_session() as session:
         new_favorite = await session.scalar(statement)
         await session.commit()
+        _favorites_writes += 1
         if new_favorite:
             await session.refresh(new_favorite)
+            if (cached_favorites := FAVORITES_CACHE.get(telegram_user.id)) is not None:
+                FAVORITES_CACHE.set(telegram_user.id, (*cached_favorites, new_favorite))
         return new_favorite
 
 
@@ -176,8 +377,8 @@ async def select_favorites(
     """Извлекает избранный маршрут пользователя из таблицы 'favorite'.
 
     Функция делает запрос к БД с переданным id пользователя бота для извлечения
-    его избранных маршрутов. Возвращает их при наличии в виде коллекции объектов
-    Favorite. Иначе возвращает None.
+    его избранных маршрутов, если их нет в кэше избранного. Возвращает их при наличии
+    в виде коллекции объектов Favorite. Иначе возвращает None.
 
     Args:
         telegram_user: Пользователь бота.
@@ -186,16 +387,26 @@ async def select_favorites(
     Returns:
         Коллекция объектов Favorite соответствующих запросу из БД или None.
     """
-    statement = select(
-        Favorite
-    ).where(
-        Favorite.bot_user_id == telegram_user.id,
-    ).order_by(
-        Favorite.favorite_id
+    if (cached_favorites := FAVORITES_CACHE.get(telegram_user.id)) is not None:
+        return cached_favorites
+
+    bot_user_id = telegram_user.id
+    statement = lambda_stmt(
+        lambda: select(
+            Favorite
+        ).where(
+            Favorite.bot_user_id == bot_user_id,
+        ).order_by(
+            Favorite.favorite_id
+        )
     )
 
+    favorites_writes = _favorites_writes
     async with current_session() as session:
-        return (await session.scalars(statement)).all()
+        favorites = (await session.scalars(statement)).all()
+    if favorites_writes == _favorites_writes:
+        FAVORITES_CACHE.set(telegram_user.id, favorites)
+    return favorites
 
 
 async def delete_favorites(
@@ -205,7 +416,7 @@ async def delete_favorites(
     """Удаляет избранный маршрут пользователя из таблицы 'favorite'.
 
     Функция делает запрос к БД с id пользователя и удаляет из таблицы 'favorite' все его
-    избранные маршруты.
+    избранные маршруты, после чего сохраняет в кэше избранного пустой список.
 
     Args:
         telegram_user: Пользователь бота.
@@ -220,9 +431,12 @@ async def delete_favorites(
         Favorite.bot_user_id == telegram_user.id,
     )
 
+    global _favorites_writes
     async with current_session() as session:
         await session.execute(statement)
         await session.commit()
+    _favorites_writes += 1
+    FAVORITES_CACHE.set(telegram_user.id, ())
 
 
 async def favorites_limited(
@@ -231,10 +445,11 @@ async def favorites_limited(
 ) -> bool:
     """Проверяет лимит избранных маршрутов пользователя в таблице 'favorite'.
 
-    Функция делает запрос к БД и проверяет количество избранных маршрутов в таблице
-    'favorite' для данного пользователя. Возвращает результат проверки достигнут лимит
-    максимального количества избранных маршрутов на одного пользователя, указанного в
-    конфигурации.
+    Функция проверяет количество избранных маршрутов пользователя по кэшу
+    избранного, а при его отсутствии делает запрос к таблице 'favorite'. Изменения,
+    сделанные другими экземплярами бота, учитываются после устаревания записи кэша.
+    Возвращает результат проверки достигнут лимит максимального количества
+    избранных маршрутов на одного пользователя, указанного в конфигурации.
 
     Args:
         telegram_user: Пользователь бота.
@@ -243,14 +458,634 @@ async def favorites_limited(
     Returns:
         True, если достигнут лимит на избранное, иначе False.
     """
+    if (cached_favorites := FAVORITES_CACHE.get(telegram_user.id)) is not None:
+        return len(cached_favorites) >= settings.LIMIT_FAVORITES
+
+    bot_user_id = telegram_user.id
+    statement = lambda_stmt(
+        lambda: select(
+            func.count()
+        ).select_from(
+            Favorite
+        ).where(
+            Favorite.bot_user_id == bot_user_id,
+        )
+    )
+
+    async with current_session() as session:
+        count = await session.scalar(statement)
+        return count >= settings.LIMIT_FAVORITES
+
+
+async def select_departure_times(
+        from_station_id: int,
+        to_station_id: int,
+        current_session: async_sessionmaker[AsyncSession] = async_session,
+) -> dict[bool, list[datetime.time]]:
+    """Извлекает все время отправления поездов по маршруту из таблицы 'schedule'.
+
+    Args:
+        from_station_id: id станции отправления поезда.
+        to_station_id: id конечной станции направления движения поездов.
+        current_session: Фабрика для асинхронной сессии.
+
+    Returns:
+        Словарь, где ключом является признак расписания выходного дня, а значением
+        время отправления поездов по возрастанию.
+    """
+    statement = select(
+        Schedule.is_weekend,
+        Schedule.departure_time,
+    ).where(
+        Schedule.from_station_id == from_station_id,
+        Schedule.to_station_id == to_station_id,
+    ).order_by(
+        Schedule.is_weekend,
+        Schedule.departure_time,
+    )
+
+    departure_times: dict[bool, list[datetime.time]] = {False: [], True: []}
+    async with current_session() as session:
+        for is_weekend, departure_time in await session.execute(statement):
+            departure_times[is_weekend].append(departure_time)
+    return departure_times
+
+
+async def insert_alert(
+        telegram_user: User,
+        from_station_id: int,
+        to_station_id: int,
+        minutes_before: int,
+        departure_at: datetime.datetime,
+        is_recurring: bool,
+        current_session: async_sessionmaker[AsyncSession] = async_session,
+) -> Alert:
+    """Добавляет подписку на уведомление о поезде в таблицу 'alert'.
+
+    Args:
+        telegram_user: Пользователь бота.
+        from_station_id: id станции отправления поезда.
+        to_station_id: id конечной станции направления движения поездов.
+        minutes_before: За сколько минут до отправления поезда отправить уведомление.
+        departure_at: Дата и время отправления поезда.
+        is_recurring: Повторять уведомление ежедневно.
+        current_session: Фабрика для асинхронной сессии.
+
+    Returns:
+        Новый объект Alert.
+    """
+    alert = Alert(
+        bot_user_id=telegram_user.id,
+        from_station_id=from_station_id,
+        to_station_id=to_station_id,
+        minutes_before=minutes_before,
+        departure_at=departure_at,
+        is_recurring=is_recurring,
+        departure_time=departure_at.time(),
+        fire_at=departure_at - datetime.timedelta(minutes=minutes_before),
+    )
+
+    async with current_session() as session:
+        session.add(alert)
+        await session.commit()
+    return alert
+
+
+async def select_alerts(
+        current_session: async_sessionmaker[AsyncSession] = async_session,
+) -> t.Sequence[Alert]:
+    """Извлекает все подписки на уведомления из таблицы 'alert'.
+
+    Args:
+        current_session: Фабрика для асинхронной сессии.
+
+    Returns:
+        Коллекция объектов Alert.
+    """
+    statement = select(Alert).order_by(Alert.alert_id)
+
+    async with current_session() as session:
+        return (await session.scalars(statement)).all()
+
+
+async def claim_due_alerts(
+        now: datetime.datetime,
+        claim_until: datetime.datetime,
+        current_session: async_sessionmaker[AsyncSession] = async_session,
+) -> t.Sequence[Alert]:
+    """Захватывает подписки, время отправки уведомлений которых наступило.
+
+    Время отправки захваченных подписок переносится на claim_until одним запросом,
+    а строки, захваченные другим процессом бота, пропускаются. Поэтому каждое
+    уведомление отправляет один процесс, а если он остановится, не успев его
+    отправить, уведомление захватит другой процесс после claim_until.
+
+    Args:
+        now: Текущее время.
+        claim_until: Время, до которого подписки закреплены за процессом.
+        current_session: Фабрика для асинхронной сессии.
+
+    Returns:
+        Коллекция захваченных объектов Alert.
+    """
+    due_ids = (
+        select(Alert.alert_id)
+        .where(Alert.fire_at <= now)
+        .with_for_update(skip_locked=True)
+        .scalar_subquery()
+    )
+    statement = (
+        update(Alert)
+        .where(Alert.alert_id.in_(due_ids))
+        .values(fire_at=claim_until)
+        .returning(Alert)
+        .execution_options(synchronize_session=False)
+    )
+
+    async with current_session() as session:
+        claimed = (await session.scalars(statement)).all()
+        await session.commit()
+    return claimed
+
+
+async def update_alert_fire_times(
+        fire_times: dict[int, tuple[datetime.datetime, datetime.datetime]],
+        current_session: async_sessionmaker[AsyncSession] = async_session,
+) -> None:
+    """Обновляет время отправки уведомлений и отправления поездов в таблице 'alert'.
+
+    Args:
+        fire_times: Время отправки уведомления и отправления поезда по id подписки.
+        current_session: Фабрика для асинхронной сессии.
+    """
+    if not fire_times:
+        return
+
+    table = Alert.__table__
+    statement = (
+        update(table)
+        .where(table.c.alert_id == bindparam('b_alert_id'))
+        .values(
+            fire_at=bindparam('b_fire_at'),
+            departure_at=bindparam('b_departure_at'),
+        )
+    )
+    parameters = [
+        {'b_alert_id': alert_id, 'b_fire_at': fire_at, 'b_departure_at': departure_at}
+        for alert_id, (fire_at, departure_at) in fire_times.items()
+    ]
+
+    async with current_session() as session:
+        await session.execute(statement, parameters)
+        await session.commit()
+
+
+async def delete_alerts(
+        alert_ids: t.Collection[int] | None = None,
+        telegram_user: User | None = None,
+        current_session: async_sessionmaker[AsyncSession] = async_session,
+) -> list[int]:
+    """Удаляет подписки на уведомления из таблицы 'alert'.
+
+    Args:
+        alert_ids: id подписок, например отправленных разовых уведомлений.
+        telegram_user: Пользователь бота, все подписки которого нужно удалить.
+        current_session: Фабрика для асинхронной сессии.
+
+    Returns:
+        Список id удаленных подписок.
+    """
+    conditions = []
+    if alert_ids is not None:
+        conditions.append(Alert.alert_id.in_(alert_ids))
+    if telegram_user is not None:
+        conditions.append(Alert.bot_user_id == telegram_user.id)
+    if not conditions:
+        return []
+
+    statement = delete(Alert).where(*conditions).returning(Alert.alert_id)
+
+    async with current_session() as session:
+        deleted_ids = list((await session.scalars(statement)).all())
+        await session.commit()
+    return deleted_ids
+
+
+async def alerts_limited(
+        telegram_user: User,
+        current_session: async_sessionmaker[AsyncSession] = async_session,
+) -> bool:
+    """Проверяет лимит подписок на уведомления пользователя в таблице 'alert'.
+
+    Args:
+        telegram_user: Пользователь бота.
+        current_session: Фабрика для асинхронной сессии.
+
+    Returns:
+        True, если достигнут лимит подписок, иначе False.
+    """
     statement = select(
         func.count()
     ).select_from(
-        Favorite
+        Alert
     ).where(
-        Favorite.bot_user_id == telegram_user.id,
+        Alert.bot_user_id == telegram_user.id,
     )
 
     async with current_session() as session:
-        count = await session.scalar(statement)
-        return count >= settings.LIMIT_FAVORITES
+        return await session.scalar(statement) >= settings.LIMIT_ALERTS
+
+
+async def select_chat_data(
+        current_session: async_sessionmaker[AsyncSession] = async_session,
+) -> dict[int, dict[str, t.Any]]:
+    """Извлекает данные чатов из таблицы 'chat_data'.
+
+    Args:
+        current_session: Фабрика для асинхронной сессии.
+
+    Returns:
+        Словарь, где ключом является id чата, а значением данные чата.
+    """
+    statement = select(ChatData.chat_id, ChatData.data)
+
+    async with current_session() as session:
+        return {chat_id: data for chat_id, data in await session.execute(statement)}
+
+
+async def select_conversations(
+        name: str,
+        timeout: int | None = None,
+        current_session: async_sessionmaker[AsyncSession] = async_session,
+) -> dict[tuple[int | str, ...], int]:
+    """Извлекает состояния диалогов ConversationHandler из таблицы 'conversation_state'.
+
+    Если передан timeout, то состояния диалогов, которые не менялись дольше timeout
+    секунд, удаляются из таблицы и не возвращаются.
+
+    Args:
+        name: Имя ConversationHandler.
+        timeout: Таймаут диалога в секундах.
+        current_session: Фабрика для асинхронной сессии.
+
+    Returns:
+        Словарь, где ключом является ключ диалога, а значением его состояние.
+    """
+    statement = select(
+        ConversationState.conversation_key,
+        ConversationState.state,
+    ).where(
+        ConversationState.name == name,
+    )
+
+    async with current_session() as session:
+        if timeout is not None:
+            expired_at = func.now() - datetime.timedelta(seconds=timeout)
+            await session.execute(
+                delete(
+                    ConversationState
+                ).where(
+                    ConversationState.name == name,
+                    ConversationState.updated_at < expired_at,
+                ).execution_options(
+                    synchronize_session=False,
+                )
+            )
+            await session.commit()
+        return {tuple(key): state for key, state in await session.execute(statement)}
+
+
+async def try_lock_persistence(
+        current_engine: AsyncEngine = async_engine,
+) -> AsyncConnection | None:
+    """Пытается захватить advisory-блокировку записи состояния диалогов.
+
+    Блокировка уровня сессии принадлежит отдельному соединению и освобождается
+    функцией unlock_persistence или при разрыве соединения, например, если процесс
+    бота завершился аварийно.
+
+    Args:
+        current_engine: Асинхронный движок БД.
+
+    Returns:
+        Соединение, которому принадлежит блокировка, или None, если ее удерживает
+        другой процесс.
+    """
+    connection = await current_engine.connect()
+    try:
+        statement = select(func.pg_try_advisory_lock(PERSISTENCE_LOCK_ID))
+        if await connection.scalar(statement):
+            return connection
+    except Exception:
+        await connection.close()
+        raise
+    await connection.close()
+    return None
+
+
+async def unlock_persistence(connection: AsyncConnection) -> None:
+    """Освобождает блокировку, захваченную try_lock_persistence, и закрывает соединение.
+
+    Args:
+        connection: Соединение, которому принадлежит блокировка.
+
+    Returns:
+        None
+    """
+    try:
+        await connection.scalar(select(func.pg_advisory_unlock(PERSISTENCE_LOCK_ID)))
+    finally:
+        await connection.close()
+
+
+async def save_persistence_data(
+        chat_data: dict[int, dict[str, t.Any]],
+        dropped_chat_ids: t.Collection[int],
+        conversations: dict[tuple[str, tuple[int | str, ...]], int | None],
+        current_session: async_sessionmaker[AsyncSession] = async_session,
+) -> None:
+    """Записывает измененные данные чатов и состояния диалогов в одной транзакции.
+
+    Данные чатов и состояния диалогов добавляются или обновляются одним запросом на
+    каждую таблицу. Состояние диалога None означает завершение диалога и удаляет запись.
+
+    Args:
+        chat_data: Словарь измененных данных чатов, где ключом является id чата.
+        dropped_chat_ids: id чатов, данные которых нужно удалить.
+        conversations: Словарь измененных состояний диалогов, где ключом является
+          пара из имени ConversationHandler и ключа диалога.
+        current_session: Фабрика для асинхронной сессии.
+
+    Returns:
+        None
+    """
+    statements = []
+    if chat_data:
+        insert_chat_data = insert(ChatData).values(
+            [{'chat_id': chat_id, 'data': data} for chat_id, data in chat_data.items()]
+        )
+        statements.append(
+            insert_chat_data.on_conflict_do_update(
+                index_elements=[ChatData.chat_id],
+                set_={'data': insert_chat_data.excluded.data, 'updated_at': func.now()},
+            )
+        )
+    if dropped_chat_ids:
+        statements.append(
+            delete(ChatData).where(ChatData.chat_id.in_(dropped_chat_ids))
+        )
+
+    new_states = [
+        {'name': name, 'conversation_key': list(key), 'state': state}
+        for (name, key), state in conversations.items()
+        if state is not None
+    ]
+    if new_states:
+        insert_states = insert(ConversationState).values(new_states)
+        statements.append(
+            insert_states.on_conflict_do_update(
+                index_elements=[
+                    ConversationState.name,
+                    ConversationState.conversation_key,
+                ],
+                set_={'state': insert_states.excluded.state, 'updated_at': func.now()},
+            )
+        )
+    ended_conversations = [
+        (name, list(key))
+        for (name, key), state in conversations.items()
+        if state is None
+    ]
+    if ended_conversations:
+        conversation_key = tuple_(
+            ConversationState.name, ConversationState.conversation_key
+        )
+        statements.append(
+            delete(
+                ConversationState
+            ).where(
+                conversation_key.in_(ended_conversations),
+            )
+        )
+
+    if not statements:
+        return
+
+    async with current_session() as session:
+        for statement in statements:
+            await session.execute(statement)
+        await session.commit()
+
+
+async def insert_timetable_version(
+        source: str,
+        stations_dict: dict[int, str],
+        rows: t.Iterable[tuple[int, int, bool, datetime.time]],
+        current_session: async_sessionmaker[AsyncSession] = async_session,
+) -> int:
+    """Создает версию расписания и загружает станции и расписание в таблицы
+    'station_staging' и 'schedule_staging'.
+
+    Рабочие таблицы 'station' и 'schedule' не изменяются до вызова
+    promote_timetable_version.
+
+    Args:
+        source: Описание источника версии, например путь к файлу.
+        stations_dict: Словарь, где ключом является station_id, а значением
+          station_name.
+        rows: Строки вида (from_station_id, to_station_id, is_weekend, departure_time).
+          Повторяющиеся строки загружаются один раз.
+        current_session: Фабрика для асинхронной сессии.
+
+    Returns:
+        id созданной версии.
+    """
+    async with current_session() as session:
+        version_id = await session.scalar(
+            insert(
+                TimetableVersion
+            ).values(
+                source=source,
+            ).returning(
+                TimetableVersion.version_id
+            )
+        )
+        if stations_dict:
+            await session.execute(
+                insert(StationStaging),
+                [
+                    {
+                        'version_id': version_id,
+                        'station_id': station_id,
+                        'station_name': station_name,
+                    }
+                    for station_id, station_name in stations_dict.items()
+                ],
+            )
+        if unique_rows := set(rows):
+            await session.execute(
+                insert(ScheduleStaging),
+                [
+                    {
+                        'version_id': version_id,
+                        'from_station_id': from_station_id,
+                        'to_station_id': to_station_id,
+                        'is_weekend': is_weekend,
+                        'departure_time': departure_time,
+                    }
+                    for from_station_id, to_station_id, is_weekend, departure_time
+                    in sorted(unique_rows)
+                ],
+            )
+        await session.commit()
+    return version_id
+
+
+async def set_timetable_version_status(
+        version_id: int,
+        status: str,
+        current_session: async_sessionmaker[AsyncSession] = async_session,
+) -> None:
+    """Изменяет статус версии расписания, например после ее проверки.
+
+    Args:
+        version_id: id версии расписания.
+        status: Новый статус.
+        current_session: Фабрика для асинхронной сессии.
+
+    Returns:
+        None
+    """
+    statement = update(
+        TimetableVersion
+    ).where(
+        TimetableVersion.version_id == version_id,
+    ).values(
+        status=status,
+    )
+
+    async with current_session() as session:
+        await session.execute(statement)
+        await session.commit()
+
+
+async def promote_timetable_version(
+        version_id: int,
+        current_session: async_sessionmaker[AsyncSession] = async_session,
+) -> None:
+    """Переносит проверенную версию расписания в таблицы 'station' и 'schedule'.
+
+    Все изменения выполняются в одной транзакции, поэтому запросы бота видят либо
+    прежнее расписание, либо новое целиком. Таблица 'schedule' блокируется от записи
+    до конца транзакции, что исключает одновременный перенос двух версий, но не мешает
+    чтению. Станции, отсутствующие в версии, удаляются вместе с избранным пользователей.
+
+    Args:
+        version_id: id версии расписания со статусом 'validated'.
+        current_session: Фабрика для асинхронной сессии.
+
+    Raises:
+        ValueError: Если версия не найдена или не прошла проверку.
+    """
+    async with current_session() as session:
+        await session.execute(text('LOCK TABLE schedule IN EXCLUSIVE MODE'))
+        status = await session.scalar(
+            select(
+                TimetableVersion.status
+            ).where(
+                TimetableVersion.version_id == version_id,
+            ).with_for_update()
+        )
+        if status != 'validated':
+            raise ValueError(
+                f'Версия расписания {version_id} имеет статус {status}, '
+                f'ожидается validated'
+            )
+
+        insert_stations = insert(Station).from_select(
+            [Station.station_id, Station.station_name],
+            select(StationStaging.station_id, StationStaging.station_name).where(
+                StationStaging.version_id == version_id,
+            ),
+        )
+        await session.execute(
+            insert_stations.on_conflict_do_update(
+                index_elements=[Station.station_id],
+                set_={'station_name': insert_stations.excluded.station_name},
+            )
+        )
+        await session.execute(delete(Schedule))
+        await session.execute(
+            insert(Schedule).from_select(
+                [
+                    Schedule.from_station_id,
+                    Schedule.to_station_id,
+                    Schedule.is_weekend,
+                    Schedule.departure_time,
+                ],
+                select(
+                    ScheduleStaging.from_station_id,
+                    ScheduleStaging.to_station_id,
+                    ScheduleStaging.is_weekend,
+                    ScheduleStaging.departure_time,
+                ).where(
+                    ScheduleStaging.version_id == version_id,
+                ),
+            )
+        )
+        await session.execute(
+            delete(
+                Station
+            ).where(
+                Station.station_id.not_in(
+                    select(
+                        StationStaging.station_id
+                    ).where(
+                        StationStaging.version_id == version_id,
+                    ),
+                ),
+            )
+        )
+        await session.execute(
+            update(
+                TimetableVersion
+            ).where(
+                TimetableVersion.status == 'active',
+            ).values(
+                status='archived',
+            )
+        )
+        await session.execute(
+            update(
+                TimetableVersion
+            ).where(
+                TimetableVersion.version_id == version_id,
+            ).values(
+                status='active',
+                promoted_at=func.now(),
+            )
+        )
+        await session.commit()
+
+
+async def select_active_timetable_version(
+        current_session: async_sessionmaker[AsyncSession] = async_session,
+) -> int | None:
+    """Извлекает id версии расписания, находящейся в таблицах 'station' и 'schedule'.
+
+    Запрос выполняется периодически каждым процессом бота для обнаружения новой версии.
+
+    Args:
+        current_session: Фабрика для асинхронной сессии.
+
+    Returns:
+        id версии или None, если расписание загружено без версий.
+    """
+    statement = select(
+        TimetableVersion.version_id
+    ).where(
+        TimetableVersion.status == 'active',
+    )
+
+    async with current_session() as session:
+        return await session.scalar(statement)
@@ -1,10 +1,12 @@
 import logging
+import time
 from functools import wraps
 import typing as t
 
 from telegram import Update
 from telegram.ext import ContextTypes
 
+from app import metrics
 from app.config import settings
 
 logger = logging.getLogger(__name__)
@@ -25,6 +27,8 @@ def write_log(func: F) -> F:
             command = update.callback_query.data
         elif update.message:
             command = update.message.text
+        elif update.inline_query:
+            command = f'@inline {update.inline_query.query}'
         else:
             command = "undefined"
         logger_kwargs = {
@@ -32,7 +36,19 @@ def write_log(func: F) -> F:
             'first_name': bot_user.username or bot_user.first_name if bot_user else None,
             'command': command,
         }
-        logger.info(settings.LOGGER_TEXT.format(**logger_kwargs))
-        return await func(update, context)
+        logger.info(
+            settings.LOGGER_TEXT.format(**logger_kwargs),
+            extra={'bot_user_id': logger_kwargs['id'], 'command': command},
+        )
+        start = time.perf_counter()
+        try:
+            result = await func(update, context)
+        except Exception:
+            metrics.METRICS.observe_handler(
+                func.__name__, time.perf_counter() - start, error=True
+            )
+            raise
+        metrics.METRICS.observe_handler(func.__name__, time.perf_counter() - start)
+        return result
 
     return t.cast(F, wrapper)
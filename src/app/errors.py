@@ -0,0 +1,181 @@
+"""Модуль содержит группировку ошибок бота для уведомления разработчика.
+
+Ошибки группируются по отпечатку из типа исключения и стека вызовов без номеров
+строк и текста сообщения. О первой ошибке с новым отпечатком разработчик узнает
+сразу, а повторы считаются в памяти и отправляются сводкой раз в
+ERRORS_DIGEST_INTERVAL секунд. Поэтому при отказе БД разработчик получает одно
+подробное сообщение и сводку, а не сообщение на каждое обновление.
+"""
+import dataclasses
+import datetime as dt
+import hashlib
+import html
+import traceback
+
+from telegram.constants import ParseMode
+from telegram.ext import ContextTypes
+
+from app import messages, rate_limiter
+from app.config import settings
+
+# Ограничение длины сообщения Bot API
+MESSAGE_LIMIT = 4096
+# Количество исключений в цепочке __cause__ и __context__, учитываемых в отпечатке
+MAX_CHAIN_DEPTH = 5
+
+
+@dataclasses.dataclass
+class ErrorStats:
+    """Счетчики ошибок с одним отпечатком."""
+
+    fingerprint: str
+    error_type: str
+    message: str
+    first_seen: dt.datetime
+    last_seen: dt.datetime
+    count: int = 0
+    pending_count: int = 0
+    reported: bool = False
+    reporting: bool = False
+
+
+def get_fingerprint(error: BaseException) -> str:
+    """Вычисляет отпечаток ошибки по типу исключения, цепочке причин и стеку вызовов.
+
+    Номера строк и текст сообщения не учитываются, поэтому отпечаток не меняется при
+    правке кода выше места ошибки и для разных значений в сообщении.
+    """
+    parts: list[str] = []
+    current: BaseException | None = error
+    for _ in range(MAX_CHAIN_DEPTH):
+        if current is None:
+            break
+        parts.append(f'{type(current).__module__}.{type(current).__qualname__}')
+        parts += [
+            f'{frame.filename.rsplit("/", 1)[-1]}:{frame.name}'
+            for frame in traceback.extract_tb(current.__traceback__)
+        ]
+        current = current.__cause__ or current.__context__
+    return hashlib.sha1('\n'.join(parts).encode()).hexdigest()[:12]
+
+
+class ErrorAggregator:
+    """Считает ошибки бота по отпечаткам и формирует их сводку.
+
+    Хранится не более max_fingerprints отпечатков, при переполнении удаляются
+    отпечатки, которые дольше всех не повторялись.
+    """
+
+    def __init__(
+            self,
+            max_fingerprints: int = settings.ERRORS_MAX_FINGERPRINTS,
+    ) -> None:
+        self._max_fingerprints = max_fingerprints
+        self.errors: dict[str, ErrorStats] = {}
+
+    def record(
+            self,
+            error: BaseException,
+            now: dt.datetime | None = None,
+    ) -> tuple[str, bool]:
+        """Учитывает ошибку.
+
+        Отпечаток считается отправленным разработчику только после вызова
+        mark_reported, а пока отправка не завершена, повторы попадают в сводку.
+
+        Returns:
+            Отпечаток ошибки и признак того, что о нем нужно сразу сообщить.
+        """
+        now = now or dt.datetime.now()
+        fingerprint = get_fingerprint(error)
+        if (stats := self.errors.get(fingerprint)) is None:
+            if len(self.errors) >= self._max_fingerprints:
+                oldest = min(self.errors.values(), key=lambda item: item.last_seen)
+                del self.errors[oldest.fingerprint]
+            stats = self.errors[fingerprint] = ErrorStats(
+                fingerprint, type(error).__name__, str(error), now, now
+            )
+
+        stats.count += 1
+        stats.last_seen = now
+        stats.message = str(error)
+        if not stats.reported and not stats.reporting:
+            stats.reporting = True
+            return fingerprint, True
+        stats.pending_count += 1
+        return fingerprint, False
+
+    def mark_reported(self, fingerprint: str, reported: bool = True) -> None:
+        """Завершает отправку сообщения об ошибке с новым отпечатком.
+
+        Args:
+            fingerprint: Отпечаток ошибки.
+            reported: Признак успешной отправки. Если сообщение не отправлено, то о
+              следующей ошибке с этим отпечатком будет сообщено сразу.
+        """
+        if (stats := self.errors.get(fingerprint)) is not None:
+            stats.reporting = False
+            stats.reported = reported
+
+    def digest(self) -> tuple[str, dict[str, int]] | None:
+        """Формирует сводку повторов ошибок с предыдущей сводки.
+
+        Счетчики не сбрасываются, после отправки сводки нужно вызвать acknowledge.
+        Отпечатки, не поместившиеся в сообщение, остаются до следующей сводки.
+
+        Returns:
+            Текст сводки в HTML и количество повторов каждого отпечатка, попавшего в
+            текст сводки, или None, если повторов не было.
+        """
+        pending = sorted(
+            (stats for stats in self.errors.values() if stats.pending_count),
+            key=lambda stats: stats.pending_count,
+            reverse=True,
+        )
+        if not pending:
+            return None
+
+        text = messages.ERRORS_DIGEST.format(
+            minutes=settings.ERRORS_DIGEST_INTERVAL // 60
+        )
+        pending_counts = {}
+        for index, stats in enumerate(pending):
+            line = '\n' + messages.ERRORS_DIGEST_LINE.format(
+                count=stats.pending_count,
+                total=stats.count,
+                error_type=html.escape(stats.error_type),
+                fingerprint=stats.fingerprint,
+                message=html.escape(stats.message[:200]),
+            )
+            if len(text) + len(line) > MESSAGE_LIMIT - 100:
+                more = messages.ERRORS_DIGEST_MORE.format(count=len(pending) - index)
+                text += '\n' + more
+                break
+            text += line
+            pending_counts[stats.fingerprint] = stats.pending_count
+        return text, pending_counts
+
+    def acknowledge(self, pending_counts: dict[str, int]) -> None:
+        """Вычитает из счетчиков повторы, отправленные в сводке.
+
+        Повторы, учтенные во время отправки сводки, попадут в следующую сводку.
+        """
+        for fingerprint, count in pending_counts.items():
+            if (stats := self.errors.get(fingerprint)) is not None:
+                stats.pending_count = max(stats.pending_count - count, 0)
+
+    async def digest_job(self, context: ContextTypes.DEFAULT_TYPE) -> None:
+        """Задача JobQueue, отправляющая разработчику сводку ошибок."""
+        if (digest := self.digest()) is None:
+            return
+        text, pending_counts = digest
+        await context.bot.send_message(
+            chat_id=settings.DEVELOPER_TG_ID,
+            text=text,
+            parse_mode=ParseMode.HTML,
+            rate_limit_args=rate_limiter.get_background_args(context.bot),
+        )
+        self.acknowledge(pending_counts)
+
+
+ERRORS = ErrorAggregator()
@@ -1,12 +1,15 @@
+import asyncio
 import datetime as dt
 import html
 import json
 import logging
+import math
 import traceback
 from warnings import filterwarnings
 
-from telegram import Update
+from telegram import InlineQueryResultArticle, InputTextMessageContent, Update
 from telegram.constants import ParseMode
+from telegram.error import Forbidden
 from telegram.ext import (
     CallbackQueryHandler,
     CommandHandler,
@@ -18,15 +21,29 @@ from telegram.ext import (
 from telegram.warnings import PTBUserWarning
 
 from app import (
+    alerts,
+    cache,
     commands,
     db,
+    errors,
     keyboards,
     messages,
+    metrics,
+    models,
+    rate_limiter,
+    timetable,
+    trips,
+    users,
 )
 from app.config import settings
 from app.decorators import write_log
-from app.stations import get_stations_dict
-from app.utils import metro_is_closed
+from app.stations import find_stations, get_stations_dict
+from app.utils import (
+    format_time_to_train,
+    get_time_to_train,
+    is_weekend,
+    metro_is_closed,
+)
 
 filterwarnings(
     action='ignore',
@@ -45,7 +62,7 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
         return
 
     text = messages.START.format(update.effective_user.first_name) + '\n\n' + messages.HELP
-    await db.insert_user(update.effective_user)
+    users.USERS_BUFFER.add(update.effective_user)
     await update.message.reply_text(text)
 
 
@@ -59,22 +76,25 @@ async def help_handler(update: Update, _: ContextTypes.DEFAULT_TYPE) -> None:
 @write_log
 async def stations(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     """
-    Обработчик команд /schedule и /add_favorite.
+    Обработчик команд /schedule, /trip, /add_favorite и /notify.
     Начало диалога. Отправляет список станций метрополитена в виде кнопок.
-    Если получена команда 'schedule' и метрополитен открыт, то отправляет
-     список станций.
-    Если получена команда 'add_favorite' и список избранного пользователя не
-     полон, то также отправляет список станций.
+    Если получена команда 'schedule' или 'trip' и метрополитен открыт, то
+     отправляет список станций.
+    Если получена команда 'add_favorite' или 'notify' и лимит избранного или
+     уведомлений пользователя не достигнут, то также отправляет список станций.
     """
     if update.effective_user is None or update.message is None:
         await wrong_command(update, context)
         return ConversationHandler.END
 
     command = update.message.text or ""
-    if commands.SCHEDULE in command and await metro_is_closed():
+    needs_trains = commands.SCHEDULE in command or commands.TRIP in command
+    if needs_trains and await metro_is_closed():
         await update.message.reply_text(messages.METRO_IS_CLOSED)
     elif commands.ADD_FAVORITE in command and await db.favorites_limited(update.effective_user):
         await update.message.reply_text(messages.FAVORITES_LIMIT_REACHED)
+    elif commands.NOTIFY in command and await db.alerts_limited(update.effective_user):
+        await update.message.reply_text(messages.ALERTS_LIMIT_REACHED)
     else:
         bot_message = await update.message.reply_text(
             messages.CHOICE_STATION,
@@ -82,7 +102,7 @@ async def stations(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
         )
 
         if context.chat_data is not None:
-            context.chat_data["bot_message"] = bot_message
+            context.chat_data["bot_message_id"] = bot_message.message_id
             context.chat_data["command"] = command
 
         return settings.CHOICE_DIRECTION
@@ -92,7 +112,10 @@ async def stations(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
 
 @write_log
 async def directions(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
-    """Этап диалога для выбора направления движения поездов."""
+    """
+    Этап диалога для выбора направления движения поездов.
+    Для команды /trip вместо направления предлагает выбрать станцию назначения.
+    """
     if (query := update.callback_query) is None or context.chat_data is None:
         return ConversationHandler.END
 
@@ -100,7 +123,17 @@ async def directions(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     from_station_id = int(query.data or "-1")
     command = context.chat_data.get("command", "undefined")
 
+    if commands.TRIP in command:
+        context.chat_data['from_station_id'] = from_station_id
+        await query.edit_message_text(
+            text=messages.CHOICE_DESTINATION,
+            reply_markup=keyboards.STATIONS_REPLY_MARKUP,
+        )
+        return settings.FINAL_STAGE
+
     if to_station_id := keyboards.END_STATION_DIRECTION.get(from_station_id):
+        if commands.NOTIFY in command:
+            return await _choice_alert(update, context, from_station_id, to_station_id)
         if commands.SCHEDULE in command:
             await _send_time_to_train(update, from_station_id, to_station_id)
         if commands.ADD_FAVORITE in command:
@@ -119,10 +152,12 @@ async def directions(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
 @write_log
 async def complete_conv(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     """
-    Заключительный этап диалога команд /schedule и /add_favorite.
+    Заключительный этап диалога команд /schedule, /trip и /add_favorite.
     Если была получена команда /schedule, то пользователю будет отправлено
-     время до ближайших поездов.
+     время до ближайших поездов, а для команды /trip время отправления и
+     прибытия поездов до выбранной станции.
     Если получена команда /add_favorite, то сохраняет избранным маршрут в БД.
+    Для команды /notify переходит к выбору уведомления.
     """
     if (query := update.callback_query) is None or context.chat_data is None:
         return ConversationHandler.END
@@ -131,14 +166,137 @@ async def complete_conv(update: Update, context: ContextTypes.DEFAULT_TYPE) -> i
     command = context.chat_data.get("command", "undefined")
     from_station_id = context.chat_data.get("from_station_id", -1)
     to_station_id = int(query.data or "-1")
+    if commands.NOTIFY in command:
+        return await _choice_alert(update, context, from_station_id, to_station_id)
     if commands.SCHEDULE in command:
         await _send_time_to_train(update, from_station_id, to_station_id)
+    if commands.TRIP in command:
+        await query.edit_message_text(
+            await get_text_with_trip(from_station_id, to_station_id),
+            parse_mode=ParseMode.HTML,
+        )
     if commands.ADD_FAVORITE in command:
         await _save_favorite(update, from_station_id, to_station_id)
     context.chat_data.clear()
     return ConversationHandler.END
 
 
+@write_log
+async def save_alert(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+    """
+    Заключительный этап диалога команды /notify.
+    Находит по расписанию ближайший поезд, до которого осталось не меньше
+     выбранного количества минут, и сохраняет в БД подписку со временем отправки
+     уведомления.
+    """
+    if (query := update.callback_query) is None or context.chat_data is None:
+        return ConversationHandler.END
+
+    await query.answer()
+    minutes_before, is_recurring = map(int, (query.data or '0:0').split(':'))
+    from_station_id = context.chat_data.get('from_station_id', -1)
+    to_station_id = context.chat_data.get('to_station_id', -1)
+    context.chat_data.clear()
+
+    departure_at = alerts.get_next_departure(
+        await db.select_departure_times(from_station_id, to_station_id),
+        dt.datetime.now() + dt.timedelta(minutes=minutes_before),
+    )
+    if departure_at is None:
+        await query.edit_message_text(messages.NONE_TRAIN)
+        return ConversationHandler.END
+
+    await users.USERS_BUFFER.ensure(query.from_user)
+    await db.insert_alert(
+        query.from_user,
+        from_station_id,
+        to_station_id,
+        minutes_before,
+        departure_at,
+        bool(is_recurring),
+    )
+    stations_dict = get_stations_dict()
+    text = messages.ADD_ALERT.format(
+        direction=(
+            f'{stations_dict.get(from_station_id)} ➡ {stations_dict.get(to_station_id)}'
+        ),
+        minutes=minutes_before,
+        departure_at=departure_at,
+        recurring=messages.ALERT_RECURRING if is_recurring else '',
+    )
+    await query.edit_message_text(text, parse_mode=ParseMode.HTML)
+    return ConversationHandler.END
+
+
+@write_log
+async def clear_alerts(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """
+    Обработчик команды /clear_notify.
+    Удаляет из БД все уведомления пользователя.
+    """
+    if update.effective_user is None or update.message is None:
+        await wrong_command(update, context)
+        return
+
+    await db.delete_alerts(telegram_user=update.effective_user)
+    await update.message.reply_text(messages.CLEAR_ALERTS)
+
+
+async def send_alerts(context: ContextTypes.DEFAULT_TYPE) -> None:
+    """
+    Задача JobQueue, отправляющая пакетом все наступившие уведомления.
+    Уведомления захватываются в БД, поэтому каждое из них отправляет один процесс
+     бота, а время до поездов рассчитывается один раз на каждый маршрут пакета.
+     Ежедневные уведомления планируются на следующие сутки, разовые и уведомления
+     пользователей, заблокировавших бота, удаляются из БД, а неотправленные
+     повторяются на следующих тиках, пока поезд не отправился.
+    """
+    now = dt.datetime.now()
+    if not (due_alerts := await alerts.claim_due(now)):
+        return
+
+    try:
+        routes = list(dict.fromkeys(
+            (alert.from_station_id, alert.to_station_id) for alert in due_alerts
+        ))
+        texts = dict(zip(routes, await get_texts_with_time_to_train(routes)))
+    except Exception:
+        await alerts.reschedule([], due_alerts, now=now)
+        raise
+    semaphore = asyncio.Semaphore(settings.ALERTS_SEND_CONCURRENCY)
+    # Уведомления отправляются после ответов пользователям, если Bot API ограничен
+    rate_limit_args = rate_limiter.get_background_args(context.bot)
+
+    async def send_alert(alert: models.Alert) -> None:
+        text = messages.ALERT.format(
+            departure_at=alert.departure_at,
+            minutes=alert.minutes_before,
+            text=texts[(alert.from_station_id, alert.to_station_id)],
+        )
+        async with semaphore:
+            await context.bot.send_message(
+                alert.bot_user_id,
+                text,
+                parse_mode=ParseMode.HTML,
+                rate_limit_args=rate_limit_args,
+            )
+
+    results = await asyncio.gather(
+        *(send_alert(alert) for alert in due_alerts), return_exceptions=True
+    )
+    sent, failed, finished_ids = [], [], []
+    for alert, result in zip(due_alerts, results):
+        if isinstance(result, Forbidden):
+            finished_ids.append(alert.alert_id)
+        elif isinstance(result, Exception):
+            logger.warning('Уведомление %s не отправлено: %s', alert.alert_id, result)
+            failed.append(alert)
+        else:
+            sent.append(alert)
+    await alerts.reschedule(sent, failed, finished_ids, now)
+    logger.info('Отправлено уведомлений: %s', len(sent))
+
+
 @write_log
 async def favorites(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """
@@ -152,11 +310,11 @@ async def favorites(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     if await metro_is_closed():
         text = messages.METRO_IS_CLOSED
     elif user_favorites := await db.select_favorites(update.effective_user):
-        favorite_texts = [
-            await get_text_with_time_to_train(favorite.from_station_id, favorite.to_station_id)
+        routes = [
+            (favorite.from_station_id, favorite.to_station_id)
             for favorite in user_favorites
         ]
-        text = '\n\n'.join(favorite_texts)
+        text = '\n\n'.join(await get_texts_with_time_to_train(routes))
     else:
         text = messages.CLEAR_FAVORITES
 
@@ -198,6 +356,18 @@ async def download_log(update: Update, _: ContextTypes.DEFAULT_TYPE) -> None:
     await update.message.reply_document(settings.LOG_FILENAME, filename=filename)
 
 
+@write_log
+async def stats(update: Update, _: ContextTypes.DEFAULT_TYPE) -> None:
+    """Обработчик команды /stats. Отправляет разработчику сводку метрик бота."""
+    if update.message is None:
+        return
+
+    await update.message.reply_text(
+        messages.STATS.format(stats=html.escape(metrics.METRICS.summary())),
+        parse_mode=ParseMode.HTML,
+    )
+
+
 async def _send_time_to_train(
         update: Update,
         from_station_id: int,
@@ -211,6 +381,104 @@ async def _send_time_to_train(
     await query.edit_message_text(text, parse_mode=ParseMode.HTML)
 
 
+@write_log
+async def inline_query(update: Update, _: ContextTypes.DEFAULT_TYPE) -> None:
+    """
+    Обработчик inline-запросов вида '@bot Динамо'.
+    Отправляет время до ближайших поездов в обоих направлениях для станций,
+     название которых содержит текст запроса. Ответы для всех станций
+     рассчитываются не чаще раза в INLINE_BUCKET_SECONDS секунд и общие для всех
+     пользователей, поэтому одинаковые запросы не обращаются к расписанию повторно.
+    """
+    if (query := update.inline_query) is None:
+        return
+
+    if await metro_is_closed():
+        results = [
+            InlineQueryResultArticle(
+                id='closed',
+                title=messages.METRO_IS_CLOSED.split('\n', 1)[0],
+                input_message_content=InputTextMessageContent(messages.METRO_IS_CLOSED),
+            ),
+        ]
+    else:
+        answers = await INLINE_ANSWERS.get()
+        results = [
+            result
+            for station_id in find_stations(query.query)
+            for result in answers.get(station_id, [])
+        ]
+    await query.answer(
+        results[:INLINE_RESULTS_LIMIT],
+        cache_time=settings.INLINE_CACHE_TIME,
+        is_personal=False,
+    )
+
+
+async def get_inline_answers() -> dict[int, list[InlineQueryResultArticle]]:
+    """
+    Функция рассчитывает ответы на inline-запросы для всех станций.
+    Для каждой станции формируется результат на каждое направление движения
+     поездов, а время до поездов по всем маршрутам рассчитывается одним вызовом
+     get_texts_with_time_to_train.
+
+    Returns:
+        Словарь, где ключом является station_id, а значением результаты inline-запроса.
+    """
+    stations_dict = get_stations_dict()
+    routes = [
+        (station_id, terminal_id)
+        for station_id in stations_dict
+        for terminal_id in keyboards.END_STATION_DIRECTION
+        if station_id != terminal_id
+    ]
+    answers: dict[int, list[InlineQueryResultArticle]] = {}
+    texts = await get_texts_with_time_to_train(routes)
+    for (from_station_id, to_station_id), text in zip(routes, texts):
+        answers.setdefault(from_station_id, []).append(
+            InlineQueryResultArticle(
+                id=f'{from_station_id}:{to_station_id}',
+                title=(
+                    f'{stations_dict[from_station_id]} ➡ {stations_dict[to_station_id]}'
+                ),
+                description=text.partition('\n\n')[2],
+                input_message_content=InputTextMessageContent(
+                    text, parse_mode=ParseMode.HTML
+                ),
+            )
+        )
+    return answers
+
+
+INLINE_RESULTS_LIMIT = 50
+INLINE_ANSWERS = cache.BucketCache(
+    get_inline_answers, bucket=settings.INLINE_BUCKET_SECONDS
+)
+metrics.METRICS.register_gauge(
+    'bot_inline_answers_hit_ratio',
+    'Доля inline-запросов, получивших рассчитанные ранее ответы.',
+    lambda: INLINE_ANSWERS.hit_ratio,
+)
+
+
+async def _choice_alert(
+        update: Update,
+        context: ContextTypes.DEFAULT_TYPE,
+        from_station_id: int,
+        to_station_id: int,
+) -> int:
+    """Функция запоминает маршрут и отправляет пользователю варианты уведомления."""
+    if (query := update.callback_query) is None or context.chat_data is None:
+        return ConversationHandler.END
+
+    context.chat_data['from_station_id'] = from_station_id
+    context.chat_data['to_station_id'] = to_station_id
+    await query.edit_message_text(
+        text=messages.CHOICE_ALERT, reply_markup=keyboards.ALERT_REPLY_MARKUP
+    )
+    return settings.ALERT_STAGE
+
+
 async def _save_favorite(
         update: Update,
         from_station_id: int,
@@ -221,7 +489,7 @@ async def _save_favorite(
         return
 
     bot_user = query.from_user
-    await db.insert_user(bot_user)
+    await users.USERS_BUFFER.ensure(bot_user)
     new_favorite = await db.insert_favorite(bot_user, from_station_id, to_station_id)
     if new_favorite:
         text = messages.ADD_FAVORITE.format(direction=new_favorite.direction)
@@ -230,61 +498,203 @@ async def _save_favorite(
     await query.edit_message_text(text, parse_mode=ParseMode.HTML)
 
 
-async def timeout(_: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+async def timeout(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """
     Обработчик таймаута диалога.
     Функция вызывается, если пользователь не ответил в заданное время находясь
      в диалоге.
     """
-    if context.chat_data is not None and (bot_message := context.chat_data.pop("bot_message", None)):
-        await bot_message.edit_text(messages.CONVERSATION_TIMEOUT)
+    if update.effective_chat is None or context.chat_data is None:
+        return
+
+    if bot_message_id := context.chat_data.pop("bot_message_id", None):
+        await context.bot.edit_message_text(
+            messages.CONVERSATION_TIMEOUT,
+            chat_id=update.effective_chat.id,
+            message_id=bot_message_id,
+        )
 
 
 async def get_text_with_time_to_train(from_station_id: int, to_station_id: int) -> str:
-    schedules = await db.select_schedule(from_station_id, to_station_id)
-
-    if not schedules:
-        from_station_name = get_stations_dict().get(from_station_id)
-        to_station_name = get_stations_dict().get(to_station_id)
-        direction = f'{from_station_name} ➡ {to_station_name}'
-        return messages.DIRECTION_TRAIN.format(direction=direction) + '\n\n' + messages.NONE_TRAIN
-
-    text = messages.DIRECTION_TRAIN.format(direction=schedules[0].direction) + '\n\n'
-    if len(schedules) == 1:
-        time_to_train = schedules[0].time_to_train.strftime('%M:%S')
-        return text + messages.LAST_TIME_TRAIN.format(time_to_train=time_to_train)
-
-    text += messages.CLOSEST_TIME_TRAIN.format(time_to_train=schedules[0].time_to_train.strftime('%M:%S'))
-    for schedule in schedules[1:settings.LIMIT_ROW + 1]:
-        text += '\n' + messages.NEXT_TIME_TRAIN.format(time_to_train=schedule.time_to_train.strftime('%M:%S'))
+    """
+    Функция формирует текст со временем до ближайших поездов на маршруте.
+    Если расписание загружено в память, то время рассчитывается по нему без
+     обращения к БД. Иначе отправления берутся из кэша перед БД, а для каждого
+     запроса рассчитывается только обратный отсчет.
+    """
+    if (current_timetable := timetable.get_timetable()) is not None:
+        times_to_train = current_timetable.next_trains(
+            from_station_id, to_station_id, await is_weekend()
+        )
+    else:
+        departure_times = await cache.SCHEDULE_CACHE.select_schedule(
+            from_station_id, to_station_id
+        )
+        now = dt.datetime.now()
+        times_to_train = [
+            get_time_to_train(departure_time, now) for departure_time in departure_times
+        ]
+    return _format_time_to_train_text(from_station_id, to_station_id, times_to_train)
+
+
+async def get_texts_with_time_to_train(routes: list[tuple[int, int]]) -> list[str]:
+    """
+    Функция формирует тексты со временем до ближайших поездов сразу для
+     нескольких маршрутов.
+    Если расписание загружено в память, то время для всех маршрутов
+     рассчитывается одним пакетным запросом. Иначе маршруты запрашиваются
+     конкурентно, поэтому время ответа не растет с количеством маршрутов.
+    """
+    if (current_timetable := timetable.get_timetable()) is None:
+        return await asyncio.gather(
+            *(
+                get_text_with_time_to_train(from_station_id, to_station_id)
+                for from_station_id, to_station_id in routes
+            )
+        )
+
+    waiting_times = current_timetable.next_trains_batch(routes, await is_weekend())
+    return [
+        _format_time_to_train_text(
+            from_station_id,
+            to_station_id,
+            [
+                dt.timedelta(seconds=seconds)
+                for seconds in row if not math.isnan(seconds)
+            ],
+        )
+        for (from_station_id, to_station_id), row in zip(routes, waiting_times.tolist())
+    ]
+
+
+async def get_text_with_trip(from_station_id: int, to_station_id: int) -> str:
+    """
+    Функция формирует текст со временем отправления и прибытия ближайших поездов
+     между станциями по планировщику поездок.
+    """
+    if from_station_id == to_station_id:
+        return messages.TRIP_SAME_STATION
+
+    planner = trips.get_planner()
+    if planner is None:
+        return messages.TRIP_UNAVAILABLE
+    travel_time = planner.get_travel_time(from_station_id, to_station_id)
+    if math.isinf(travel_time):
+        return messages.TRIP_UNAVAILABLE
+
+    stations_dict = get_stations_dict()
+    text = messages.TRIP.format(
+        direction=(
+            f'{stations_dict.get(from_station_id)} ➡ {stations_dict.get(to_station_id)}'
+        ),
+        minutes=round(travel_time / 60),
+    ) + '\n\n'
+    now = dt.datetime.now()
+    trip_options = planner.plan(
+        from_station_id, to_station_id, await is_weekend(), now
+    )
+    if not trip_options:
+        return text + messages.NONE_TRAIN
+
+    text += '\n'.join(
+        messages.TRIP_OPTION.format(
+            departure_at=trip.departure_at,
+            arrival_at=trip.arrival_at,
+            time_to_train=format_time_to_train(trip.departure_at - now),
+        )
+        for trip in trip_options
+    )
+    if transfer_station_ids := trip_options[0].transfer_station_ids:
+        transfers = ', '.join(
+            str(stations_dict.get(station_id)) for station_id in transfer_station_ids
+        )
+        text += '\n' + messages.TRIP_TRANSFERS.format(stations=transfers)
+    return text
+
+
+def _format_time_to_train_text(
+        from_station_id: int,
+        to_station_id: int,
+        times_to_train: list[dt.timedelta],
+) -> str:
+    """Функция формирует текст с направлением и временем до ближайших поездов."""
+    stations_dict = get_stations_dict()
+    from_station = stations_dict.get(from_station_id)
+    direction = f'{from_station} ➡ {stations_dict.get(to_station_id)}'
+    text = messages.DIRECTION_TRAIN.format(direction=direction) + '\n\n'
+    if not times_to_train:
+        return text + messages.NONE_TRAIN
+
+    closest = format_time_to_train(times_to_train[0])
+    if len(times_to_train) == 1:
+        return text + messages.LAST_TIME_TRAIN.format(time_to_train=closest)
+
+    text += messages.CLOSEST_TIME_TRAIN.format(time_to_train=closest)
+    for time_to_train in times_to_train[1:settings.LIMIT_ROW + 1]:
+        next_time = format_time_to_train(time_to_train)
+        text += '\n' + messages.NEXT_TIME_TRAIN.format(time_to_train=next_time)
     return text
 
 
 async def error_handler(update: object, context: ContextTypes.DEFAULT_TYPE) -> None:
-    """Обработчик логирует ошибку и отправляет уведомление разработчику в телеграмм."""
+    """
+    Обработчик логирует ошибку и учитывает ее по отпечатку. О первой ошибке с
+     новым отпечатком сразу отправляет подробное уведомление разработчику в
+     телеграмм, а повторы попадают в периодическую сводку errors.ERRORS. Если
+     уведомление не отправлено, то отпечаток не считается отправленным.
+    """
     if context.error is None:
         return
 
     logger.error("Исключение при обработке объекта update:", exc_info=context.error)
+    fingerprint, is_new = errors.ERRORS.record(context.error)
+    if not is_new:
+        return
+
     traceback_string = ''.join(traceback.format_exception(None, context.error, context.error.__traceback__))
     update_str = update.to_dict() if isinstance(update, Update) else str(update)
     message_kwargs = {
+        'fingerprint': fingerprint,
         'update': html.escape(json.dumps(update_str, indent=2, ensure_ascii=False)),
         'chat_data': html.escape(str(context.chat_data)),
         'user_data': html.escape(str(context.user_data)),
-        'traceback_string': traceback_string,
+        # Обрезается после экранирования, т.к. экранирование удлиняет текст
+        'traceback_string': html.escape(traceback_string)[-errors.MESSAGE_LIMIT // 2:],
     }
     text = messages.ERROR.format(**message_kwargs)
-    await context.bot.send_message(chat_id=settings.DEVELOPER_TG_ID, text=text, parse_mode=ParseMode.HTML)
+    if len(text) > errors.MESSAGE_LIMIT:
+        for key in ('update', 'chat_data', 'user_data'):
+            message_kwargs[key] = '...'
+        text = messages.ERROR.format(**message_kwargs)
+    try:
+        await context.bot.send_message(
+            chat_id=settings.DEVELOPER_TG_ID,
+            text=text,
+            parse_mode=ParseMode.HTML,
+            rate_limit_args=rate_limiter.get_background_args(context.bot),
+        )
+    except Exception:
+        errors.ERRORS.mark_reported(fingerprint, reported=False)
+        raise
+    errors.ERRORS.mark_reported(fingerprint)
 
 
 CONVERSATION_HANDLER = ConversationHandler(
     entry_points=[
-        CommandHandler((commands.SCHEDULE, commands.ADD_FAVORITE), stations),
+        CommandHandler(
+            (
+                commands.SCHEDULE,
+                commands.TRIP,
+                commands.ADD_FAVORITE,
+                commands.NOTIFY,
+            ),
+            stations,
+        ),
     ],
     states={
         settings.CHOICE_DIRECTION: [CallbackQueryHandler(directions)],
         settings.FINAL_STAGE: [CallbackQueryHandler(complete_conv)],
+        settings.ALERT_STAGE: [CallbackQueryHandler(save_alert, pattern=r'^\d+:[01]$')],
         ConversationHandler.TIMEOUT: [
             MessageHandler(filters.ALL, timeout),
             CallbackQueryHandler(timeout),
@@ -292,4 +702,9 @@ CONVERSATION_HANDLER = ConversationHandler(
     },
     fallbacks=[MessageHandler(filters.ALL, wrong_command)],
     conversation_timeout=settings.CONVERSATION_TIMEOUT,
+    # Для диалогов, восстановленных после перезапуска, таймаут не запускается, поэтому
+    # команды начала диалога должны работать в любом состоянии.
+    allow_reentry=True,
+    name='conversation',
+    persistent=settings.PERSISTENCE_ENABLED,
 )
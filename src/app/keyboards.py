@@ -1,23 +1,56 @@
 from telegram import InlineKeyboardButton, InlineKeyboardMarkup
 
-from app.stations import get_stations_dict
+# Клавиатуры строятся функцией build_keyboards при старте бота, когда станции
+# загружены из БД
+STATIONS_KEYBOARD: list[list[InlineKeyboardButton]] = []
+STATIONS_REPLY_MARKUP = InlineKeyboardMarkup(STATIONS_KEYBOARD)
+DIRECTION_KEYBOARD: list[list[InlineKeyboardButton]] = []
+DIRECTION_REPLY_MARKUP = InlineKeyboardMarkup(DIRECTION_KEYBOARD)
+END_STATION_DIRECTION: dict[int, int] = {}
 
-# Клавиатура с набором кнопок с названием станций
-STATIONS_KEYBOARD = [
-    [InlineKeyboardButton(station_name, callback_data=station_id)]
-    for station_id, station_name in get_stations_dict().items()
+# Клавиатура выбора уведомления, где callback_data имеет вид 'минуты:ежедневно'
+ALERT_MINUTES = (5, 10, 15)
+ALERT_KEYBOARD = [
+    [
+        InlineKeyboardButton(f'За {minutes} мин', callback_data=f'{minutes}:0')
+        for minutes in ALERT_MINUTES
+    ],
+    [
+        InlineKeyboardButton(f'{minutes} мин, ежедневно', callback_data=f'{minutes}:1')
+        for minutes in ALERT_MINUTES
+    ],
 ]
-STATIONS_REPLY_MARKUP = InlineKeyboardMarkup(STATIONS_KEYBOARD)
+ALERT_REPLY_MARKUP = InlineKeyboardMarkup(ALERT_KEYBOARD)
 
-# Клавиатура с набором кнопок конечных станций-направлений
-FIRST_STATION_BUTTON = STATIONS_KEYBOARD[0][0]
-LAST_STATION_BUTTON = STATIONS_KEYBOARD[-1][0]
-DIRECTION_KEYBOARD = [[FIRST_STATION_BUTTON, LAST_STATION_BUTTON]]
-DIRECTION_REPLY_MARKUP = InlineKeyboardMarkup(DIRECTION_KEYBOARD)
 
-# Словарь для выбора направления на конечных станциях, где 'from_station' ключ,
-# а 'to_station' значение (добавлен, т.к. нет смысла выбирать пользователю)
-END_STATION_DIRECTION = {
-    FIRST_STATION_BUTTON.callback_data: LAST_STATION_BUTTON.callback_data,
-    LAST_STATION_BUTTON.callback_data: FIRST_STATION_BUTTON.callback_data,
-}
+def build_keyboards(stations_dict: dict[int, str]) -> None:
+    """
+    Функция строит клавиатуры бота по словарю станций.
+
+    Args:
+        stations_dict: Словарь, где ключом является station_id, а значением
+          station_name.
+    """
+    global STATIONS_KEYBOARD, STATIONS_REPLY_MARKUP
+    global DIRECTION_KEYBOARD, DIRECTION_REPLY_MARKUP
+    global END_STATION_DIRECTION
+
+    # Клавиатура с набором кнопок с названием станций
+    STATIONS_KEYBOARD = [
+        [InlineKeyboardButton(station_name, callback_data=station_id)]
+        for station_id, station_name in stations_dict.items()
+    ]
+    STATIONS_REPLY_MARKUP = InlineKeyboardMarkup(STATIONS_KEYBOARD)
+
+    # Клавиатура с набором кнопок конечных станций-направлений
+    first_station_button = STATIONS_KEYBOARD[0][0]
+    last_station_button = STATIONS_KEYBOARD[-1][0]
+    DIRECTION_KEYBOARD = [[first_station_button, last_station_button]]
+    DIRECTION_REPLY_MARKUP = InlineKeyboardMarkup(DIRECTION_KEYBOARD)
+
+    # Словарь для выбора направления на конечных станциях, где 'from_station' ключ,
+    # а 'to_station' значение (добавлен, т.к. нет смысла выбирать пользователю)
+    END_STATION_DIRECTION = {
+        first_station_button.callback_data: last_station_button.callback_data,
+        last_station_button.callback_data: first_station_button.callback_data,
+    }
@@ -0,0 +1,110 @@
+"""Модуль содержит настройку логгирования бота."""
+import copy
+import json
+import logging
+import logging.handlers
+import queue
+
+from app.config import settings
+
+LOG_FORMAT = '[%(asctime)s] - [%(name)s] - [%(levelname)s] => %(message)s'
+LOG_DATEFMT = '%d.%m.%Y %H:%M:%S'
+
+# Атрибуты, которые есть у любой записи лога. Остальные атрибуты записи переданы
+# через extra и попадают в JSON как отдельные поля.
+RECORD_ATTRIBUTES = frozenset(vars(logging.makeLogRecord({}))) | {'message', 'asctime'}
+
+
+class JsonFormatter(logging.Formatter):
+    """Форматирует запись лога в одну строку JSON."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        data = {
+            'time': self.formatTime(record, self.datefmt),
+            'name': record.name,
+            'level': record.levelname,
+            'message': record.getMessage(),
+        }
+        data.update(
+            (key, value)
+            for key, value in vars(record).items()
+            if key not in RECORD_ATTRIBUTES
+        )
+        if record.exc_info:
+            data['exc_info'] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            data['exc_info'] = record.exc_text
+        return json.dumps(data, ensure_ascii=False, default=str)
+
+
+class LogQueueHandler(logging.handlers.QueueHandler):
+    """Помещает запись лога в очередь, не форматируя ее.
+
+    QueueHandler.prepare форматирует запись целиком и добавляет трейсбек к
+    сообщению, поэтому JsonFormatter не смог бы записать его отдельным полем.
+    Здесь в запись подставляется только текст сообщения, а трейсбек сохраняется
+    в exc_text, который учитывают и logging.Formatter, и JsonFormatter.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = copy.copy(record)
+        record.message = record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            if not record.exc_text:
+                record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+def get_file_handler() -> logging.Handler:
+    """Создает обработчик, записывающий лог в файл LOG_FILENAME с ротацией.
+
+    Returns:
+        Обработчик с ротацией по размеру файла или по времени, в зависимости от
+        LOG_ROTATION.
+    """
+    handler: logging.Handler
+    if settings.LOG_ROTATION == 'time':
+        handler = logging.handlers.TimedRotatingFileHandler(
+            filename=settings.LOG_FILENAME,
+            when=settings.LOG_ROTATION_WHEN,
+            backupCount=settings.LOG_BACKUP_COUNT,
+            encoding='utf-8',
+        )
+    else:
+        handler = logging.handlers.RotatingFileHandler(
+            filename=settings.LOG_FILENAME,
+            maxBytes=settings.LOG_MAX_BYTES,
+            backupCount=settings.LOG_BACKUP_COUNT,
+            encoding='utf-8',
+        )
+
+    if settings.LOG_FORMAT == 'json':
+        handler.setFormatter(JsonFormatter(datefmt=LOG_DATEFMT))
+    else:
+        handler.setFormatter(logging.Formatter(LOG_FORMAT, datefmt=LOG_DATEFMT))
+    return handler
+
+
+def setup_logging() -> logging.handlers.QueueListener:
+    """Настраивает логгирование бота через очередь.
+
+    Обработчики бота только помещают записи в очередь, а запись в файл выполняет
+    фоновый поток QueueListener. Так медленный диск не задерживает event loop.
+
+    Returns:
+        Запущенный QueueListener, который нужно остановить при завершении работы.
+    """
+    log_queue: queue.SimpleQueue[logging.LogRecord] = queue.SimpleQueue()
+    listener = logging.handlers.QueueListener(
+        log_queue, get_file_handler(), respect_handler_level=True
+    )
+
+    root_logger = logging.getLogger()
+    root_logger.setLevel(logging.INFO)
+    root_logger.addHandler(LogQueueHandler(log_queue))
+    logging.getLogger('httpx').setLevel(logging.WARNING)
+
+    listener.start()
+    return listener
@@ -7,11 +7,17 @@ START: str = (
 HELP: str = (
     'Команда /schedule показывает время до ближайших поездов. Для этого нужно'
     ' выбрать свою станцию, а затем направление движения поезда.\n\n'
+    'Команда /trip показывает время отправления и прибытия ближайших поездов'
+    ' между любыми двумя станциями.\n\n'
     'Команда /favorites показывает время до ближайших поездов на избранных'
     ' маршрутах (не более двух).\n\n'
     'Команда /add_favorite и /clear_favorites добавляет выбранный маршрут в'
     ' список избранных маршрутов и очищает его соответственно. Добавить можно'
     ' не более двух маршрутов.'
+    '\n\n'
+    'Команда /notify присылает уведомление за несколько минут до отправления'
+    ' ближайшего поезда, один раз или ежедневно. Команда /clear_notify удаляет'
+    ' все уведомления.'
 )
 METRO_IS_CLOSED: str = (
     'Метрополитен закрыт. Часы работы с 06:00 до 00:00.\n'
@@ -24,19 +30,43 @@ CLEAR_FAVORITES: str = (
     'Чтобы добавить маршрут в избранное воспользуйтесь командой /add_favorite'
 )
 FAVORITES_LIMIT_REACHED: str = 'У вас уже добавлено 2 маршрута в избранное и это максимум.'
+CHOICE_ALERT: str = 'За сколько минут до отправления поезда прислать уведомление?'
+ADD_ALERT: str = (
+    'Уведомление для <b>{direction}</b> придет за {minutes} мин '
+    'до поезда в {departure_at:%H:%M}{recurring}.'
+)
+ALERT_RECURRING: str = ' и будет приходить ежедневно'
+ALERT: str = 'Поезд в {departure_at:%H:%M} через {minutes} мин.\n\n{text}'
+ALERTS_LIMIT_REACHED: str = 'У вас уже добавлено максимальное количество уведомлений.'
+CLEAR_ALERTS: str = 'Все уведомления удалены.'
 WRONG: str = 'Некорректная команда.'
 CHOICE_STATION: str = 'Выберите станцию отправления:'
 CHOICE_DIRECTION: str = 'Выберите конечную станцию направления:'
+CHOICE_DESTINATION: str = 'Выберите станцию назначения:'
+TRIP: str = '<b>{direction}</b>, в пути около {minutes} мин:'
+TRIP_OPTION: str = (
+    'Отправление в {departure_at:%H:%M} (через {time_to_train}), '
+    'прибытие в {arrival_at:%H:%M}'
+)
+TRIP_TRANSFERS: str = 'Пересадки: {stations}'
+TRIP_SAME_STATION: str = 'Станции отправления и назначения совпадают.'
+TRIP_UNAVAILABLE: str = 'Маршрут между выбранными станциями не найден.'
 DIRECTION_TRAIN: str = '<b>{direction}:</b>'
 CLOSEST_TIME_TRAIN: str = 'Ближайший поезд через {time_to_train} (мин:с)'
 NEXT_TIME_TRAIN: str = 'Следующий через {time_to_train} (мин:с)'
 LAST_TIME_TRAIN: str = 'Последний поезд через {time_to_train} (мин:с)'
 NONE_TRAIN: str = 'По расписанию поездов сегодня больше нет.'
 CONVERSATION_TIMEOUT: str = 'Время для выбора станций вышло.'
+STATS: str = '<pre>{stats}</pre>'
 ERROR: str = (
-    'Возникла ошибка при обработке объекта update:\n\n'
+    'Возникла новая ошибка {fingerprint} при обработке объекта update:\n\n'
     '<pre>update = {update}</pre>\n\n'
     '<pre>context.chat_data = {chat_data}</pre>\n\n'
     '<pre>context.user_data = {user_data}</pre>\n\n'
     '<pre>{traceback_string}</pre>'
 )
+ERRORS_DIGEST: str = '<b>Повторы ошибок за {minutes} мин</b> (за период / всего):'
+ERRORS_DIGEST_LINE: str = (
+    '{count} / {total} <b>{error_type}</b> {fingerprint}: {message}'
+)
+ERRORS_DIGEST_MORE: str = 'и еще отпечатков: {count}'
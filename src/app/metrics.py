@@ -0,0 +1,370 @@
+"""Модуль содержит метрики бота и их выдачу в текстовом формате Prometheus."""
+import bisect
+import re
+import time
+import typing as t
+from collections import Counter
+
+import tornado.httpserver
+import tornado.web
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from sqlalchemy.util.queue import AsyncAdaptedQueue
+
+# Верхние границы корзин гистограмм в секундах
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+STATEMENT_RE = re.compile(
+    r'^\s*(\w+).*?\b(?:FROM|INTO|UPDATE)\s+"?(\w+)', re.IGNORECASE | re.DOTALL
+)
+
+
+class Histogram:
+    """Гистограмма значений с фиксированными границами корзин, как в Prometheus."""
+
+    def __init__(self, buckets: t.Sequence[float] = BUCKETS) -> None:
+        self.buckets = tuple(buckets)
+        self.bucket_counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        self.bucket_counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def quantile(self, share: float) -> float:
+        """Возвращает верхнюю границу корзины, в которую попадает перцентиль share.
+
+        Для значений больше последней границы возвращается бесконечность.
+        """
+        rank = share * self.count
+        cumulative = 0
+        upper_bounds = (*self.buckets, float('inf'))
+        for upper_bound, bucket_count in zip(upper_bounds, self.bucket_counts):
+            cumulative += bucket_count
+            if cumulative >= rank:
+                return upper_bound
+        return float('inf')
+
+
+class Metrics:
+    """Метрики обработчиков бота, запросов к БД, пула соединений и запросов к Bot API.
+
+    Значения, которые хранятся в других модулях (доли попаданий в кэши, занятость
+    пула, очередь обновлений), регистрируются как функции через register_gauge и
+    вычисляются при выдаче метрик.
+    """
+
+    def __init__(self) -> None:
+        self.handler_latency: dict[str, Histogram] = {}
+        self.handler_errors: Counter[str] = Counter()
+        self.query_latency: dict[str, Histogram] = {}
+        self.query_errors: Counter[str] = Counter()
+        self.pool_checkout_wait = Histogram()
+        self.update_wait = Histogram()
+        self.bot_api_latency: dict[str, Histogram] = {}
+        self.bot_api_throttle_wait = Histogram()
+        self.bot_api_throttled: Counter[str] = Counter()
+        self.bot_api_retries: Counter[str] = Counter()
+        self.gauges: dict[str, tuple[str, t.Callable[[], float]]] = {}
+
+    def observe_handler(
+            self,
+            handler: str,
+            seconds: float,
+            error: bool = False,
+    ) -> None:
+        self.handler_latency.setdefault(handler, Histogram()).observe(seconds)
+        if error:
+            self.handler_errors[handler] += 1
+
+    def observe_query(self, statement: str, seconds: float) -> None:
+        label = get_statement_label(statement)
+        self.query_latency.setdefault(label, Histogram()).observe(seconds)
+
+    def observe_bot_api(
+            self,
+            endpoint: str,
+            seconds: float,
+            throttle_wait: float,
+    ) -> None:
+        """Сохраняет время запроса к Bot API с ожиданием в ограничителе частоты."""
+        self.bot_api_latency.setdefault(endpoint, Histogram()).observe(seconds)
+        self.bot_api_throttle_wait.observe(throttle_wait)
+        if throttle_wait > 0:
+            self.bot_api_throttled[endpoint] += 1
+
+    def register_gauge(
+            self,
+            name: str,
+            description: str,
+            callback: t.Callable[[], float],
+    ) -> None:
+        """Регистрирует метрику, значение которой callback возвращает при выдаче."""
+        self.gauges[name] = (description, callback)
+
+    def clear(self) -> None:
+        self.handler_latency.clear()
+        self.handler_errors.clear()
+        self.query_latency.clear()
+        self.query_errors.clear()
+        self.pool_checkout_wait = Histogram()
+        self.update_wait = Histogram()
+        self.bot_api_latency.clear()
+        self.bot_api_throttle_wait = Histogram()
+        self.bot_api_throttled.clear()
+        self.bot_api_retries.clear()
+
+    def render(self) -> str:
+        """Возвращает метрики в текстовом формате Prometheus."""
+        lines: list[str] = []
+        _render_histograms(
+            lines,
+            'bot_handler_duration_seconds',
+            'Время выполнения обработчиков бота.',
+            'handler',
+            self.handler_latency,
+        )
+        _render_counter(
+            lines,
+            'bot_handler_errors_total',
+            'Ошибки обработчиков бота.',
+            'handler',
+            self.handler_errors,
+        )
+        _render_histograms(
+            lines,
+            'bot_db_query_duration_seconds',
+            'Время выполнения запросов к БД.',
+            'statement',
+            self.query_latency,
+        )
+        _render_counter(
+            lines,
+            'bot_db_query_errors_total',
+            'Ошибки запросов к БД.',
+            'statement',
+            self.query_errors,
+        )
+        _render_histograms(
+            lines,
+            'bot_db_pool_checkout_wait_seconds',
+            'Время ожидания свободного соединения в очереди пула БД.',
+            None,
+            {'': self.pool_checkout_wait},
+        )
+        _render_histograms(
+            lines,
+            'bot_updates_wait_seconds',
+            'Время ожидания обновления в очереди до начала обработки.',
+            None,
+            {'': self.update_wait},
+        )
+        _render_histograms(
+            lines,
+            'bot_api_request_duration_seconds',
+            'Время запросов к Bot API вместе с ожиданием в ограничителе частоты.',
+            'endpoint',
+            self.bot_api_latency,
+        )
+        _render_histograms(
+            lines,
+            'bot_api_throttle_wait_seconds',
+            'Время ожидания запросов к Bot API в ограничителе частоты.',
+            None,
+            {'': self.bot_api_throttle_wait},
+        )
+        _render_counter(
+            lines,
+            'bot_api_throttled_total',
+            'Запросы к Bot API, задержанные ограничителем частоты.',
+            'endpoint',
+            self.bot_api_throttled,
+        )
+        _render_counter(
+            lines,
+            'bot_api_retry_after_total',
+            'Ответы Bot API 429 с повтором запроса через retry_after.',
+            'endpoint',
+            self.bot_api_retries,
+        )
+        for name, (description, callback) in sorted(self.gauges.items()):
+            lines += [
+                f'# HELP {name} {description}',
+                f'# TYPE {name} gauge',
+                f'{name} {callback()}',
+            ]
+        return '\n'.join(lines) + '\n'
+
+    def summary(self) -> str:
+        """Возвращает краткую сводку метрик для команды /stats."""
+        lines = ['Обработчики (вызовы / ошибки / среднее / p95, мс):']
+        for handler, histogram in sorted(self.handler_latency.items()):
+            lines.append(
+                f'{handler}: {histogram.count} / {self.handler_errors[handler]} / '
+                f'{histogram.sum / histogram.count * 1000:.1f} / '
+                f'≤{histogram.quantile(0.95) * 1000:g}'
+            )
+        lines.append('\nЗапросы к БД (вызовы / ошибки / среднее / p95, мс):')
+        for statement, histogram in sorted(self.query_latency.items()):
+            lines.append(
+                f'{statement}: {histogram.count} / {self.query_errors[statement]} / '
+                f'{histogram.sum / histogram.count * 1000:.1f} / '
+                f'≤{histogram.quantile(0.95) * 1000:g}'
+            )
+        if (checkout_wait := self.pool_checkout_wait).count:
+            lines.append(
+                f'\nОжидание соединения из пула: среднее '
+                f'{checkout_wait.sum / checkout_wait.count * 1000:.2f} мс, '
+                f'p95 ≤{checkout_wait.quantile(0.95) * 1000:g} мс'
+            )
+        if self.update_wait.count:
+            lines.append(
+                f'Ожидание обновлений в очереди: среднее '
+                f'{self.update_wait.sum / self.update_wait.count * 1000:.2f} мс, '
+                f'p95 ≤{self.update_wait.quantile(0.95) * 1000:g} мс'
+            )
+        if self.bot_api_latency:
+            lines.append(
+                '\nЗапросы к Bot API (вызовы / задержано / 429 / среднее / p95, мс):'
+            )
+            for endpoint, histogram in sorted(self.bot_api_latency.items()):
+                lines.append(
+                    f'{endpoint}: {histogram.count} / '
+                    f'{self.bot_api_throttled[endpoint]} / '
+                    f'{self.bot_api_retries[endpoint]} / '
+                    f'{histogram.sum / histogram.count * 1000:.1f} / '
+                    f'≤{histogram.quantile(0.95) * 1000:g}'
+                )
+        lines.append('')
+        lines += [
+            f'{name} = {callback():.4g}'
+            for name, (_, callback) in sorted(self.gauges.items())
+        ]
+        return '\n'.join(lines)
+
+
+def get_statement_label(statement: str) -> str:
+    """Возвращает метку запроса из операции и таблицы, например 'SELECT schedule'."""
+    if match := STATEMENT_RE.match(statement):
+        return f'{match[1].upper()} {match[2]}'
+    return statement.split(maxsplit=1)[0].upper() if statement.strip() else 'UNKNOWN'
+
+
+def _format_labels(label_name: str | None, label: str, extra: str = '') -> str:
+    labels = [f'{label_name}="{label}"'] if label_name else []
+    if extra:
+        labels.append(extra)
+    return '{' + ','.join(labels) + '}' if labels else ''
+
+
+def _render_histograms(
+        lines: list[str],
+        name: str,
+        description: str,
+        label_name: str | None,
+        histograms: dict[str, Histogram],
+) -> None:
+    lines += [f'# HELP {name} {description}', f'# TYPE {name} histogram']
+    for label, histogram in sorted(histograms.items()):
+        cumulative = 0
+        upper_bounds = (*histogram.buckets, '+Inf')
+        for upper_bound, bucket_count in zip(upper_bounds, histogram.bucket_counts):
+            cumulative += bucket_count
+            bucket_labels = _format_labels(label_name, label, f'le="{upper_bound}"')
+            lines.append(f'{name}_bucket{bucket_labels} {cumulative}')
+        labels = _format_labels(label_name, label)
+        lines.append(f'{name}_sum{labels} {histogram.sum}')
+        lines.append(f'{name}_count{labels} {histogram.count}')
+
+
+def _render_counter(
+        lines: list[str],
+        name: str,
+        description: str,
+        label_name: str,
+        counter: Counter[str],
+) -> None:
+    lines += [f'# HELP {name} {description}', f'# TYPE {name} counter']
+    lines += [
+        f'{name}{_format_labels(label_name, label)} {value}'
+        for label, value in sorted(counter.items())
+    ]
+
+
+METRICS = Metrics()
+
+
+class TimedAsyncAdaptedQueue(AsyncAdaptedQueue[t.Any]):
+    """Очередь свободных соединений пула, которая измеряет время их ожидания."""
+
+    def get(self, block: bool = True, timeout: float | None = None) -> t.Any:
+        start = time.perf_counter()
+        try:
+            return super().get(block, timeout)
+        finally:
+            METRICS.pool_checkout_wait.observe(time.perf_counter() - start)
+
+
+class TimedQueuePool(AsyncAdaptedQueuePool):
+    """Пул соединений, который измеряет время ожидания свободного соединения.
+
+    Измеряется только ожидание в очереди свободных соединений. Создание нового
+    соединения сверх pool_size в это время не входит.
+    """
+
+    _queue_class = TimedAsyncAdaptedQueue
+
+
+def instrument_engine(engine: Engine) -> None:
+    """Подписывается на события движка для измерения времени выполнения запросов.
+
+    Args:
+        engine: Синхронный движок, для асинхронного движка AsyncEngine.sync_engine.
+    """
+
+    @event.listens_for(engine, 'before_cursor_execute')
+    def before_cursor_execute(
+            conn, cursor, statement, parameters, context, executemany
+    ) -> None:
+        conn.info.setdefault('query_start_time', []).append(time.perf_counter())
+
+    @event.listens_for(engine, 'after_cursor_execute')
+    def after_cursor_execute(
+            conn, cursor, statement, parameters, context, executemany
+    ) -> None:
+        start = conn.info['query_start_time'].pop()
+        METRICS.observe_query(statement, time.perf_counter() - start)
+
+    @event.listens_for(engine, 'handle_error')
+    def handle_error(exception_context) -> None:
+        if exception_context.statement is None:
+            return
+        if exception_context.connection is not None and (
+                start_times := exception_context.connection.info.get('query_start_time')
+        ):
+            start_times.pop()
+        METRICS.query_errors[get_statement_label(exception_context.statement)] += 1
+
+
+class MetricsHandler(tornado.web.RequestHandler):
+    def get(self) -> None:
+        self.set_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+        self.finish(METRICS.render())
+
+
+def start_http_server(listen: str, port: int) -> tornado.httpserver.HTTPServer:
+    """Запускает HTTP-сервер, отдающий метрики по адресу /metrics.
+
+    Args:
+        listen: Адрес, на котором сервер принимает соединения.
+        port: Порт сервера.
+
+    Returns:
+        Запущенный сервер, который нужно остановить при завершении работы бота.
+    """
+    app = tornado.web.Application([(r'/metrics', MetricsHandler)])
+    server = tornado.httpserver.HTTPServer(app)
+    server.listen(port, listen)
+    return server
@@ -1,19 +1,20 @@
 import datetime
+import typing as t
 
 from sqlalchemy import (
-    TIME,
     CheckConstraint,
     ForeignKey,
+    Index,
     String,
     UniqueConstraint,
     func,
     BigInteger,
 )
+from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.orm import (
     DeclarativeBase,
     Mapped,
     MappedAsDataclass,
-    column_property,
     mapped_column,
     relationship,
 )
@@ -50,9 +51,6 @@ class Schedule(Base):
     is_weekend: Mapped[bool] = mapped_column()
     departure_time: Mapped[datetime.time] = mapped_column()
 
-    time_to_train: Mapped[datetime.time] = column_property(
-        column=func.cast(departure_time - func.localtime(), TIME),
-    )
     from_station_obj: Mapped['Station'] = relationship(
         init=False,
         lazy='joined',
@@ -111,3 +109,94 @@ class Favorite(Base):
     @property
     def direction(self) -> str:
         return f'{self.from_station_obj.station_name} ➡ {self.to_station_obj.station_name}'
+
+
+class Alert(Base):
+    __tablename__ = 'alert'
+
+    alert_id: Mapped[int] = mapped_column(
+        init=False, primary_key=True, autoincrement=True
+    )
+    bot_user_id: Mapped[int] = mapped_column(
+        ForeignKey('bot_user.bot_user_id', ondelete='CASCADE', onupdate='CASCADE'),
+    )
+    from_station_id: Mapped[STATION_FK] = mapped_column()
+    to_station_id: Mapped[STATION_FK] = mapped_column()
+    minutes_before: Mapped[int] = mapped_column()
+    departure_at: Mapped[datetime.datetime]
+    is_recurring: Mapped[bool]
+    departure_time: Mapped[datetime.time]
+    fire_at: Mapped[datetime.datetime] = mapped_column(index=True)
+    created_at: Mapped[TIMESTAMP_TYPE] = mapped_column(init=False)
+
+    __table_args__ = (
+        CheckConstraint(minutes_before > 0, name='minutes_before_check'),
+    )
+
+
+class ChatData(Base):
+    __tablename__ = 'chat_data'
+
+    chat_id: Mapped[int] = mapped_column(
+        BigInteger, primary_key=True, autoincrement=False
+    )
+    data: Mapped[dict[str, t.Any]] = mapped_column(JSONB)
+    updated_at: Mapped[TIMESTAMP_TYPE] = mapped_column(init=False)
+
+
+class ConversationState(Base):
+    __tablename__ = 'conversation_state'
+
+    name: Mapped[str] = mapped_column(String(50), primary_key=True)
+    conversation_key: Mapped[list[int | str]] = mapped_column(JSONB, primary_key=True)
+    state: Mapped[int]
+    updated_at: Mapped[TIMESTAMP_TYPE] = mapped_column(init=False)
+
+
+class TimetableVersion(Base):
+    __tablename__ = 'timetable_version'
+
+    version_id: Mapped[int] = mapped_column(init=False, primary_key=True)
+    source: Mapped[str]
+    status: Mapped[str] = mapped_column(String(10), default='staging')
+    created_at: Mapped[TIMESTAMP_TYPE] = mapped_column(init=False)
+    promoted_at: Mapped[datetime.datetime | None] = mapped_column(
+        init=False, default=None
+    )
+
+    __table_args__ = (
+        CheckConstraint(
+            "status IN ('staging', 'validated', 'invalid', 'active', 'archived')",
+            name='status_check',
+        ),
+        Index(
+            'active_version_unique',
+            status,
+            unique=True,
+            postgresql_where=status == 'active',
+        ),
+    )
+
+
+class StationStaging(Base):
+    __tablename__ = 'station_staging'
+
+    version_id: Mapped[int] = mapped_column(
+        ForeignKey('timetable_version.version_id', ondelete='CASCADE'),
+        primary_key=True,
+    )
+    station_id: Mapped[int] = mapped_column(primary_key=True, autoincrement=False)
+    station_name: Mapped[str] = mapped_column(String(30))
+
+
+class ScheduleStaging(Base):
+    __tablename__ = 'schedule_staging'
+
+    version_id: Mapped[int] = mapped_column(
+        ForeignKey('timetable_version.version_id', ondelete='CASCADE'),
+        primary_key=True,
+    )
+    from_station_id: Mapped[int] = mapped_column(primary_key=True, autoincrement=False)
+    to_station_id: Mapped[int] = mapped_column(primary_key=True, autoincrement=False)
+    is_weekend: Mapped[bool] = mapped_column(primary_key=True)
+    departure_time: Mapped[datetime.time] = mapped_column(primary_key=True)
@@ -0,0 +1,211 @@
+"""Модуль содержит хранение состояния диалогов бота в БД."""
+import asyncio
+import logging
+import typing as t
+
+from sqlalchemy.ext.asyncio import (
+    AsyncConnection,
+    AsyncEngine,
+    AsyncSession,
+    async_sessionmaker,
+)
+from telegram.ext import BasePersistence, PersistenceInput
+
+from app import db
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+ChatData = dict[str, t.Any]
+ConversationKey = tuple[int | str, ...]
+
+
+class PersistenceLockError(RuntimeError):
+    """Состояние диалогов уже записывает другой процесс бота."""
+
+
+class PostgresPersistence(
+        BasePersistence[dict[t.Any, t.Any], ChatData, dict[t.Any, t.Any]],
+):
+    """Хранит chat_data и состояния ConversationHandler в таблицах PostgreSQL.
+
+    Application вызывает методы update_* раз в update_interval секунд для всех
+    измененных за это время чатов и диалогов. Изменения накапливаются и записываются
+    одной транзакцией, а не отдельным запросом на каждый чат. Данные чатов хранятся в
+    JSONB, поэтому в chat_data нужно класть только JSON-совместимые значения, например
+    id сообщения, а не объект Message.
+
+    ConversationHandler читает сохраненные состояния только при запуске, поэтому
+    записывать их может только один процесс бота. Он удерживает advisory-блокировку
+    в БД, а другой процесс с включенным сохранением не запускается, чтобы диалоги в
+    нем не терялись при перезапуске незаметно. Диалоги, которые не менялись дольше
+    conversation_timeout секунд, при запуске не восстанавливаются.
+    """
+
+    def __init__(
+            self,
+            update_interval: float = settings.PERSISTENCE_UPDATE_INTERVAL,
+            conversation_timeout: int = settings.CONVERSATION_TIMEOUT,
+            current_session: async_sessionmaker[AsyncSession] = db.async_session,
+            current_engine: AsyncEngine = db.async_engine,
+    ) -> None:
+        super().__init__(
+            store_data=PersistenceInput(
+                bot_data=False, chat_data=True, user_data=False, callback_data=False
+            ),
+            update_interval=update_interval,
+        )
+        self._conversation_timeout = conversation_timeout
+        self._current_session = current_session
+        self._current_engine = current_engine
+        self._lock_connection: AsyncConnection | None = None
+        self._lock_checked = False
+        self._write_lock = asyncio.Lock()
+        self._chat_data: dict[int, ChatData] = {}
+        self._dropped_chat_ids: set[int] = set()
+        self._conversations: dict[tuple[str, ConversationKey], int | None] = {}
+
+    @property
+    def is_writer(self) -> bool:
+        """Признак того, что этот процесс удерживает блокировку записи состояния."""
+        return self._lock_connection is not None
+
+    async def _lock(self) -> None:
+        """Захватывает блокировку записи состояния.
+
+        Application.initialize сначала вызывает get_chat_data, а затем
+        get_conversations для каждого ConversationHandler, поэтому блокировка
+        захватывается один раз.
+
+        Raises:
+            PersistenceLockError: Блокировку удерживает другой процесс бота.
+        """
+        if self._lock_checked:
+            return
+        self._lock_checked = True
+        self._lock_connection = await db.try_lock_persistence(self._current_engine)
+        if self._lock_connection is None:
+            raise PersistenceLockError(
+                'Состояние диалогов записывает другой процесс бота. Запустите этот '
+                'процесс с PERSISTENCE_ENABLED=False'
+            )
+
+    async def get_chat_data(self) -> dict[int, ChatData]:
+        await self._lock()
+        return await db.select_chat_data(self._current_session)
+
+    async def get_conversations(self, name: str) -> dict[ConversationKey, object]:
+        await self._lock()
+        return await db.select_conversations(
+            name,
+            self._conversation_timeout,
+            self._current_session,
+        )
+
+    async def update_chat_data(self, chat_id: int, data: ChatData) -> None:
+        if not self.is_writer:
+            return
+        self._dropped_chat_ids.discard(chat_id)
+        self._chat_data[chat_id] = data
+        await self._write_soon()
+
+    async def drop_chat_data(self, chat_id: int) -> None:
+        if not self.is_writer:
+            return
+        self._chat_data.pop(chat_id, None)
+        self._dropped_chat_ids.add(chat_id)
+        await self._write_soon()
+
+    async def update_conversation(
+            self,
+            name: str,
+            key: ConversationKey,
+            new_state: object | None,
+    ) -> None:
+        if not self.is_writer:
+            return
+        # Состояния диалогов бота - целые числа, см. settings.CHOICE_DIRECTION
+        self._conversations[(name, key)] = t.cast(int | None, new_state)
+        await self._write_soon()
+
+    async def flush(self) -> None:
+        async with self._write_lock:
+            try:
+                await self._write()
+            finally:
+                if self._lock_connection is not None:
+                    lock_connection, self._lock_connection = self._lock_connection, None
+                    await db.unlock_persistence(lock_connection)
+
+    async def get_user_data(self) -> dict[int, dict[t.Any, t.Any]]:
+        return {}
+
+    async def get_bot_data(self) -> dict[t.Any, t.Any]:
+        return {}
+
+    async def get_callback_data(self) -> None:
+        return None
+
+    async def update_user_data(self, user_id: int, data: dict[t.Any, t.Any]) -> None:
+        pass
+
+    async def update_bot_data(self, data: dict[t.Any, t.Any]) -> None:
+        pass
+
+    async def update_callback_data(self, data: t.Any) -> None:
+        pass
+
+    async def drop_user_data(self, user_id: int) -> None:
+        pass
+
+    async def refresh_user_data(
+            self, user_id: int, user_data: dict[t.Any, t.Any]
+    ) -> None:
+        pass
+
+    async def refresh_chat_data(self, chat_id: int, chat_data: ChatData) -> None:
+        # Данные чатов меняет только процесс, удерживающий блокировку записи, поэтому
+        # данные в памяти всегда новее, чем в БД.
+        pass
+
+    async def refresh_bot_data(self, bot_data: dict[t.Any, t.Any]) -> None:
+        pass
+
+    async def _write_soon(self) -> None:
+        # Application вызывает update_* для всех изменений одним asyncio.gather, поэтому
+        # после переключения контекста все изменения уже накоплены и первый дождавшийся
+        # блокировки вызов записывает их разом, а остальные находят пустой буфер.
+        await asyncio.sleep(0)
+        async with self._write_lock:
+            await self._write()
+
+    async def _write(self) -> None:
+        if not (self._chat_data or self._dropped_chat_ids or self._conversations):
+            return
+
+        chat_data, self._chat_data = self._chat_data, {}
+        dropped_chat_ids, self._dropped_chat_ids = self._dropped_chat_ids, set()
+        conversations, self._conversations = self._conversations, {}
+        try:
+            await db.save_persistence_data(
+                chat_data,
+                dropped_chat_ids,
+                conversations,
+                self._current_session,
+            )
+        except Exception:
+            # Более новые изменения, накопленные во время записи, не перезаписываются.
+            for chat_id, data in chat_data.items():
+                if chat_id not in self._dropped_chat_ids:
+                    self._chat_data.setdefault(chat_id, data)
+            self._dropped_chat_ids.update(dropped_chat_ids - self._chat_data.keys())
+            for conversation, state in conversations.items():
+                self._conversations.setdefault(conversation, state)
+            raise
+
+        logger.debug(
+            'Сохранены данные чатов: %s, удалены: %s, сохранены состояния диалогов: %s',
+            len(chat_data),
+            len(dropped_chat_ids),
+            len(conversations),
+        )
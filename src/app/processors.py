@@ -0,0 +1,118 @@
+"""Модуль содержит обработчик очереди обновлений бота."""
+import asyncio
+import sys
+import time
+import typing as t
+
+from telegram import Update
+from telegram.ext import BaseUpdateProcessor
+
+from app import metrics
+from app.config import settings
+
+# Ограничение семафора BaseUpdateProcessor, фактически отключающее его
+UNLIMITED_UPDATES = sys.maxsize
+
+
+class ChatOrderedUpdateProcessor(BaseUpdateProcessor):
+    """Обрабатывает обновления разных чатов конкурентно, а одного чата по порядку.
+
+    Обновления одного чата ждут друг друга на блокировке чата, поэтому состояние
+    ConversationHandler и chat_data меняются последовательно. Количество одновременно
+    выполняемых обработчиков ограничено max_concurrent_handlers, а количество принятых,
+    но еще не обработанных обновлений ограничено max_pending_updates.
+    """
+
+    def __init__(
+            self,
+            max_concurrent_handlers: int = settings.MAX_CONCURRENT_UPDATES,
+            max_pending_updates: int = settings.MAX_PENDING_UPDATES,
+    ) -> None:
+        # Семафор BaseUpdateProcessor не ограничивает обновления, а max_pending_updates
+        # проверяется в do_process_update, чтобы обновления сверх него учитывались в
+        # очереди с момента получения
+        super().__init__(UNLIMITED_UPDATES)
+        self._pending_semaphore = asyncio.BoundedSemaphore(max_pending_updates)
+        self._handlers_semaphore = asyncio.BoundedSemaphore(max_concurrent_handlers)
+        self._chat_locks: dict[int, asyncio.Lock] = {}
+        self._chat_updates: dict[int, int] = {}
+        self.pending_updates = 0
+        self.running_updates = 0
+        self.processed_updates = 0
+
+    async def initialize(self) -> None:
+        pass
+
+    async def shutdown(self) -> None:
+        pass
+
+    @staticmethod
+    def get_chat_key(update: object) -> int | None:
+        """Возвращает id чата или пользователя для упорядочивания обновлений."""
+        if not isinstance(update, Update):
+            return None
+        if update.effective_chat is not None:
+            return update.effective_chat.id
+        if update.effective_user is not None:
+            return update.effective_user.id
+        return None
+
+    async def do_process_update(
+            self,
+            update: object,
+            coroutine: t.Awaitable[t.Any],
+    ) -> None:
+        start = time.perf_counter()
+        self.pending_updates += 1
+        try:
+            async with self._pending_semaphore:
+                await self._process_in_chat_order(update, coroutine, start)
+        finally:
+            self.pending_updates -= 1
+
+    async def _process_in_chat_order(
+            self,
+            update: object,
+            coroutine: t.Awaitable[t.Any],
+            start: float,
+    ) -> None:
+        if (chat_key := self.get_chat_key(update)) is None:
+            await self._run(coroutine, start)
+            return
+
+        self._chat_updates[chat_key] = self._chat_updates.get(chat_key, 0) + 1
+        chat_lock = self._chat_locks.setdefault(chat_key, asyncio.Lock())
+        try:
+            async with chat_lock:
+                await self._run(coroutine, start)
+        finally:
+            self._chat_updates[chat_key] -= 1
+            if not self._chat_updates[chat_key]:
+                del self._chat_updates[chat_key]
+                del self._chat_locks[chat_key]
+
+    async def _run(self, coroutine: t.Awaitable[t.Any], start: float) -> None:
+        async with self._handlers_semaphore:
+            metrics.METRICS.update_wait.observe(time.perf_counter() - start)
+            self.running_updates += 1
+            try:
+                await coroutine
+            finally:
+                self.running_updates -= 1
+                self.processed_updates += 1
+
+    def stats(self) -> dict[str, float]:
+        """Возвращает счетчики очереди обновлений.
+
+        Время ожидания обновлений в очереди хранится в гистограмме
+        metrics.METRICS.update_wait.
+
+        Returns:
+            Словарь с глубиной очереди (queue_depth), количеством выполняемых и
+            обработанных обновлений.
+        """
+        return {
+            'queue_depth': self.pending_updates - self.running_updates,
+            'running_updates': self.running_updates,
+            'processed_updates': self.processed_updates,
+        }
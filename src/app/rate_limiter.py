@@ -0,0 +1,223 @@
+"""Модуль содержит ограничитель частоты запросов бота к Bot API."""
+import asyncio
+import heapq
+import itertools
+import logging
+import time
+import typing as t
+
+from telegram.error import RetryAfter
+from telegram.ext import BaseRateLimiter
+
+from app import metrics
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Приоритеты запросов, передаются в методы бота через rate_limit_args
+INTERACTIVE = 0
+BACKGROUND = 1
+
+# Количество корзин чатов, после которого удаляются корзины неактивных чатов
+CHAT_BUCKETS_LIMIT = 10_000
+
+# Результат запроса к Bot API, который возвращает callback ограничителя
+BotApiResult = bool | dict[str, t.Any] | list[dict[str, t.Any]]
+
+
+def get_background_args(bot: t.Any) -> int | None:
+    """Возвращает rate_limit_args для фоновой отправки.
+
+    Методы ExtBot не принимают rate_limit_args без ограничителя частоты, поэтому
+    для бота без ограничителя возвращается None.
+    """
+    return BACKGROUND if getattr(bot, 'rate_limiter', None) else None
+
+
+class TokenBucket:
+    """Корзина токенов, пополняемая со скоростью rate токенов в секунду до capacity."""
+
+    __slots__ = ('rate', 'capacity', 'tokens', 'updated_at')
+
+    def __init__(self, rate: float, capacity: float) -> None:
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated_at = time.monotonic()
+
+    def take(self, now: float) -> float:
+        """Забирает токен, если он есть.
+
+        Returns:
+            0, если токен получен, иначе время в секундах до появления токена.
+        """
+        refilled = self.tokens + (now - self.updated_at) * self.rate
+        self.tokens = min(self.capacity, refilled)
+        self.updated_at = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+    def give_back(self) -> None:
+        self.tokens = min(self.capacity, self.tokens + 1)
+
+    def is_full(self, now: float) -> bool:
+        return self.tokens + (now - self.updated_at) * self.rate >= self.capacity
+
+
+class TokenBucketRateLimiter(BaseRateLimiter[int]):
+    """Ограничивает частоту запросов к Bot API общей корзиной токенов и корзинами чатов.
+
+    Запрос с chat_id сначала ждет токен корзины своего чата (для групп с отрицательным
+    id действует поминутный лимит), а затем токен общей корзины. Общие токены
+    выдаются ожидающим запросам по приоритету: ответы пользователям (INTERACTIVE)
+    раньше фоновых отправок (BACKGROUND), а при равном приоритете в порядке
+    поступления. Запросы без chat_id, например answerCallbackQuery и
+    answerInlineQuery, не ждут токенов, т.к. не входят в лимиты Telegram на
+    отправку сообщений.
+
+    При ответе 429 все запросы, в том числе без chat_id, приостанавливаются на
+    retry_after секунд, а запрос повторяется не более max_retries раз, поэтому при
+    перегрузке бот отправляет сообщения медленнее, но не теряет их.
+    """
+
+    def __init__(
+            self,
+            overall_rate: float = settings.RATE_LIMIT_OVERALL,
+            chat_rate: float = settings.RATE_LIMIT_CHAT,
+            chat_burst: int = settings.RATE_LIMIT_CHAT_BURST,
+            group_rate_per_minute: float = settings.RATE_LIMIT_GROUP_PER_MINUTE,
+            max_retries: int = settings.RATE_LIMIT_MAX_RETRIES,
+    ) -> None:
+        self._overall = TokenBucket(overall_rate, max(overall_rate, 1))
+        self._chat_rate = chat_rate
+        self._chat_burst = chat_burst
+        self._group_rate = group_rate_per_minute / 60
+        self._max_retries = max_retries
+        self._chats: dict[int | str, TokenBucket] = {}
+        self._waiters: list[tuple[int, int, asyncio.Future[None]]] = []
+        self._sequence = itertools.count()
+        self._dispatcher: asyncio.Task[None] | None = None
+        self._paused_until = 0.0
+
+    @property
+    def queue_depth(self) -> int:
+        """Количество запросов, ожидающих токен общей корзины."""
+        return len(self._waiters)
+
+    async def initialize(self) -> None:
+        pass
+
+    async def shutdown(self) -> None:
+        if self._dispatcher is not None:
+            self._dispatcher.cancel()
+        for _, _, future in self._waiters:
+            future.cancel()
+        self._waiters.clear()
+
+    async def process_request(
+            self,
+            callback: t.Callable[..., t.Coroutine[t.Any, t.Any, BotApiResult]],
+            args: t.Any,
+            kwargs: dict[str, t.Any],
+            endpoint: str,
+            data: dict[str, t.Any],
+            rate_limit_args: int | None,
+    ) -> BotApiResult:
+        start = time.perf_counter()
+        chat_id = data.get('chat_id')
+        priority = INTERACTIVE if rate_limit_args is None else rate_limit_args
+        retries = 0
+        throttle_wait = 0.0
+        while True:
+            if chat_id is None:
+                throttle_wait += await self._wait_pause()
+            else:
+                throttle_wait += await self._acquire_chat(chat_id)
+                throttle_wait += await self._acquire_overall(priority)
+            try:
+                result = await callback(*args, **kwargs)
+            except RetryAfter as error:
+                metrics.METRICS.bot_api_retries[endpoint] += 1
+                if retries >= self._max_retries:
+                    raise
+                retries += 1
+                retry_after = float(error.retry_after)
+                logger.warning(
+                    'Bot API ответил 429 на %s, повтор через %s с',
+                    endpoint,
+                    retry_after,
+                )
+                paused_until = time.monotonic() + retry_after
+                self._paused_until = max(self._paused_until, paused_until)
+                # Ожидание считается заново для каждой попытки
+                throttle_wait = await self._wait_pause()
+                continue
+            metrics.METRICS.observe_bot_api(
+                endpoint, time.perf_counter() - start, throttle_wait
+            )
+            return result
+
+    async def _wait_pause(self) -> float:
+        """Ждет окончания паузы после ответа 429.
+
+        Returns:
+            Время ожидания в секундах, 0, если паузы нет.
+        """
+        if self._paused_until <= time.monotonic():
+            return 0.0
+        start = time.perf_counter()
+        while (delay := self._paused_until - time.monotonic()) > 0:
+            await asyncio.sleep(delay)
+        return time.perf_counter() - start
+
+    async def _acquire_chat(self, chat_id: int | str) -> float:
+        """Ждет токен корзины чата и возвращает время ожидания в секундах."""
+        if (bucket := self._chats.get(chat_id)) is None:
+            if len(self._chats) >= CHAT_BUCKETS_LIMIT:
+                now = time.monotonic()
+                self._chats = {
+                    key: value
+                    for key, value in self._chats.items()
+                    if not value.is_full(now)
+                }
+            if isinstance(chat_id, str) or chat_id < 0:
+                bucket = TokenBucket(self._group_rate, 1)
+            else:
+                bucket = TokenBucket(self._chat_rate, self._chat_burst)
+            self._chats[chat_id] = bucket
+        if (delay := bucket.take(time.monotonic())) == 0:
+            return 0.0
+        start = time.perf_counter()
+        while delay > 0:
+            await asyncio.sleep(delay)
+            delay = bucket.take(time.monotonic())
+        return time.perf_counter() - start
+
+    async def _acquire_overall(self, priority: int) -> float:
+        """Ждет токен общей корзины и возвращает время ожидания в секундах."""
+        pause_wait = await self._wait_pause()
+        if not self._waiters and self._overall.take(time.monotonic()) == 0:
+            return pause_wait
+        start = time.perf_counter()
+
+        future: asyncio.Future[None] = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._sequence), future))
+        if self._dispatcher is None or self._dispatcher.done():
+            self._dispatcher = asyncio.create_task(self._dispatch())
+        await future
+        return pause_wait + time.perf_counter() - start
+
+    async def _dispatch(self) -> None:
+        """Выдает токены общей корзины ожидающим запросам в порядке приоритета."""
+        while self._waiters:
+            await self._wait_pause()
+            if (delay := self._overall.take(time.monotonic())) > 0:
+                await asyncio.sleep(delay)
+                continue
+            _, _, future = heapq.heappop(self._waiters)
+            if future.done():
+                self._overall.give_back()
+            else:
+                future.set_result(None)
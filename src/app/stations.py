@@ -1,16 +1,62 @@
-from functools import lru_cache
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
 
-from app.db import get_stations
+from app import db
+
+_stations_dict: dict[int, str] = {}
+
+
+async def load_stations_dict(
+        current_session: async_sessionmaker[AsyncSession] = db.async_session,
+) -> dict[int, str]:
+    """
+    Функция загружает словарь со всеми станциями в БД.
+    Вызывается при старте бота, а затем словарь возвращает get_stations_dict.
+    Ключом словаря является station_id, а значения station_name.
+
+    Returns:
+        dict[int, str]
+    """
+    global _stations_dict
+    stations = await db.select_stations(current_session)
+    _stations_dict = {station.station_id: station.station_name for station in stations}
+    return _stations_dict
 
 
-@lru_cache
 def get_stations_dict() -> dict[int, str]:
     """
-    Функция генерирует словарь со всеми станциями в БД.
-    Словарь генерирует при первом вызове функции, а затем возвращается кэш.
-    Ключом словаря является station_id, а значения station_name. При последующи
+    Функция возвращает загруженный при старте бота словарь со всеми станциями.
+    Ключом словаря является station_id, а значения station_name.
 
     Returns:
         dict[int, str]
     """
-    return {station.station_id: station.station_name for station in get_stations()}
+    return _stations_dict
+
+
+def set_stations_dict(stations_dict: dict[int, str]) -> None:
+    """
+    Функция заменяет словарь станций, например загруженный из скомпилированного
+     расписания.
+    """
+    global _stations_dict
+    _stations_dict = stations_dict
+
+
+def find_stations(query: str) -> list[int]:
+    """
+    Функция ищет станции, название которых содержит строку запроса без учета
+     регистра и различия букв 'е' и 'ё'. Пустой запрос соответствует всем станциям.
+
+    Returns:
+        Список station_id в порядке следования станций.
+    """
+    query = _normalize(query)
+    return [
+        station_id
+        for station_id, station_name in _stations_dict.items()
+        if query in _normalize(station_name)
+    ]
+
+
+def _normalize(text: str) -> str:
+    return text.strip().lower().replace('ё', 'е')
@@ -0,0 +1,455 @@
+"""Модуль содержит расписание поездов, загружаемое в память при старте бота."""
+import bisect
+import datetime as dt
+import functools
+import math
+import typing as t
+from array import array
+from collections import defaultdict
+
+import numpy as np
+import numpy.typing as npt
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app import db
+from app.config import settings
+
+RouteKey = tuple[int, int, bool]
+Route = tuple[int, int]
+TimetableRow = tuple[int, int, bool, dt.time]
+
+SECONDS_IN_DAY: int = 24 * 60 * 60
+# Минимальное количество отправлений в отрезке HeadwayRoute, меньшие отрезки
+# хранятся как исключения
+HEADWAY_MIN_DEPARTURES: int = 4
+
+
+def to_service_seconds(time: dt.time) -> int:
+    """Переводит время в секунды от начала суток работы метрополитена.
+
+    Поезда, отправляющиеся после полуночи и до открытия метро, относятся к предыдущим
+    суткам, поэтому к их времени прибавляются сутки. Так отправления одного дня
+    остаются упорядоченными по возрастанию.
+
+    Args:
+        time: Время отправления поезда или текущее время.
+
+    Returns:
+        Количество секунд от начала суток работы метрополитена.
+    """
+    seconds = time.hour * 3600 + time.minute * 60 + time.second
+    if time < settings.OPEN_TIME_METRO:
+        seconds += SECONDS_IN_DAY
+    return seconds
+
+
+class Timetable:
+    """Расписание поездов в виде отсортированных массивов времени отправления.
+
+    Для каждого маршрута (from_station_id, to_station_id, is_weekend) хранится массив
+    секунд от начала суток работы метрополитена, а ближайшие поезда находятся
+    бинарным поиском. Для пакетных запросов те же данные хранятся в матрице NumPy
+    в секундах, где строка соответствует маршруту, а недостающие значения
+    заполнены np.inf. Матрица строится при первом пакетном запросе.
+
+    Массивы маршрутов могут храниться в более крупных единицах unit, например в
+    минутах (unit=60) для расписания из скомпилированного файла.
+    """
+
+    def __init__(self, routes: dict[RouteKey, t.Sequence[int]], unit: int = 1) -> None:
+        self.routes = routes
+        self.unit = unit
+        self.route_index = {key: index for index, key in enumerate(routes)}
+
+    @functools.cached_property
+    def departures_matrix(self) -> npt.NDArray[np.float64]:
+        """Матрица отправлений в секундах для next_trains_batch.
+
+        Дополнительные LIMIT_ROW столбцов и последняя строка для неизвестных маршрутов
+        позволяют выбирать срезы матрицы без проверки границ. Расписание из
+        скомпилированного файла хранится в общей для процессов памяти, а матрица
+        является копией каждого процесса, поэтому она строится, только если нужна.
+        """
+        max_length = max(map(len, self.routes.values()), default=0)
+        width = max_length + settings.LIMIT_ROW
+        departures_matrix = np.full((len(self.routes) + 1, width), np.inf)
+        for index, departures in enumerate(self.routes.values()):
+            seconds = np.asarray(departures, dtype=np.float64) * self.unit
+            departures_matrix[index, :len(departures)] = seconds
+        return departures_matrix
+
+    def __len__(self) -> int:
+        return sum(len(departures) for departures in self.routes.values())
+
+    @classmethod
+    def from_rows(cls, rows: t.Iterable[TimetableRow]) -> 'Timetable':
+        """Создает расписание из строк таблицы 'schedule'.
+
+        Args:
+            rows: Строки вида (from_station_id, to_station_id, is_weekend,
+              departure_time).
+
+        Returns:
+            Объект Timetable.
+        """
+        return cls({
+            key: array('l', values) for key, values in group_departures(rows).items()
+        })
+
+    def next_departures(self, key: RouteKey, value: float, limit: int) -> list[int]:
+        """Возвращает не более limit ближайших отправлений маршрута не раньше value.
+
+        Args:
+            key: Маршрут (from_station_id, to_station_id, is_weekend).
+            value: Время в единицах unit от начала суток работы метрополитена.
+            limit: Максимальное количество отправлений.
+
+        Returns:
+            Время отправлений в единицах unit по возрастанию.
+        """
+        departures = self.routes.get(key, ())
+        start = bisect.bisect_left(departures, value)
+        return list(departures[start:start + limit])
+
+    def next_trains(
+            self,
+            from_station_id: int,
+            to_station_id: int,
+            is_weekend: bool,
+            now: dt.datetime | None = None,
+            limit: int = settings.LIMIT_ROW,
+    ) -> list[dt.timedelta]:
+        """Рассчитывает время до ближайших поездов на маршруте.
+
+        Args:
+            from_station_id: id станции отправления поезда.
+            to_station_id: id конечной станции направления движения поездов.
+            is_weekend: Признак расписания выходного дня.
+            now: Текущее время, по умолчанию берется системное.
+            limit: Максимальное количество поездов.
+
+        Returns:
+            Список времени до ближайших поездов, отправляющихся в пределах
+            MAX_WAITING_TIME минут.
+        """
+        now = now or dt.datetime.now()
+        current = to_service_seconds(now.time()) + now.microsecond / 1_000_000
+        max_waiting_time = settings.MAX_WAITING_TIME * 60
+
+        key = (from_station_id, to_station_id, is_weekend)
+        times_to_train = []
+        for departure in self.next_departures(key, current / self.unit, limit):
+            waiting_time = float(departure) * self.unit - current
+            if waiting_time >= max_waiting_time:
+                break
+            times_to_train.append(dt.timedelta(seconds=waiting_time))
+        return times_to_train
+
+    def next_trains_batch(
+            self,
+            routes: t.Sequence[Route],
+            is_weekend: bool,
+            now: dt.datetime | None = None,
+    ) -> npt.NDArray[np.float64]:
+        """Рассчитывает время до ближайших поездов сразу для нескольких маршрутов.
+
+        Расчет выполняется одной векторной операцией над матрицей отправлений, поэтому
+        его стоимость почти не зависит от количества маршрутов.
+
+        Args:
+            routes: Маршруты в виде пар (from_station_id, to_station_id).
+            is_weekend: Признак расписания выходного дня.
+            now: Текущее время, по умолчанию берется системное.
+
+        Returns:
+            Матрица размером len(routes) x LIMIT_ROW со временем до поездов в секундах.
+            Если поезда в пределах MAX_WAITING_TIME минут нет, то значение равно np.nan.
+        """
+        now = now or dt.datetime.now()
+        current = to_service_seconds(now.time()) + now.microsecond / 1_000_000
+        missing_route = len(self.routes)
+        rows = np.fromiter(
+            (
+                self.route_index.get(
+                    (from_station_id, to_station_id, is_weekend), missing_route
+                )
+                for from_station_id, to_station_id in routes
+            ),
+            dtype=np.intp,
+            count=len(routes),
+        )
+
+        departures = self.departures_matrix[rows]
+        start = np.count_nonzero(departures < current, axis=1)
+        columns = start[:, np.newaxis] + np.arange(settings.LIMIT_ROW)
+        waiting_times = np.take_along_axis(departures, columns, axis=1) - current
+        waiting_times[waiting_times >= settings.MAX_WAITING_TIME * 60] = np.nan
+        return waiting_times
+
+
+def group_departures(rows: t.Iterable[TimetableRow]) -> dict[RouteKey, list[int]]:
+    """Группирует строки таблицы 'schedule' по маршрутам.
+
+    Returns:
+        Словарь, где ключом является (from_station_id, to_station_id, is_weekend), а
+        значением отсортированные секунды отправления от начала суток работы
+        метрополитена.
+    """
+    departures: dict[RouteKey, list[int]] = defaultdict(list)
+    for from_station_id, to_station_id, is_weekend, departure_time in rows:
+        key = (from_station_id, to_station_id, is_weekend)
+        departures[key].append(to_service_seconds(departure_time))
+    return {key: sorted(values) for key, values in departures.items()}
+
+
+class HeadwayRoute:
+    """Отправления маршрута, сжатые в отрезки с постоянными интервалами движения.
+
+    Отправления разбиваются на отрезки [start, end], в которых поезда идут с
+    интервалами headway и alternate_headway по очереди. Для равномерного движения
+    оба интервала равны, а чередование, например 8 и 7 минут, описывает средний
+    интервал 7,5 минут при расписании с точностью до минуты. Отправления, не
+    попавшие ни в один отрезок, хранятся отдельно как исключения.
+
+    Ближайшие отправления находятся бинарным поиском отрезка, а внутри отрезка
+    рассчитываются арифметически, поэтому поиск не зависит от количества
+    отправлений в отрезке.
+    """
+
+    __slots__ = (
+        'starts',
+        'ends',
+        'headways',
+        'alternate_headways',
+        'exceptions',
+        '_length',
+    )
+
+    def __init__(
+            self,
+            segments: t.Iterable[tuple[int, int, int, int]],
+            exceptions: t.Iterable[int],
+            length: int,
+    ) -> None:
+        self.starts, self.ends, self.headways, self.alternate_headways = (
+            array('l') for _ in range(4)
+        )
+        for start, end, headway, alternate_headway in segments:
+            self.starts.append(start)
+            self.ends.append(end)
+            self.headways.append(headway)
+            self.alternate_headways.append(alternate_headway)
+        self.exceptions = array('l', exceptions)
+        self._length = length
+
+    @classmethod
+    def from_departures(cls, departures: t.Sequence[int]) -> 'HeadwayRoute':
+        """Сжимает отсортированные отправления маршрута в отрезки и исключения.
+
+        Отрезок начинается с очередного отправления и продолжается, пока интервалы
+        повторяют первые один или два интервала. Выбирается вариант, покрывающий
+        больше отправлений, а отрезки меньше HEADWAY_MIN_DEPARTURES отправлений
+        считаются исключениями.
+        """
+        segments = []
+        exceptions = []
+        index = 0
+        while index < len(departures):
+            end = max(
+                _get_segment_end(departures, index, pattern_length)
+                for pattern_length in (1, 2)
+            )
+            if end - index + 1 < HEADWAY_MIN_DEPARTURES:
+                exceptions.append(departures[index])
+                index += 1
+                continue
+
+            headway = departures[index + 1] - departures[index]
+            alternate_headway = departures[index + 2] - departures[index + 1]
+            segments.append(
+                (departures[index], departures[end], headway, alternate_headway)
+            )
+            index = end + 1
+        return cls(segments, exceptions, len(departures))
+
+    def __len__(self) -> int:
+        return self._length
+
+    def __iter__(self) -> t.Iterator[int]:
+        return iter(self.next_departures(-math.inf, self._length))
+
+    @property
+    def nbytes(self) -> int:
+        """Размер массивов отрезков и исключений в байтах."""
+        arrays = (
+            self.starts,
+            self.ends,
+            self.headways,
+            self.alternate_headways,
+            self.exceptions,
+        )
+        return sum(len(values) * values.itemsize for values in arrays)
+
+    def next_departures(self, value: float, limit: int) -> list[int]:
+        """Рассчитывает не более limit ближайших отправлений не раньше value.
+
+        Args:
+            value: Время от начала суток работы метрополитена.
+            limit: Максимальное количество отправлений.
+
+        Returns:
+            Время отправлений по возрастанию.
+        """
+        departures = []
+        for index in range(bisect.bisect_left(self.ends, value), len(self.starts)):
+            if len(departures) >= limit:
+                break
+            start, end = self.starts[index], self.ends[index]
+            headway = self.headways[index]
+            alternate_headway = self.alternate_headways[index]
+            period = headway + alternate_headway
+            if value <= start:
+                departure, is_alternate = start, False
+            else:
+                # Номер периода из двух интервалов и смещение value внутри него
+                periods, offset = divmod(value - start, period)
+                departure = start + int(periods) * period
+                if offset == 0:
+                    is_alternate = False
+                elif offset <= headway:
+                    departure, is_alternate = departure + headway, True
+                else:
+                    departure, is_alternate = departure + period, False
+            while departure <= end and len(departures) < limit:
+                departures.append(departure)
+                departure += alternate_headway if is_alternate else headway
+                is_alternate = not is_alternate
+
+        start = bisect.bisect_left(self.exceptions, value)
+        if exceptions := self.exceptions[start:start + limit]:
+            departures = sorted(departures + exceptions.tolist())[:limit]
+        return departures
+
+
+class HeadwayTimetable(Timetable):
+    """Расписание поездов, сжатое в интервалы движения HeadwayRoute.
+
+    Занимает меньше памяти, чем Timetable, т.к. хранит отрезки с постоянными
+    интервалами вместо каждого отправления и не строит матрицу отправлений.
+    Пакетный расчет выполняется поочередно для маршрутов, но каждый маршрут
+    требует лишь нескольких целочисленных операций.
+    """
+
+    routes: dict[RouteKey, HeadwayRoute]  # type: ignore[assignment]
+
+    def __init__(self, routes: dict[RouteKey, HeadwayRoute], unit: int = 1) -> None:
+        self.routes = routes
+        self.unit = unit
+        self.route_index = {key: index for index, key in enumerate(routes)}
+
+    @classmethod
+    def from_rows(cls, rows: t.Iterable[TimetableRow]) -> 'HeadwayTimetable':
+        """Создает сжатое расписание из строк таблицы 'schedule'.
+
+        Args:
+            rows: Строки вида (from_station_id, to_station_id, is_weekend,
+              departure_time).
+
+        Returns:
+            Объект HeadwayTimetable.
+        """
+        return cls({
+            key: HeadwayRoute.from_departures(values)
+            for key, values in group_departures(rows).items()
+        })
+
+    @property
+    def nbytes(self) -> int:
+        """Размер массивов всех маршрутов в байтах."""
+        return sum(route.nbytes for route in self.routes.values())
+
+    def next_departures(self, key: RouteKey, value: float, limit: int) -> list[int]:
+        if (route := self.routes.get(key)) is None:
+            return []
+        return route.next_departures(value, limit)
+
+    def next_trains_batch(
+            self,
+            routes: t.Sequence[Route],
+            is_weekend: bool,
+            now: dt.datetime | None = None,
+    ) -> npt.NDArray[np.float64]:
+        now = now or dt.datetime.now()
+        current = to_service_seconds(now.time()) + now.microsecond / 1_000_000
+        waiting_times = np.full((len(routes), settings.LIMIT_ROW), np.nan)
+        for row, (from_station_id, to_station_id) in enumerate(routes):
+            route = self.routes.get((from_station_id, to_station_id, is_weekend))
+            if route is not None:
+                departures = route.next_departures(
+                    current / self.unit, settings.LIMIT_ROW
+                )
+                waiting_times[row, :len(departures)] = departures
+        waiting_times = waiting_times * self.unit - current
+        waiting_times[waiting_times >= settings.MAX_WAITING_TIME * 60] = np.nan
+        return waiting_times
+
+
+def build_timetable(rows: t.Iterable[TimetableRow]) -> Timetable:
+    """Создает расписание из строк 'schedule', сжатое при TIMETABLE_COMPRESSION."""
+    if settings.TIMETABLE_COMPRESSION:
+        return HeadwayTimetable.from_rows(rows)
+    return Timetable.from_rows(rows)
+
+
+def _get_segment_end(
+        departures: t.Sequence[int],
+        start: int,
+        pattern_length: int,
+) -> int:
+    """Находит последнее отправление, до которого интервалы повторяют первые
+    pattern_length интервалов.
+    """
+    if start + pattern_length >= len(departures):
+        return start
+    pattern = [
+        departures[start + index + 1] - departures[start + index]
+        for index in range(pattern_length)
+    ]
+    end = start
+    while (
+        end + 1 < len(departures)
+        and departures[end + 1] - departures[end]
+        == pattern[(end - start) % pattern_length]
+    ):
+        end += 1
+    return end
+
+
+_timetable: Timetable | None = None
+
+
+def get_timetable() -> Timetable | None:
+    """Возвращает загруженное в память расписание или None, если оно не загружено."""
+    return _timetable
+
+
+def set_timetable(new_timetable: Timetable | None) -> None:
+    """Заменяет расписание, по которому бот рассчитывает время до поездов."""
+    global _timetable
+    _timetable = new_timetable
+
+
+async def load_timetable(
+        current_session: async_sessionmaker[AsyncSession] = db.async_session,
+) -> Timetable:
+    """Загружает расписание из таблицы 'schedule' в память.
+
+    Args:
+        current_session: Фабрика для асинхронной сессии.
+
+    Returns:
+        Загруженный объект Timetable.
+    """
+    global _timetable
+    _timetable = build_timetable(await db.select_timetable(current_session))
+    return _timetable
@@ -0,0 +1,378 @@
+"""Модуль содержит скомпилированное расписание поездов в бинарном файле.
+
+Файл строится заранее из таблицы 'schedule' или из populate_db.sql и открывается ботом
+через mmap. Несколько процессов бота на одном сервере разделяют одну копию файла в
+page cache и загружают расписание без запросов к БД.
+
+Формат файла (little-endian):
+    заголовок HEADER с id версии расписания из таблицы 'timetable_version';
+    таблица маршрутов ROUTE_DTYPE, отсортированная по маршрутам;
+    таблица станций STATION_DTYPE;
+    время отправления uint16 в минутах от начала суток работы метрополитена;
+    названия станций в UTF-8.
+
+Сборка из корня репозитория:
+
+    PYTHONPATH=src python -m app.timetable_artifact src/data/timetable.bin
+    PYTHONPATH=src python -m app.timetable_artifact src/data/timetable.bin \\
+        --from-sql src/data/populate_db.sql
+"""
+import argparse
+import asyncio
+import dataclasses
+import datetime as dt
+import hashlib
+import mmap
+import os
+import re
+import struct
+import typing as t
+import zlib
+from collections import defaultdict
+from pathlib import Path
+
+import numpy as np
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app import db
+from app.config import settings
+from app.timetable import RouteKey, Timetable, TimetableRow, to_service_seconds
+
+MAGIC = b'NTTT'
+FORMAT_VERSION = 2
+# magic, версия формата, OPEN_TIME_METRO в минутах, id версии расписания (0 - без
+# версии), количество маршрутов, отправлений и станций, размер названий станций,
+# MD5 расписания, CRC32 данных после заголовка
+HEADER = struct.Struct('<4sHHIIIII16sI')
+ROUTE_DTYPE = np.dtype([
+    ('from_station_id', '<u4'),
+    ('to_station_id', '<u4'),
+    ('is_weekend', '<u4'),
+    ('offset', '<u4'),
+    ('length', '<u4'),
+])
+STATION_DTYPE = np.dtype([
+    ('station_id', '<u4'),
+    ('name_offset', '<u4'),
+    ('name_length', '<u4'),
+])
+DEPARTURE_DTYPE = np.dtype('<u2')
+
+STATION_VALUES_RE = re.compile(r"\((\d+),\s*'([^']*)'\)")
+SCHEDULE_VALUES_RE = re.compile(
+    r"\((\d+),\s*(\d+),\s*(True|False),\s*'(\d{1,2}:\d{2}(?::\d{2})?)'\)",
+    re.IGNORECASE,
+)
+
+
+class ArtifactError(ValueError):
+    """Файл расписания поврежден, собран в другом формате или устарел."""
+
+
+@dataclasses.dataclass(frozen=True)
+class TimetableArtifact:
+    """Расписание и станции, прочитанные из скомпилированного файла."""
+
+    timetable: Timetable
+    stations_dict: dict[int, str]
+    checksum: str
+    version_id: int
+
+
+def get_checksum(rows: t.Iterable[TimetableRow]) -> str:
+    """Вычисляет контрольную сумму расписания так же, как db.select_schedule_checksum.
+
+    Args:
+        rows: Строки вида (from_station_id, to_station_id, is_weekend, departure_time).
+
+    Returns:
+        MD5 в шестнадцатеричном виде.
+    """
+    text = '\n'.join(
+        f'{from_station_id},{to_station_id},{int(is_weekend)},{departure_time:%H:%M:%S}'
+        for from_station_id, to_station_id, is_weekend, departure_time in sorted(rows)
+    )
+    return hashlib.md5(text.encode()).hexdigest()
+
+
+def build(
+        rows: t.Sequence[TimetableRow],
+        stations_dict: dict[int, str],
+        version_id: int = 0,
+) -> bytes:
+    """Собирает содержимое файла расписания.
+
+    Args:
+        rows: Строки вида (from_station_id, to_station_id, is_weekend, departure_time).
+        stations_dict: Словарь, где ключом является station_id, а значением
+          station_name.
+        version_id: id версии расписания, из которой взяты строки и станции, 0 - если
+          расписание загружено без версий.
+
+    Returns:
+        Содержимое файла.
+
+    Raises:
+        ArtifactError: Если время отправления задано с точностью до секунд.
+    """
+    departures: dict[RouteKey, list[int]] = defaultdict(list)
+    for from_station_id, to_station_id, is_weekend, departure_time in rows:
+        if departure_time.second or departure_time.microsecond:
+            raise ArtifactError(f'Время отправления {departure_time} не кратно минуте')
+        key = (from_station_id, to_station_id, is_weekend)
+        departures[key].append(to_service_seconds(departure_time) // 60)
+
+    routes = np.zeros(len(departures), dtype=ROUTE_DTYPE)
+    departures_array = np.zeros(len(rows), dtype=DEPARTURE_DTYPE)
+    offset = 0
+    for index, key in enumerate(sorted(departures)):
+        minutes = sorted(departures[key])
+        routes[index] = (*key, offset, len(minutes))
+        departures_array[offset:offset + len(minutes)] = minutes
+        offset += len(minutes)
+
+    stations = np.zeros(len(stations_dict), dtype=STATION_DTYPE)
+    names = bytearray()
+    for index, (station_id, station_name) in enumerate(sorted(stations_dict.items())):
+        encoded_name = station_name.encode()
+        stations[index] = (station_id, len(names), len(encoded_name))
+        names += encoded_name
+
+    payload = b''.join(
+        (routes.tobytes(), stations.tobytes(), departures_array.tobytes(), names)
+    )
+    open_time = settings.OPEN_TIME_METRO
+    header = HEADER.pack(
+        MAGIC,
+        FORMAT_VERSION,
+        open_time.hour * 60 + open_time.minute,
+        version_id,
+        len(routes),
+        len(departures_array),
+        len(stations),
+        len(names),
+        bytes.fromhex(get_checksum(rows)),
+        zlib.crc32(payload),
+    )
+    return header + payload
+
+
+def write(
+        path: Path,
+        rows: t.Sequence[TimetableRow],
+        stations_dict: dict[int, str],
+        version_id: int = 0,
+) -> None:
+    """Записывает файл расписания.
+
+    Файл заменяется атомарно, поэтому процессы, уже открывшие старый файл через mmap,
+    продолжают читать его до перезапуска.
+    """
+    temporary_path = path.with_name(f'.{path.name}.tmp')
+    temporary_path.write_bytes(build(rows, stations_dict, version_id))
+    os.replace(temporary_path, path)
+
+
+def load(path: Path) -> TimetableArtifact:
+    """Открывает файл расписания через mmap и проверяет его заголовок.
+
+    Массивы маршрутов являются представлениями NumPy поверх отображенного в память
+    файла и не копируются.
+
+    Args:
+        path: Путь к файлу расписания.
+
+    Returns:
+        Объект TimetableArtifact.
+
+    Raises:
+        ArtifactError: Если файл поврежден, собран в другом формате или при другом
+          OPEN_TIME_METRO.
+    """
+    with open(path, 'rb') as f:
+        buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    if len(buffer) < HEADER.size:
+        raise ArtifactError(f'Файл {path} меньше заголовка')
+    (
+        magic,
+        version,
+        open_time_minutes,
+        version_id,
+        routes_count,
+        departures_count,
+        stations_count,
+        names_size,
+        checksum,
+        crc,
+    ) = HEADER.unpack_from(buffer)
+    if magic != MAGIC:
+        raise ArtifactError(f'Файл {path} не является файлом расписания')
+    if version != FORMAT_VERSION:
+        raise ArtifactError(
+            f'Версия формата файла {version}, ожидается {FORMAT_VERSION}'
+        )
+    open_time = settings.OPEN_TIME_METRO
+    if open_time_minutes != open_time.hour * 60 + open_time.minute:
+        raise ArtifactError('Файл собран при другом значении OPEN_TIME_METRO')
+    payload_size = (
+        routes_count * ROUTE_DTYPE.itemsize
+        + stations_count * STATION_DTYPE.itemsize
+        + departures_count * DEPARTURE_DTYPE.itemsize
+        + names_size
+    )
+    if (
+        len(buffer) != HEADER.size + payload_size
+        or zlib.crc32(memoryview(buffer)[HEADER.size:]) != crc
+    ):
+        raise ArtifactError(f'Файл {path} поврежден')
+
+    offset = HEADER.size
+    routes = np.frombuffer(buffer, dtype=ROUTE_DTYPE, count=routes_count, offset=offset)
+    offset += routes.nbytes
+    stations = np.frombuffer(
+        buffer, dtype=STATION_DTYPE, count=stations_count, offset=offset
+    )
+    offset += stations.nbytes
+    departures = np.frombuffer(
+        buffer, dtype=DEPARTURE_DTYPE, count=departures_count, offset=offset
+    )
+    offset += departures.nbytes
+    names = bytes(buffer[offset:offset + names_size])
+
+    timetable_routes = {
+        (
+            int(route['from_station_id']),
+            int(route['to_station_id']),
+            bool(route['is_weekend']),
+        ): departures[route['offset']:route['offset'] + route['length']]
+        for route in routes
+    }
+    stations_dict = {}
+    for station in stations:
+        name_offset = int(station['name_offset'])
+        name = names[name_offset:name_offset + int(station['name_length'])]
+        stations_dict[int(station['station_id'])] = name.decode()
+    return TimetableArtifact(
+        Timetable(timetable_routes, unit=60),
+        stations_dict,
+        checksum.hex(),
+        version_id,
+    )
+
+
+async def load_checked(
+        path: Path,
+        active_version_id: int | None,
+        check_db: bool = settings.TIMETABLE_ARTIFACT_CHECK_DB,
+        current_session: async_sessionmaker[AsyncSession] = db.async_session,
+) -> TimetableArtifact:
+    """Открывает файл расписания и проверяет, что он собран из активной версии.
+
+    Версия в заголовке файла проверяется без запросов к БД, т.к. активную версию
+    бот запрашивает при запуске. Она защищает и от устаревших названий станций,
+    которые не входят в контрольную сумму расписания. Если активной версии нет, то
+    файл должен быть собран без версии (version_id 0), а его контрольная сумма
+    всегда сравнивается с таблицей 'schedule', т.к. сравнить версии не с чем.
+
+    Args:
+        path: Путь к файлу расписания.
+        active_version_id: id активной версии расписания или None, если расписание
+          загружено без версий.
+        check_db: Дополнительно сравнить контрольную сумму файла с таблицей
+          'schedule'. Выполняет один запрос, который агрегирует все расписание.
+        current_session: Фабрика для асинхронной сессии.
+
+    Raises:
+        ArtifactError: Если файл поврежден, собран из другой версии или расписание в
+          БД изменилось.
+    """
+    artifact = load(path)
+    if artifact.version_id != (active_version_id or 0):
+        raise ArtifactError(
+            f'Файл {path} собран из версии расписания {artifact.version_id}, '
+            f'активна версия {active_version_id}'
+        )
+    check_db = check_db or active_version_id is None
+    if check_db and (
+        artifact.checksum != await db.select_schedule_checksum(current_session)
+    ):
+        raise ArtifactError(f'Файл {path} устарел: расписание в БД изменилось')
+    return artifact
+
+
+def parse_populate_sql(text: str) -> tuple[dict[int, str], list[TimetableRow]]:
+    """Извлекает станции и расписание из команд INSERT файла populate_db.sql.
+
+    Returns:
+        Словарь станций и строки вида (from_station_id, to_station_id, is_weekend,
+        departure_time).
+    """
+    stations_dict: dict[int, str] = {}
+    rows: list[TimetableRow] = []
+    for command in text.split('\n\n'):
+        if 'INSERT INTO station ' in command:
+            stations_dict.update(
+                (int(station_id), name)
+                for station_id, name in STATION_VALUES_RE.findall(command)
+            )
+        elif 'INSERT INTO schedule ' in command:
+            rows.extend(
+                (
+                    int(from_station_id),
+                    int(to_station_id),
+                    is_weekend.lower() == 'true',
+                    dt.time.fromisoformat(time),
+                )
+                for from_station_id, to_station_id, is_weekend, time
+                in SCHEDULE_VALUES_RE.findall(command)
+            )
+    return stations_dict, rows
+
+
+async def select_source() -> tuple[dict[int, str], list[TimetableRow], int]:
+    version_id = await db.select_active_timetable_version()
+    stations = await db.select_stations()
+    rows = await db.select_timetable()
+    await db.async_engine.dispose()
+    return (
+        {station.station_id: station.station_name for station in stations},
+        [tuple(row) for row in rows],  # type: ignore[misc]
+        version_id or 0,
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description='Компиляция расписания поездов в бинарный файл.'
+    )
+    parser.add_argument('output', type=Path, help='Путь к файлу расписания.')
+    parser.add_argument(
+        '--from-sql',
+        type=Path,
+        help='Собрать из populate_db.sql вместо таблицы schedule.',
+    )
+    parser.add_argument(
+        '--version-id',
+        type=int,
+        default=0,
+        help='id версии расписания для --from-sql.',
+    )
+    args = parser.parse_args()
+
+    if args.from_sql:
+        sql = args.from_sql.read_text(encoding='utf-8')
+        stations_dict, rows = parse_populate_sql(sql)
+        version_id = args.version_id
+    else:
+        stations_dict, rows, version_id = asyncio.run(select_source())
+    write(args.output, rows, stations_dict, version_id)
+    print(
+        f'{args.output}: версия {version_id}, '
+        f'маршрутов {len({row[:3] for row in rows})}, отправлений {len(rows)}, '
+        f'станций {len(stations_dict)}, MD5 {get_checksum(rows)}'
+    )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,215 @@
+"""Модуль содержит загрузку новых версий расписания без перезапуска бота.
+
+Новое расписание загружается в таблицы 'station_staging' и 'schedule_staging' под
+отдельной версией, проверяется и переносится в рабочие таблицы одной транзакцией.
+Запущенные процессы бота периодически проверяют активную версию и, обнаружив новую,
+загружают станции и расписание в фоне, после чего одновременно подменяют словарь
+станций, расписание в памяти, клавиатуры и планировщик поездок и очищают кэши.
+
+Загрузка версии из корня репозитория:
+
+    PYTHONPATH=src python -m app.timetable_versions load src/data/populate_db.sql \\
+        --promote
+    PYTHONPATH=src python -m app.timetable_versions promote 3
+"""
+import argparse
+import asyncio
+import logging
+import time
+from collections import Counter
+from pathlib import Path
+
+from telegram.ext import ContextTypes
+
+from app import cache, db, keyboards, stations, timetable, timetable_artifact, trips
+from app.config import settings
+from app.timetable import TimetableRow
+
+logger = logging.getLogger(__name__)
+
+STATION_NAME_LENGTH = 30
+
+
+def validate(stations_dict: dict[int, str], rows: list[TimetableRow]) -> list[str]:
+    """Проверяет станции и расписание перед переносом в рабочие таблицы.
+
+    Args:
+        stations_dict: Словарь, где ключом является station_id, а значением
+          station_name.
+        rows: Строки вида (from_station_id, to_station_id, is_weekend, departure_time).
+
+    Returns:
+        Список найденных ошибок, пустой для корректного расписания.
+    """
+    errors = []
+    if len(stations_dict) < 2:
+        errors.append('Должно быть не менее двух станций')
+    if not rows:
+        errors.append('Расписание пустое')
+    names = stations_dict.values()
+    if long_names := [name for name in names if len(name) > STATION_NAME_LENGTH]:
+        errors.append(
+            f'Названия станций длиннее {STATION_NAME_LENGTH} символов: '
+            f'{", ".join(long_names)}'
+        )
+    if repeated_names := [name for name, count in Counter(names).items() if count > 1]:
+        errors.append(f'Повторяющиеся названия станций: {", ".join(repeated_names)}')
+    row_station_ids = {station_id for row in rows for station_id in row[:2]}
+    if unknown_ids := row_station_ids - stations_dict.keys():
+        errors.append(f'Неизвестные станции в расписании: {sorted(unknown_ids)}')
+    if loops := {row[:2] for row in rows if row[0] == row[1]}:
+        errors.append(f'Совпадают станции отправления и назначения: {sorted(loops)}')
+    if (duplicates := len(rows) - len(set(rows))) > 0:
+        errors.append(f'Повторяющихся отправлений: {duplicates}')
+
+    route_days = {row[:3] for row in rows}
+    if partial_routes := sorted(
+        route for route in {row[:2] for row in rows}
+        if (*route, False) not in route_days or (*route, True) not in route_days
+    ):
+        errors.append(
+            f'Маршруты без расписания на будни или выходные: {partial_routes}'
+        )
+    return errors
+
+
+async def stage(
+        source: str,
+        stations_dict: dict[int, str],
+        rows: list[TimetableRow],
+) -> tuple[int, list[str]]:
+    """Загружает версию расписания в промежуточные таблицы и проверяет ее.
+
+    Args:
+        source: Описание источника версии, например путь к файлу.
+        stations_dict: Словарь, где ключом является station_id, а значением
+          station_name.
+        rows: Строки вида (from_station_id, to_station_id, is_weekend, departure_time).
+
+    Returns:
+        id версии и список ошибок проверки. Версия без ошибок получает статус
+        'validated', иначе 'invalid'.
+    """
+    version_id = await db.insert_timetable_version(source, stations_dict, rows)
+    errors = validate(stations_dict, rows)
+    status = 'invalid' if errors else 'validated'
+    await db.set_timetable_version_status(version_id, status)
+    return version_id, errors
+
+
+class TimetableReloader:
+    """Отслеживает активную версию расписания и перезагружает данные бота при ее смене.
+
+    Attributes:
+        version: id версии расписания, загруженной ботом.
+    """
+
+    def __init__(self) -> None:
+        self.version: int | None = None
+        self._lock = asyncio.Lock()
+
+    async def reload(self) -> bool:
+        """Перезагружает данные бота, если активная версия расписания изменилась.
+
+        Станции, расписание, клавиатуры и планировщик поездок загружаются и
+        строятся заранее, а подменяются без переключения event loop, поэтому
+        обработчики видят либо прежнюю версию, либо новую целиком.
+
+        Returns:
+            True, если данные были перезагружены.
+        """
+        async with self._lock:
+            # Версия читается до данных: если новая версия будет перенесена во время
+            # загрузки, то следующая проверка загрузит ее повторно
+            version = await db.select_active_timetable_version()
+            if version == self.version:
+                return False
+
+            start = time.perf_counter()
+            # Расписание загружается и без TIMETABLE_IN_MEMORY, т.к. по нему строится
+            # планировщик поездок
+            station_rows, timetable_rows = await asyncio.gather(
+                db.select_stations(), db.select_timetable()
+            )
+            stations_dict = {
+                station.station_id: station.station_name for station in station_rows
+            }
+            new_timetable = await asyncio.to_thread(
+                timetable.build_timetable, timetable_rows
+            )
+            new_planner = await asyncio.to_thread(trips.TripPlanner, new_timetable)
+
+            stations.set_stations_dict(stations_dict)
+            timetable.set_timetable(
+                new_timetable if settings.TIMETABLE_IN_MEMORY else None
+            )
+            trips.set_planner(new_planner)
+            keyboards.build_keyboards(stations_dict)
+            cache.SCHEDULE_CACHE.clear()
+            db.FAVORITES_CACHE.clear()
+            logger.info(
+                'Загружена версия расписания %s вместо %s за %.3f с',
+                version,
+                self.version,
+                time.perf_counter() - start,
+            )
+            self.version = version
+            return True
+
+    async def reload_job(self, _: ContextTypes.DEFAULT_TYPE) -> None:
+        """Задача JobQueue для периодической проверки версии расписания."""
+        await self.reload()
+
+
+RELOADER = TimetableReloader()
+
+
+async def run_command(args: argparse.Namespace) -> int:
+    try:
+        if args.command == 'load':
+            sql = args.path.read_text(encoding='utf-8')
+            stations_dict, rows = timetable_artifact.parse_populate_sql(sql)
+            version_id, errors = await stage(str(args.path), stations_dict, rows)
+            print(
+                f'Версия {version_id}: станций {len(stations_dict)}, '
+                f'отправлений {len(rows)}'
+            )
+            for error in errors:
+                print(f'Ошибка: {error}')
+            if errors:
+                return 1
+        else:
+            version_id = args.version_id
+        if args.command == 'promote' or args.promote:
+            await db.promote_timetable_version(version_id)
+            print(f'Версия {version_id} перенесена в рабочие таблицы')
+        return 0
+    finally:
+        await db.async_engine.dispose()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description='Загрузка новой версии расписания поездов.'
+    )
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    load_parser = subparsers.add_parser(
+        'load', help='Загрузить и проверить версию из populate_db.sql.'
+    )
+    load_parser.add_argument(
+        'path', type=Path, help='Файл с командами INSERT, как populate_db.sql.'
+    )
+    load_parser.add_argument(
+        '--promote',
+        action='store_true',
+        help='Сразу перенести версию в рабочие таблицы.',
+    )
+    promote_parser = subparsers.add_parser(
+        'promote', help='Перенести проверенную версию в рабочие таблицы.'
+    )
+    promote_parser.add_argument('version_id', type=int)
+    raise SystemExit(asyncio.run(run_command(parser.parse_args())))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,324 @@
+"""Модуль содержит планировщик поездок между любыми станциями метрополитена.
+
+Граф станций строится по расписанию: каждая конечная станция-направление задает
+линию, станции которой упорядочены по времени первого поезда суток. Время в пути
+между соседними станциями оценивается медианой разницы отправлений одного поезда,
+а время между всеми парами станций и маршруты с пересадками рассчитываются заранее
+алгоритмом Флойда-Уоршелла. Поэтому запрос поездки сводится к бинарному поиску
+отправления на каждом участке маршрута.
+"""
+import datetime as dt
+import itertools
+import logging
+import statistics
+import typing as t
+
+import numpy as np
+import numpy.typing as npt
+
+from app import db, timetable
+from app.config import settings
+from app.timetable import Timetable
+
+logger = logging.getLogger(__name__)
+
+
+class Leg(t.NamedTuple):
+    """Участок поездки без пересадок на поезде направления direction_id."""
+
+    from_station_id: int
+    to_station_id: int
+    direction_id: int
+    travel_time: float
+
+
+class Trip(t.NamedTuple):
+    """Вариант поездки с временем отправления, прибытия и станциями пересадок."""
+
+    departure_at: dt.datetime
+    arrival_at: dt.datetime
+    transfer_station_ids: tuple[int, ...]
+
+
+def get_lines(current_timetable: Timetable) -> dict[int, list[int]]:
+    """Строит порядок станций для каждого направления движения поездов.
+
+    Станции направления упорядочены по времени первого поезда суток, т.к. он
+    проходит их по очереди, а последней добавляется конечная станция направления.
+
+    Returns:
+        Словарь, где ключом является id конечной станции, а значением список id
+        станций в порядке движения поезда.
+    """
+    first_departures: dict[int, dict[int, float]] = {}
+    for key in current_timetable.routes:
+        from_station_id, to_station_id, _ = key
+        for departure in current_timetable.next_departures(key, -np.inf, 1):
+            line = first_departures.setdefault(to_station_id, {})
+            line[from_station_id] = min(line.get(from_station_id, np.inf), departure)
+    return {
+        direction_id: sorted(line, key=line.__getitem__) + [direction_id]
+        for direction_id, line in first_departures.items()
+    }
+
+
+def get_travel_times(
+        current_timetable: Timetable,
+        lines: dict[int, list[int]],
+) -> dict[tuple[int, int, int], float]:
+    """Оценивает время в пути между соседними станциями каждого направления.
+
+    Для каждого отправления со станции берется ближайшее отправление со следующей
+    станции, что соответствует тому же поезду, пока интервал между поездами больше
+    времени в пути между соседними станциями. Время до конечной станции, с которой
+    поезда этого направления не отправляются, берется из обратного направления.
+
+    Returns:
+        Словарь, где ключом является (from_station_id, to_station_id, direction_id),
+        а значением время в пути в секундах.
+    """
+    travel_times: dict[tuple[int, int, int], float] = {}
+    for direction_id, line in lines.items():
+        for from_station_id, to_station_id in zip(line[:-2], line[1:-1]):
+            differences = []
+            for is_weekend in (False, True):
+                key = (from_station_id, direction_id, is_weekend)
+                next_key = (to_station_id, direction_id, is_weekend)
+                for departure in current_timetable.routes.get(key, ()):
+                    for next_departure in current_timetable.next_departures(
+                        next_key, departure, 1
+                    ):
+                        difference = float(next_departure - departure)
+                        differences.append(difference * current_timetable.unit)
+            if differences:
+                edge = (from_station_id, to_station_id, direction_id)
+                travel_times[edge] = statistics.median(differences)
+
+    # Время в пути от станции до соседней конечной равно времени обратного перегона
+    reverse_times = {
+        (to_station_id, from_station_id): time
+        for (from_station_id, to_station_id, _), time in travel_times.items()
+    }
+    for direction_id, line in lines.items():
+        if len(line) < 2:
+            continue
+        known_times = [
+            time
+            for (*_, direction), time in travel_times.items()
+            if direction == direction_id
+        ]
+        travel_times[(line[-2], direction_id, direction_id)] = reverse_times.get(
+            (line[-2], direction_id),
+            statistics.median(known_times) if known_times else 0.0,
+        )
+    return travel_times
+
+
+class TripPlanner:
+    """Рассчитывает время отправления и прибытия для поездки между любыми станциями.
+
+    Attributes:
+        station_ids: id станций в порядке строк и столбцов матрицы travel_times.
+        travel_times: Матрица времени в пути в секундах без учета ожидания поездов,
+          np.inf для недостижимых станций.
+        legs: Участки маршрута для каждой пары станций.
+    """
+
+    def __init__(self, current_timetable: Timetable) -> None:
+        self.timetable = current_timetable
+        self.lines = get_lines(current_timetable)
+        edges = get_travel_times(current_timetable, self.lines)
+        self.station_ids = sorted(
+            {station_id for line in self.lines.values() for station_id in line}
+        )
+        self.station_index = {
+            station_id: index for index, station_id in enumerate(self.station_ids)
+        }
+        self.travel_times, next_stations = self._get_shortest_paths(edges)
+
+        edge_directions: dict[tuple[int, int], list[int]] = {}
+        for from_station_id, to_station_id, direction_id in edges:
+            hop = (from_station_id, to_station_id)
+            edge_directions.setdefault(hop, []).append(direction_id)
+        self.legs: dict[tuple[int, int], list[Leg]] = {}
+        for route in itertools.permutations(self.station_ids, 2):
+            if next_stations[self._get_cell(*route)] >= 0:
+                path = self._get_path(next_stations, *route)
+                self.legs[route] = self._get_legs(path, edges, edge_directions)
+
+    def _get_cell(self, from_station_id: int, to_station_id: int) -> tuple[int, int]:
+        """Возвращает строку и столбец пары станций в матрицах планировщика."""
+        return self.station_index[from_station_id], self.station_index[to_station_id]
+
+    def _get_shortest_paths(
+            self,
+            edges: dict[tuple[int, int, int], float],
+    ) -> tuple[npt.NDArray[np.float64], npt.NDArray[np.intp]]:
+        """Рассчитывает матрицы времени в пути и следующих станций маршрута.
+
+        Кратчайшие пути между всеми парами станций находятся алгоритмом
+        Флойда-Уоршелла.
+        """
+        size = len(self.station_ids)
+        travel_times = np.full((size, size), np.inf)
+        np.fill_diagonal(travel_times, 0)
+        next_stations = np.full((size, size), -1, dtype=np.intp)
+        for (from_station_id, to_station_id, _), travel_time in edges.items():
+            row, column = self._get_cell(from_station_id, to_station_id)
+            if travel_time < travel_times[row, column]:
+                travel_times[row, column] = travel_time
+                next_stations[row, column] = column
+
+        for index in range(size):
+            through = (
+                travel_times[:, index, np.newaxis] + travel_times[np.newaxis, index, :]
+            )
+            shorter = through < travel_times
+            travel_times[shorter] = through[shorter]
+            next_through = np.broadcast_to(
+                next_stations[:, index, np.newaxis], (size, size)
+            )
+            next_stations[shorter] = next_through[shorter]
+        return travel_times, next_stations
+
+    def _get_path(
+            self,
+            next_stations: npt.NDArray[np.intp],
+            from_station_id: int,
+            to_station_id: int,
+    ) -> list[int]:
+        row, column = self._get_cell(from_station_id, to_station_id)
+        path = [row]
+        while row != column:
+            row = int(next_stations[row, column])
+            path.append(row)
+        return [self.station_ids[index] for index in path]
+
+    @staticmethod
+    def _get_legs(
+            path: list[int],
+            edges: dict[tuple[int, int, int], float],
+            edge_directions: dict[tuple[int, int], list[int]],
+    ) -> list[Leg]:
+        """Разбивает путь на участки, проезжаемые одним поездом.
+
+        На каждой станции пересадки выбирается направление, поезд которого проходит
+        без пересадки наибольшую часть оставшегося пути.
+        """
+        hops = list(zip(path, path[1:]))
+        legs = []
+        start = 0
+        while start < len(hops):
+            runs = {
+                direction_id: len(list(itertools.takewhile(
+                    lambda hop: direction_id in edge_directions[hop],  # noqa: B023
+                    hops[start:],
+                )))
+                for direction_id in edge_directions[hops[start]]
+            }
+            direction_id = max(runs, key=runs.__getitem__)
+            end = start + runs[direction_id]
+            legs.append(Leg(
+                from_station_id=hops[start][0],
+                to_station_id=hops[end - 1][1],
+                direction_id=direction_id,
+                travel_time=sum(edges[(*hop, direction_id)] for hop in hops[start:end]),
+            ))
+            start = end
+        return legs
+
+    def get_travel_time(self, from_station_id: int, to_station_id: int) -> float:
+        """Возвращает время в пути между станциями в секундах без ожидания поездов."""
+        if not {from_station_id, to_station_id} <= self.station_index.keys():
+            return np.inf
+        return float(self.travel_times[self._get_cell(from_station_id, to_station_id)])
+
+    def plan(
+            self,
+            from_station_id: int,
+            to_station_id: int,
+            is_weekend: bool,
+            now: dt.datetime | None = None,
+            limit: int = settings.LIMIT_ROW,
+    ) -> list[Trip]:
+        """Рассчитывает ближайшие варианты поездки между станциями.
+
+        Первый участок начинается с ближайших поездов, отправляющихся в пределах
+        MAX_WAITING_TIME минут, а отправление на каждом следующем участке находится
+        бинарным поиском после прибытия на станцию пересадки.
+
+        Args:
+            from_station_id: id станции отправления.
+            to_station_id: id станции назначения.
+            is_weekend: Признак расписания выходного дня.
+            now: Текущее время, по умолчанию берется системное.
+            limit: Максимальное количество вариантов.
+
+        Returns:
+            Список вариантов поездки, пустой, если станции недостижимы или поездов нет.
+        """
+        if not (legs := self.legs.get((from_station_id, to_station_id))):
+            return []
+
+        now = now or dt.datetime.now()
+        current = timetable.to_service_seconds(now.time()) + now.microsecond / 1_000_000
+        unit = self.timetable.unit
+        transfer_station_ids = tuple(leg.from_station_id for leg in legs[1:])
+        first_key = (legs[0].from_station_id, legs[0].direction_id, is_weekend)
+        first_departures = self.timetable.next_departures(
+            first_key, current / unit, limit
+        )
+
+        trips = []
+        for first_departure in first_departures:
+            departure = float(first_departure) * unit
+            if departure - current >= settings.MAX_WAITING_TIME * 60:
+                break
+            arrival = departure + legs[0].travel_time
+            for leg in legs[1:]:
+                key = (leg.from_station_id, leg.direction_id, is_weekend)
+                departures = self.timetable.next_departures(key, arrival / unit, 1)
+                if not departures:
+                    return trips
+                arrival = float(departures[0]) * unit + leg.travel_time
+            trips.append(Trip(
+                departure_at=now + dt.timedelta(seconds=departure - current),
+                arrival_at=now + dt.timedelta(seconds=arrival - current),
+                transfer_station_ids=transfer_station_ids,
+            ))
+        return trips
+
+
+_planner: TripPlanner | None = None
+
+
+def get_planner() -> TripPlanner | None:
+    """Возвращает планировщик поездок или None, если он не построен."""
+    return _planner
+
+
+def set_planner(new_planner: TripPlanner | None) -> None:
+    """Заменяет планировщик поездок, например после загрузки новой версии расписания."""
+    global _planner
+    _planner = new_planner
+
+
+async def load_planner() -> TripPlanner:
+    """Строит планировщик поездок по расписанию в памяти.
+
+    Если расписание не хранится в памяти (TIMETABLE_IN_MEMORY=False), то отправления
+    для планировщика загружаются из таблицы 'schedule'.
+
+    Returns:
+        Построенный объект TripPlanner.
+    """
+    global _planner
+    if (current_timetable := timetable.get_timetable()) is None:
+        current_timetable = timetable.build_timetable(await db.select_timetable())
+    _planner = TripPlanner(current_timetable)
+    logger.info(
+        'Планировщик поездок построен: станций %s, направлений %s',
+        len(_planner.station_ids),
+        len(_planner.lines),
+    )
+    return _planner
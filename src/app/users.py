@@ -0,0 +1,114 @@
+"""Модуль содержит отложенную запись пользователей бота в таблицу 'bot_user'."""
+import logging
+
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+from telegram import User
+from telegram.ext import ContextTypes
+
+from app import db, metrics
+from app.config import settings
+from app.utils import LRUCache
+
+logger = logging.getLogger(__name__)
+
+
+class UsersBuffer:
+    """Буфер новых пользователей бота.
+
+    Пользователи, которые уже есть в таблице 'bot_user', хранятся в LRU-кэше и не
+    приводят к запросам в БД. Новые пользователи накапливаются в буфере и
+    записываются в БД при вызове flush. В буфере хранится не больше max_pending
+    пользователей: не попавшие в него пользователи будут добавлены при следующем
+    обновлении от них.
+    """
+
+    def __init__(
+            self,
+            maxsize: int = settings.KNOWN_USERS_CACHE_SIZE,
+            current_session: async_sessionmaker[AsyncSession] = db.async_session,
+            max_pending: int = settings.USERS_MAX_PENDING,
+    ) -> None:
+        self.known_users: LRUCache[int, bool] = LRUCache(maxsize)
+        self._maxsize = maxsize
+        self._max_pending = max_pending
+        self._current_session = current_session
+        self._pending: dict[int, User] = {}
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    async def warm_up(self) -> None:
+        """Заполняет кэш известных пользователей последними пользователями из БД."""
+        bot_user_ids = await db.select_bot_user_ids(
+            self._maxsize, self._current_session
+        )
+        for bot_user_id in bot_user_ids:
+            self.known_users.set(bot_user_id, True)
+
+    def add(self, telegram_user: User) -> None:
+        """Добавляет пользователя в буфер, если он еще не известен.
+
+        Args:
+            telegram_user: Пользователь бота.
+        """
+        if self.known_users.get(telegram_user.id) is None and (
+            telegram_user.id in self._pending or len(self._pending) < self._max_pending
+        ):
+            self._pending[telegram_user.id] = telegram_user
+
+    async def ensure(self, telegram_user: User) -> None:
+        """Сразу записывает пользователя в БД, если он еще не известен.
+
+        Используется перед записью данных, ссылающихся на таблицу 'bot_user'.
+
+        Args:
+            telegram_user: Пользователь бота.
+        """
+        if self.known_users.get(telegram_user.id) is not None:
+            return
+
+        await db.insert_user(telegram_user, self._current_session)
+        self._pending.pop(telegram_user.id, None)
+        self.known_users.set(telegram_user.id, True)
+
+    async def flush(self) -> None:
+        """Записывает накопленных пользователей в БД.
+
+        При ошибке пользователи возвращаются в буфер, но не больше max_pending.
+        """
+        if not self._pending:
+            return
+
+        telegram_users = list(self._pending.values())
+        self._pending.clear()
+        try:
+            await db.insert_users(telegram_users, self._current_session)
+        except Exception:
+            for telegram_user in telegram_users:
+                if len(self._pending) >= self._max_pending:
+                    break
+                self._pending.setdefault(telegram_user.id, telegram_user)
+            if dropped := len(telegram_users) - sum(
+                telegram_user.id in self._pending for telegram_user in telegram_users
+            ):
+                logger.warning(
+                    'Буфер пользователей переполнен, не записано пользователей: %s',
+                    dropped,
+                )
+            raise
+
+        for telegram_user in telegram_users:
+            self.known_users.set(telegram_user.id, True)
+        logger.info('В БД записано новых пользователей: %s', len(telegram_users))
+
+    async def flush_job(self, _: ContextTypes.DEFAULT_TYPE) -> None:
+        """Задача JobQueue для периодической записи буфера в БД."""
+        await self.flush()
+
+
+USERS_BUFFER = UsersBuffer()
+metrics.METRICS.register_gauge(
+    'bot_known_users_cache_hit_ratio',
+    'Доля попаданий в кэш известных пользователей.',
+    lambda: USERS_BUFFER.known_users.hit_ratio,
+)
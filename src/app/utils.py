@@ -1,7 +1,13 @@
 import datetime as dt
+import time
+import typing as t
+from collections import OrderedDict
 
 from app.config import settings
 
+K = t.TypeVar('K')
+V = t.TypeVar('V')
+
 
 async def is_weekend() -> bool:
     """Функция проверяет, является ли текущий день выходным.
@@ -20,3 +26,126 @@ async def metro_is_closed() -> bool:
         True, если метро закрыто в настоящее время. Иначе False.
     """
     return settings.CLOSE_TIME_METRO <= dt.datetime.now().time() < settings.OPEN_TIME_METRO
+
+
+def get_time_to_train(
+        departure_time: dt.time,
+        now: dt.datetime | None = None,
+) -> dt.timedelta:
+    """Функция рассчитывает время до отправления поезда.
+
+    Args:
+        departure_time: Время отправления поезда.
+        now: Текущее время, по умолчанию берется системное.
+
+    Returns:
+        Время до отправления поезда. Если поезд отправляется после полуночи, то
+          учитывается переход на следующие сутки.
+    """
+    now = now or dt.datetime.now()
+    time_to_train = dt.datetime.combine(now.date(), departure_time) - now
+    return time_to_train % dt.timedelta(days=1)
+
+
+def get_departure_ranges(
+        now: dt.datetime | None = None,
+) -> list[tuple[dt.time, dt.time]]:
+    """Функция рассчитывает диапазоны времени отправления поездов, до которых не больше
+    MAX_WAITING_TIME минут.
+
+    Args:
+        now: Текущее время, по умолчанию берется системное.
+
+    Returns:
+        Список полуоткрытых диапазонов [начало, конец) в порядке отправления поездов.
+          Если время ожидания переходит через полночь, то возвращается два диапазона:
+          до конца суток и от начала следующих суток.
+    """
+    now = now or dt.datetime.now()
+    end = now + dt.timedelta(minutes=settings.MAX_WAITING_TIME)
+    if end.date() == now.date():
+        return [(now.time(), end.time())]
+    # Время отправления хранится с точностью до секунд, поэтому граница dt.time.max
+    # не исключает ни одного поезда
+    return [(now.time(), dt.time.max), (dt.time.min, end.time())]
+
+
+def format_time_to_train(time_to_train: dt.timedelta) -> str:
+    """Функция форматирует время до поезда для отображения пользователю.
+
+    Args:
+        time_to_train: Время до отправления поезда.
+
+    Returns:
+        Строка вида 'мм:сс'.
+    """
+    minutes, seconds = divmod(int(time_to_train.total_seconds()), 60)
+    return f'{minutes:02d}:{seconds:02d}'
+
+
+class LRUCache(t.Generic[K, V]):
+    """Ограниченный по размеру кэш, вытесняющий давно не использованные записи.
+
+    Если задан ttl, то записи устаревают через ttl секунд после сохранения. Кэш
+    считает попадания и промахи, чтобы по доле попаданий можно было подобрать его
+    размер и время жизни записей.
+    """
+
+    def __init__(self, maxsize: int, ttl: float | None = None) -> None:
+        self._maxsize = maxsize
+        self._ttl = ttl
+        self._entries: OrderedDict[K, tuple[float, V]] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __contains__(self, key: object) -> bool:
+        return self._get_entry(t.cast(K, key)) is not None
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @property
+    def hit_ratio(self) -> float:
+        """Доля попаданий в кэш среди всех обращений."""
+        requests = self.hits + self.misses
+        return self.hits / requests if requests else 0.0
+
+    def _get_entry(self, key: K) -> tuple[float, V] | None:
+        """Возвращает запись по ключу, удаляя ее, если она устарела."""
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] <= time.monotonic():
+            del self._entries[key]
+            return None
+        return entry
+
+    def get(self, key: K) -> V | None:
+        """Возвращает значение по ключу и отмечает запись как недавно использованную."""
+        if (entry := self._get_entry(key)) is None:
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[1]
+
+    def set(self, key: K, value: V) -> None:
+        """Сохраняет значение.
+
+        При переполнении вытесняется давно не использованная запись.
+        """
+        expires_at = float('inf')
+        if self._ttl is not None:
+            expires_at = time.monotonic() + self._ttl
+        self._entries[key] = (expires_at, value)
+        self._entries.move_to_end(key)
+        if len(self._entries) > self._maxsize:
+            self._entries.popitem(last=False)
+
+    def pop(self, key: K) -> V | None:
+        """Удаляет запись по ключу и возвращает ее значение."""
+        entry = self._entries.pop(key, None)
+        return entry[1] if entry is not None else None
+
+    def clear(self) -> None:
+        """Удаляет все записи кэша."""
+        self._entries.clear()
@@ -34,3 +34,65 @@ CREATE TABLE IF NOT EXISTS favorite (
     FOREIGN KEY (to_station_id) REFERENCES station(station_id) ON DELETE CASCADE ON UPDATE CASCADE,
     CONSTRAINT favorite_unique UNIQUE (bot_user_id, from_station_id, to_station_id)
 );
+
+CREATE TABLE IF NOT EXISTS alert (
+    alert_id SERIAL PRIMARY KEY,
+    bot_user_id INTEGER NOT NULL,
+    from_station_id INTEGER NOT NULL,
+    to_station_id INTEGER NOT NULL,
+    minutes_before INTEGER NOT NULL,
+    departure_at TIMESTAMP NOT NULL,
+    is_recurring BOOLEAN NOT NULL,
+    departure_time TIME NOT NULL,
+    fire_at TIMESTAMP NOT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP NOT NULL,
+    FOREIGN KEY (bot_user_id) REFERENCES bot_user(bot_user_id) ON DELETE CASCADE ON UPDATE CASCADE,
+    FOREIGN KEY (from_station_id) REFERENCES station(station_id) ON DELETE CASCADE ON UPDATE CASCADE,
+    FOREIGN KEY (to_station_id) REFERENCES station(station_id) ON DELETE CASCADE ON UPDATE CASCADE,
+    CONSTRAINT minutes_before_check CHECK (minutes_before > 0)
+);
+
+CREATE INDEX IF NOT EXISTS ix_alert_fire_at ON alert (fire_at);
+
+CREATE TABLE IF NOT EXISTS chat_data (
+    chat_id BIGINT PRIMARY KEY NOT NULL,
+    data JSONB NOT NULL,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS conversation_state (
+    name VARCHAR(50) NOT NULL,
+    conversation_key JSONB NOT NULL,
+    state INTEGER NOT NULL,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP NOT NULL,
+    PRIMARY KEY (name, conversation_key)
+);
+
+CREATE TABLE IF NOT EXISTS timetable_version (
+    version_id SERIAL PRIMARY KEY,
+    source VARCHAR NOT NULL,
+    status VARCHAR(10) NOT NULL DEFAULT 'staging',
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP NOT NULL,
+    promoted_at TIMESTAMP,
+    CONSTRAINT status_check CHECK (status IN ('staging', 'validated', 'invalid', 'active', 'archived'))
+);
+
+CREATE UNIQUE INDEX IF NOT EXISTS active_version_unique ON timetable_version (status) WHERE status = 'active';
+
+CREATE TABLE IF NOT EXISTS station_staging (
+    version_id INTEGER NOT NULL,
+    station_id INTEGER NOT NULL,
+    station_name VARCHAR(30) NOT NULL,
+    PRIMARY KEY (version_id, station_id),
+    FOREIGN KEY (version_id) REFERENCES timetable_version(version_id) ON DELETE CASCADE
+);
+
+CREATE TABLE IF NOT EXISTS schedule_staging (
+    version_id INTEGER NOT NULL,
+    from_station_id INTEGER NOT NULL,
+    to_station_id INTEGER NOT NULL,
+    is_weekend BOOLEAN NOT NULL,
+    departure_time TIME NOT NULL,
+    PRIMARY KEY (version_id, from_station_id, to_station_id, is_weekend, departure_time),
+    FOREIGN KEY (version_id) REFERENCES timetable_version(version_id) ON DELETE CASCADE
+);
@@ -1,12 +1,16 @@
 import logging
 
 from app.bot import start_bot
+from app.logger import setup_logging
 
 logger = logging.getLogger(__name__)
 
 
 if __name__ == '__main__':
+    listener = setup_logging()
     try:
         start_bot()
     except Exception:
         logger.exception('Ошибка при старте бота')
+    finally:
+        listener.stop()
@@ -5,12 +5,14 @@ import pytest
 from sqlalchemy import text
 
 from app.config import settings
-from src.app.db import sync_engine, sync_session
-from src.app.models import Base
+from app.models import Base
+from tests.fixtures.bot_api import bot_api_request
+from tests.fixtures.db import sync_engine, sync_session
 from tests.fixtures.schedules import schedules
 from tests.fixtures.bot_users import new_telegram_user
 
 __all__ = [
+    'bot_api_request',
     'schedules',
     'new_telegram_user',
 ]
@@ -0,0 +1,8 @@
+import pytest
+
+from benchmarks.fakes import FakeBotApiRequest
+
+
+@pytest.fixture
+def bot_api_request():
+    return FakeBotApiRequest()
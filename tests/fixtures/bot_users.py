@@ -3,10 +3,11 @@ from sqlalchemy import select
 from sqlalchemy.orm import Session, sessionmaker
 from telegram import User
 
-from app import db, models
+from app import models
+from tests.fixtures.db import sync_session
 
 
-def get_bot_users(current_session: sessionmaker[Session] = db.sync_session):
+def get_bot_users(current_session: sessionmaker[Session] = sync_session):
     statement = select(models.BotUser)
     with current_session() as session:
         return session.scalars(statement).all()
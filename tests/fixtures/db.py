@@ -0,0 +1,11 @@
+from sqlalchemy import Engine, create_engine
+from sqlalchemy.orm import Session, sessionmaker
+
+from app import db
+from app.config import settings
+
+URL_DB_SYNC = db.URL_DB_ASYNC.set(drivername=settings.DB_DRIVERNAME_SYNC)
+sync_engine: Engine = create_engine(url=URL_DB_SYNC)
+sync_session: sessionmaker[Session] = sessionmaker(
+    bind=sync_engine, expire_on_commit=False
+)
@@ -2,11 +2,12 @@ import pytest
 from sqlalchemy import select
 from sqlalchemy.orm import Session, sessionmaker
 
-from app import db, models
+from app import models
+from tests.fixtures.db import sync_session
 
 
 @pytest.fixture
-def schedules(populate_db, current_session: sessionmaker[Session] = db.sync_session):
+def schedules(populate_db, current_session: sessionmaker[Session] = sync_session):
     statement = select(models.Schedule)
     with current_session() as session:
         schedules = session.scalars(statement).all()
@@ -0,0 +1,170 @@
+import asyncio
+import datetime as dt
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy import delete
+from telegram import User
+from telegram.error import NetworkError
+
+from app import alerts, db, handlers, models
+from tests.fixtures.db import sync_session
+
+DEPARTURE_TIMES = {
+    False: [dt.time(6, 0), dt.time(23, 49), dt.time(0, 2)],
+    True: [dt.time(7, 0), dt.time(23, 30)],
+}
+
+
+def make_alert(alert_id, departure_at, minutes_before=5, is_recurring=False):
+    alert = models.Alert(
+        bot_user_id=1,
+        from_station_id=1,
+        to_station_id=9,
+        minutes_before=minutes_before,
+        departure_at=departure_at,
+        is_recurring=is_recurring,
+        departure_time=departure_at.time(),
+        fire_at=departure_at - dt.timedelta(minutes=minutes_before),
+    )
+    alert.alert_id = alert_id
+    return alert
+
+
+@pytest.mark.parametrize(
+    'earliest, expected',
+    [
+        (dt.datetime(2023, 5, 29, 12, 0), dt.datetime(2023, 5, 29, 23, 49)),
+        (dt.datetime(2023, 5, 29, 23, 55), dt.datetime(2023, 5, 30, 0, 2)),
+        (dt.datetime(2023, 5, 30, 0, 10), dt.datetime(2023, 5, 30, 6, 0)),
+        (dt.datetime(2023, 5, 26, 23, 55), dt.datetime(2023, 5, 27, 0, 2)),
+        (dt.datetime(2023, 5, 27, 23, 40), dt.datetime(2023, 5, 28, 7, 0)),
+    ]
+)
+def test_get_next_departure(earliest, expected):
+    assert alerts.get_next_departure(DEPARTURE_TIMES, earliest) == expected
+
+
+def test_get_recurring_departure():
+    friday = make_alert(1, dt.datetime(2023, 5, 26, 6, 0), is_recurring=True)
+    now = friday.departure_at
+
+    saturday_at = alerts.get_recurring_departure(friday, DEPARTURE_TIMES, now)
+    assert saturday_at == dt.datetime(2023, 5, 27, 7, 0), (
+        'В субботу уведомление должно прийти о поезде из расписания выходного дня.'
+    )
+
+    friday.departure_at = dt.datetime(2023, 5, 28, 7, 0)
+    now = friday.departure_at
+    monday_at = alerts.get_recurring_departure(friday, DEPARTURE_TIMES, now)
+    assert monday_at == dt.datetime(2023, 5, 29, 6, 0), (
+        'В будний день уведомление должно вернуться к поезду, выбранному при подписке.'
+    )
+
+    assert alerts.get_recurring_departure(
+        friday, DEPARTURE_TIMES, dt.datetime(2023, 5, 31, 12, 0)
+    ) == dt.datetime(2023, 6, 1, 6, 0)
+    assert alerts.get_recurring_departure(friday, {False: [], True: []}, now) is None
+
+
+def delete_bot_user(bot_user_id):
+    with sync_session() as session:
+        statement = delete(models.BotUser).where(
+            models.BotUser.bot_user_id == bot_user_id
+        )
+        session.execute(statement)
+        session.commit()
+
+
+class FakeBot:
+    def __init__(self, error=None):
+        self.messages = []
+        self.error = error
+
+    async def send_message(self, chat_id, text, **kwargs):
+        if self.error:
+            raise self.error
+        self.messages.append((chat_id, text))
+
+
+@pytest.mark.asyncio
+async def test_send_alerts(populate_db):
+    telegram_user = User(id=555000555, first_name='Alert', is_bot=False)
+    await db.insert_user(telegram_user)
+    now = dt.datetime.now()
+    departure_at = now + dt.timedelta(minutes=1)
+    try:
+        await db.insert_alert(telegram_user, 1, 9, 5, departure_at, is_recurring=False)
+        daily = await db.insert_alert(
+            telegram_user, 9, 1, 5, departure_at, is_recurring=True
+        )
+
+        bot = FakeBot()
+        await handlers.send_alerts(SimpleNamespace(bot=bot))
+
+        assert sorted(chat_id for chat_id, _ in bot.messages) == [telegram_user.id] * 2
+        assert all('через 5 мин' in text for _, text in bot.messages)
+        [rescheduled] = await db.select_alerts()
+        assert rescheduled.alert_id == daily.alert_id
+        assert rescheduled.departure_at > departure_at, (
+            'Ежедневное уведомление должно быть запланировано на следующие сутки.'
+        )
+        assert rescheduled.fire_at == rescheduled.departure_at - dt.timedelta(minutes=5)
+
+        await handlers.send_alerts(SimpleNamespace(bot=bot))
+        assert len(bot.messages) == 2
+    finally:
+        delete_bot_user(telegram_user.id)
+
+
+@pytest.mark.asyncio
+async def test_claim_due_alerts(populate_db):
+    telegram_user = User(id=555000557, first_name='Alert', is_bot=False)
+    await db.insert_user(telegram_user)
+    now = dt.datetime.now()
+    try:
+        for minutes in range(1, 4):
+            departure_at = now + dt.timedelta(minutes=minutes)
+            await db.insert_alert(telegram_user, 1, 9, 5, departure_at, False)
+
+        # Два процесса бота захватывают уведомления одновременно
+        claimed = await asyncio.gather(alerts.claim_due(now), alerts.claim_due(now))
+        claimed_ids = [alert.alert_id for batch in claimed for alert in batch]
+        assert len(claimed_ids) == len(set(claimed_ids)) == 3, (
+            'Каждое уведомление должен захватить один процесс.'
+        )
+        assert await alerts.claim_due(now) == []
+        assert len(await alerts.claim_due(now + dt.timedelta(minutes=2))) == 3, (
+            'Уведомления остановленного процесса должны захватываться повторно.'
+        )
+    finally:
+        delete_bot_user(telegram_user.id)
+
+
+@pytest.mark.asyncio
+async def test_send_alerts_retry(populate_db):
+    telegram_user = User(id=555000556, first_name='Alert', is_bot=False)
+    await db.insert_user(telegram_user)
+    now = dt.datetime.now()
+    departure_at = now + dt.timedelta(minutes=1)
+    try:
+        once = await db.insert_alert(
+            telegram_user, 1, 9, 5, departure_at, is_recurring=False
+        )
+        await db.insert_alert(
+            telegram_user, 9, 1, 5, now - dt.timedelta(minutes=1), is_recurring=False
+        )
+
+        failing_bot = FakeBot(NetworkError('Нет сети'))
+        await handlers.send_alerts(SimpleNamespace(bot=failing_bot))
+        alert_ids = [alert.alert_id for alert in await db.select_alerts()]
+        assert alert_ids == [once.alert_id], (
+            'Неотправленное разовое уведомление повторяется, пока поезд не отправился.'
+        )
+
+        bot = FakeBot()
+        await handlers.send_alerts(SimpleNamespace(bot=bot))
+        assert len(bot.messages) == 1
+        assert await db.select_alerts() == []
+    finally:
+        delete_bot_user(telegram_user.id)
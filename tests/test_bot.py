@@ -0,0 +1,94 @@
+import asyncio
+
+import httpx
+import pydantic
+import pytest
+from telegram.ext import DictPersistence
+
+from app import bot, config, messages, metrics
+from benchmarks.fakes import FakeBotApiServer, make_command_data
+
+SECRET_TOKEN = 'secret_token'
+
+
+@pytest.mark.parametrize(
+    'webhook_url, secret_token',
+    [
+        (None, SECRET_TOKEN),
+        ('http://example.com/webhook', SECRET_TOKEN),
+        ('https://example.com/webhook', None),
+    ]
+)
+def test_webhook_settings(webhook_url, secret_token):
+    with pytest.raises(pydantic.ValidationError):
+        config.Settings(
+            UPDATES_MODE='webhook',
+            WEBHOOK_URL=webhook_url,
+            WEBHOOK_SECRET_TOKEN=secret_token,
+        )
+    assert config.Settings(
+        UPDATES_MODE='webhook',
+        WEBHOOK_URL='https://example.com/webhook',
+        WEBHOOK_SECRET_TOKEN=SECRET_TOKEN,
+    ).WEBHOOK_URL == 'https://example.com/webhook'
+
+
+@pytest.mark.asyncio
+async def test_webhook(bot_api_request, unused_tcp_port):
+    application = bot.build_application(request=bot_api_request)
+    url = f'http://127.0.0.1:{unused_tcp_port}/webhook'
+
+    async with application:
+        await application.start()
+        await application.updater.start_webhook(
+            listen='127.0.0.1',
+            port=unused_tcp_port,
+            url_path='webhook',
+            secret_token=SECRET_TOKEN,
+        )
+        async with httpx.AsyncClient() as client:
+            wrong_response = await client.post(
+                url,
+                json=make_command_data(1, '/help'),
+                headers={'X-Telegram-Bot-Api-Secret-Token': 'wrong'},
+            )
+            response = await client.post(
+                url,
+                json=make_command_data(2, '/help'),
+                headers={'X-Telegram-Bot-Api-Secret-Token': SECRET_TOKEN},
+            )
+        await asyncio.sleep(0.1)
+        await application.updater.stop()
+        await application.stop()
+
+    assert wrong_response.status_code == 403, (
+        'Обновление с неверным секретным токеном должно отклоняться.'
+    )
+    assert response.status_code == 200
+    sent_texts = [
+        parameters['text']
+        for endpoint, parameters in bot_api_request.calls
+        if endpoint == 'sendMessage'
+    ]
+    assert sent_texts == [messages.HELP]
+    assert metrics.METRICS.handler_latency['help_handler'].count >= 1
+
+
+@pytest.mark.asyncio
+async def test_fake_bot_api_server():
+    server = FakeBotApiServer()
+    application = bot.build_application(
+        base_url=server.start(),
+        bot_persistence=DictPersistence(),
+    )
+    try:
+        async with application:
+            message = await application.bot.send_message(
+                123, '<b>42</b>', parse_mode='HTML'
+            )
+    finally:
+        server.stop()
+
+    assert message.text == '<b>42</b>' and message.chat.id == 123
+    assert server.api.count_calls() == {'getMe': 1, 'sendMessage': 1}
+    assert server.api.calls[-1][1]['parse_mode'] == 'HTML'
@@ -0,0 +1,107 @@
+import asyncio
+import datetime as dt
+
+import freezegun
+import pytest
+
+from app import cache
+
+
+class FakeSelectSchedule:
+    def __init__(self, departure_times):
+        self.departure_times = departure_times
+        self.calls = 0
+
+    async def __call__(self, from_station_id, to_station_id, is_weekend):
+        self.calls += 1
+        await asyncio.sleep(0)
+        return list(self.departure_times)
+
+
+@pytest.mark.asyncio
+async def test_schedule_cache_single_flight():
+    select_schedule = FakeSelectSchedule([dt.time(12, 5), dt.time(12, 10)])
+    schedule_cache = cache.ScheduleCache(select_schedule, ttl=60)
+
+    with freezegun.freeze_time(dt.datetime(2023, 5, 29, 12, 0, 0)):
+        results = await asyncio.gather(
+            *(schedule_cache.select_schedule(1, 9) for _ in range(10))
+        )
+
+    assert select_schedule.calls == 1, (
+        'Одновременные запросы должны объединяться в один.'
+    )
+    assert all(result is results[0] for result in results)
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    'ttl, departure_times, seconds, expected_calls',
+    [
+        (600, [dt.time(12, 5)], 299, 1),
+        (600, [dt.time(12, 5)], 300, 2),
+        (60, [dt.time(12, 5)], 60, 2),
+        (60, [], 59, 1),
+    ]
+)
+async def test_schedule_cache_expiration(ttl, departure_times, seconds, expected_calls):
+    select_schedule = FakeSelectSchedule(departure_times)
+    schedule_cache = cache.ScheduleCache(select_schedule, ttl=ttl)
+
+    with freezegun.freeze_time(dt.datetime(2023, 5, 29, 12, 0, 0)) as frozen_time:
+        await schedule_cache.select_schedule(1, 9)
+        frozen_time.tick(seconds)
+        await schedule_cache.select_schedule(1, 9)
+
+    assert select_schedule.calls == expected_calls
+
+
+@pytest.mark.asyncio
+async def test_schedule_cache_clear_in_flight():
+    release = asyncio.Event()
+    old_times, new_times = [dt.time(12, 5)], [dt.time(12, 7)]
+    results = [old_times, new_times]
+
+    async def select_schedule(from_station_id, to_station_id, is_weekend):
+        departure_times = results.pop(0)
+        if departure_times is old_times:
+            await release.wait()
+        return departure_times
+
+    schedule_cache = cache.ScheduleCache(select_schedule, ttl=600)
+    with freezegun.freeze_time(dt.datetime(2023, 5, 29, 12, 0, 0)):
+        stale = asyncio.create_task(schedule_cache.select_schedule(1, 9))
+        await asyncio.sleep(0)
+        schedule_cache.clear()
+
+        fresh = await asyncio.wait_for(schedule_cache.select_schedule(1, 9), timeout=1)
+        assert fresh == new_times, (
+            'После очистки не нужно ждать запрос, начатый до нее.'
+        )
+        release.set()
+        assert await stale == old_times
+        assert await schedule_cache.select_schedule(1, 9) == new_times, (
+            'Результат запроса, начатого до очистки, не должен попадать в кэш.'
+        )
+
+
+@pytest.mark.asyncio
+async def test_bucket_cache_failure():
+    calls = []
+
+    async def compute():
+        calls.append(len(calls))
+        if len(calls) == 1:
+            raise ConnectionError('БД недоступна')
+        return len(calls)
+
+    bucket_cache = cache.BucketCache(compute, bucket=60)
+    with freezegun.freeze_time(dt.datetime(2023, 5, 29, 12, 0, 0)):
+        with pytest.raises(ConnectionError):
+            await bucket_cache.get()
+
+        assert await bucket_cache.get() == 2, (
+            'Ошибка вычисления не должна оставаться в кэше.'
+        )
+        assert await bucket_cache.get() == 2
+    assert len(calls) == 2
@@ -1,7 +1,11 @@
+import datetime as dt
+
 import pytest
+from sqlalchemy import event
 
 from app import db, models
 from tests.fixtures.bot_users import get_bot_users
+from tests.fixtures.db import sync_session
 
 
 @pytest.mark.usefixtures('schedules')
@@ -14,10 +18,59 @@ class TestSchedule:
 
     @pytest.mark.asyncio
     async def test_select_schedule(self):
-        schedules = await db.select_schedule(from_station_id=1, to_station_id=9)
+        departure_times = await db.select_schedule(from_station_id=1, to_station_id=9)
 
-        assert isinstance(schedules, list)
-        assert all(isinstance(schedule, models.Schedule) for schedule in schedules), 'Объекты должны быть экземплярами класса Schedule.'
+        assert isinstance(departure_times, list)
+        assert all(
+            type(departure_time) is dt.time for departure_time in departure_times
+        ), (
+            'Запрос должен возвращать время отправления без объектов Schedule.'
+        )
+
+    @pytest.mark.asyncio
+    async def test_select_schedule_midnight(self, monkeypatch):
+        monkeypatch.setattr(db.settings, 'MAX_WAITING_TIME', 60)
+        departure_times = await db.select_schedule(
+            from_station_id=1,
+            to_station_id=9,
+            is_weekend=False,
+            now=dt.datetime(2023, 5, 29, 23, 40),
+        )
+
+        assert departure_times == [dt.time(23, 49), dt.time(0, 2)], (
+            'Поезда после полуночи должны следовать за поездами до полуночи.'
+        )
+
+    @pytest.mark.asyncio
+    async def test_select_schedule_uses_index(self):
+        statements = []
+
+        def capture(conn, cursor, statement, parameters, context, executemany):
+            statements.append((statement, parameters))
+
+        event.listen(db.async_engine.sync_engine, 'before_cursor_execute', capture)
+        try:
+            await db.select_schedule(
+                1, 9, is_weekend=False, now=dt.datetime(2023, 5, 29, 12, 0)
+            )
+        finally:
+            event.remove(db.async_engine.sync_engine, 'before_cursor_execute', capture)
+
+        statement, parameters = statements[-1]
+        assert 'JOIN' not in statement, (
+            'Станции не должны присоединяться к запросу расписания.'
+        )
+        async with db.async_engine.connect() as connection:
+            await connection.exec_driver_sql('ANALYZE schedule')
+            result = await connection.exec_driver_sql(
+                f'EXPLAIN {statement}', parameters
+            )
+            plan = '\n'.join(result.scalars())
+
+        # Все выбираемые столбцы есть в индексе, поэтому PostgreSQL может читать
+        # только индекс
+        assert 'Scan using schedule_unique on schedule' in plan, plan
+        assert 'Sort' not in plan, plan
 
 
 class TestBotUser:
@@ -35,3 +88,66 @@ class TestBotUser:
         assert bot_users[0].last_name == new_telegram_user.last_name
         assert bot_users[0].username == new_telegram_user.username
         assert bot_users[0].is_bot == new_telegram_user.is_bot
+
+
+class TestFavorite:
+    @pytest.mark.asyncio
+    async def test_favorites(self, populate_db, new_telegram_user):
+        await db.insert_user(new_telegram_user)
+        assert not await db.favorites_limited(new_telegram_user)
+
+        assert not await db.select_favorites(new_telegram_user)
+        await db.insert_favorite(new_telegram_user, from_station_id=1, to_station_id=9)
+        await db.insert_favorite(new_telegram_user, from_station_id=9, to_station_id=1)
+
+        assert db.FAVORITES_CACHE.get(new_telegram_user.id) is not None, (
+            'Кэш избранного должен обновляться.'
+        )
+        favorites = await db.select_favorites(new_telegram_user)
+        assert [
+            (favorite.from_station_id, favorite.to_station_id) for favorite in favorites
+        ] == [(1, 9), (9, 1)]
+        assert await db.favorites_limited(new_telegram_user), (
+            'Должен быть достигнут лимит избранного.'
+        )
+
+        await db.delete_favorites(new_telegram_user)
+        assert not await db.select_favorites(new_telegram_user)
+
+        # Избранное, добавленное другим экземпляром бота, учитывается после
+        # устаревания записи кэша
+        with sync_session() as session:
+            session.add_all([
+                models.Favorite(
+                    bot_user_id=new_telegram_user.id,
+                    from_station_id=from_station_id,
+                    to_station_id=to_station_id,
+                )
+                for from_station_id, to_station_id in ((1, 9), (9, 1))
+            ])
+            session.commit()
+        assert not await db.favorites_limited(new_telegram_user), (
+            'Лимит избранного должен проверяться по кэшу.'
+        )
+        db.FAVORITES_CACHE.clear()
+        assert await db.favorites_limited(new_telegram_user), (
+            'При промахе кэша лимит избранного должен проверяться по БД.'
+        )
+        await db.delete_favorites(new_telegram_user)
+
+    @pytest.mark.asyncio
+    async def test_select_favorites_concurrent_write(
+            self, new_telegram_user, monkeypatch
+    ):
+        def concurrent_write_session():
+            # Избранное меняется, пока выполняется запрос select_favorites
+            monkeypatch.setattr(db, '_favorites_writes', db._favorites_writes + 1)
+            return db.async_session()
+
+        db.FAVORITES_CACHE.clear()
+        assert not await db.select_favorites(
+            new_telegram_user, concurrent_write_session
+        )
+        assert db.FAVORITES_CACHE.get(new_telegram_user.id) is None, (
+            'Результат запроса не должен затирать изменения, сделанные во время него.'
+        )
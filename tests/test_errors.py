@@ -0,0 +1,151 @@
+import datetime as dt
+from types import SimpleNamespace
+
+import pytest
+from telegram.error import NetworkError
+
+from app import errors, handlers
+
+
+def fail(value):
+    raise ValueError(f'Некорректное значение {value}')
+
+
+def fail_type():
+    raise TypeError('Некорректный тип')
+
+
+def catch(func, *args):
+    try:
+        func(*args)
+    except Exception as error:
+        return error
+
+
+def test_digest_truncated():
+    aggregator = errors.ErrorAggregator(max_fingerprints=100)
+    now = dt.datetime(2023, 5, 29, 12, 0)
+    for index in range(40):
+        fingerprint = f'{index:012x}'
+        aggregator.errors[fingerprint] = errors.ErrorStats(
+            fingerprint, 'ValueError', 'x' * 200, now, now, count=2, pending_count=1
+        )
+
+    text, pending_counts = aggregator.digest()
+    assert len(text) <= errors.MESSAGE_LIMIT
+    assert 0 < len(pending_counts) < 40
+    assert all(fingerprint in text for fingerprint in pending_counts)
+
+    reported = set()
+    while (digest := aggregator.digest()) is not None:
+        _, pending_counts = digest
+        assert reported.isdisjoint(pending_counts)
+        reported.update(pending_counts)
+        aggregator.acknowledge(pending_counts)
+    assert len(reported) == 40, (
+        'Отпечатки, не попавшие в сводку, должны остаться до следующей сводки.'
+    )
+
+
+class FakeBot:
+    def __init__(self):
+        self.messages = []
+        self.error = None
+
+    async def send_message(self, chat_id, text, **kwargs):
+        if self.error:
+            raise self.error
+        self.messages.append(text)
+
+
+def test_fingerprint():
+    first, second = catch(fail, 1), catch(fail, 2)
+
+    assert errors.get_fingerprint(first) == errors.get_fingerprint(second), (
+        'Отпечаток не должен зависеть от текста сообщения.'
+    )
+    assert errors.get_fingerprint(first) != errors.get_fingerprint(catch(fail_type))
+
+
+def test_aggregator_digest():
+    aggregator = errors.ErrorAggregator(max_fingerprints=2)
+    now = dt.datetime(2023, 5, 29, 12, 0)
+
+    fingerprint, is_new = aggregator.record(catch(fail, 1), now)
+    assert is_new
+    assert aggregator.digest() is None, (
+        'Первая ошибка отправляется сразу и не попадает в сводку.'
+    )
+    assert aggregator.record(catch(fail, 2), now) == (fingerprint, False)
+    aggregator.record(catch(fail, '<3>'), now)
+
+    text, pending_counts = aggregator.digest()
+    assert (
+        f'2 / 3 <b>ValueError</b> {fingerprint}: Некорректное значение &lt;3&gt;'
+        in text
+    )
+    assert aggregator.digest() is not None, (
+        'Счетчики сводки сбрасываются только после отправки.'
+    )
+    aggregator.record(catch(fail, 4), now)
+    aggregator.acknowledge(pending_counts)
+    assert aggregator.digest()[1] == {fingerprint: 1}, (
+        'Повторы во время отправки попадают в следующую сводку.'
+    )
+    aggregator.acknowledge({fingerprint: 1})
+    assert aggregator.digest() is None
+
+    aggregator.record(catch(fail_type), now + dt.timedelta(minutes=1))
+    aggregator.record(catch(lambda: {}['key']), now + dt.timedelta(minutes=2))
+    assert fingerprint not in aggregator.errors, (
+        'Давно не повторявшийся отпечаток должен вытесняться.'
+    )
+
+
+@pytest.mark.asyncio
+async def test_error_handler(monkeypatch):
+    monkeypatch.setattr(errors, 'ERRORS', errors.ErrorAggregator())
+    bot = FakeBot()
+
+    for value in range(5):
+        context = SimpleNamespace(
+            bot=bot, error=catch(fail, value), chat_data={}, user_data={}
+        )
+        await handlers.error_handler(None, context)
+    assert len(bot.messages) == 1, (
+        'Разработчику отправляется только первая ошибка с новым отпечатком.'
+    )
+    assert 'ValueError' in bot.messages[0]
+
+    await errors.ERRORS.digest_job(SimpleNamespace(bot=bot))
+    assert len(bot.messages) == 2
+    assert '4 / 5 <b>ValueError</b>' in bot.messages[1]
+
+
+@pytest.mark.asyncio
+async def test_error_handler_send_failed(monkeypatch):
+    monkeypatch.setattr(errors, 'ERRORS', errors.ErrorAggregator())
+    bot = FakeBot()
+    bot.error = NetworkError('Нет сети')
+
+    error = catch(fail, '<' * errors.MESSAGE_LIMIT)
+    context = SimpleNamespace(bot=bot, error=error, chat_data={}, user_data={})
+    with pytest.raises(NetworkError):
+        await handlers.error_handler(None, context)
+
+    bot.error = None
+    await handlers.error_handler(None, context)
+    assert len(bot.messages) == 1, (
+        'Ошибка, о которой не удалось сообщить, отправляется повторно.'
+    )
+    assert len(bot.messages[0]) <= errors.MESSAGE_LIMIT
+
+    await handlers.error_handler(None, context)
+    bot.error = NetworkError('Нет сети')
+    with pytest.raises(NetworkError):
+        await errors.ERRORS.digest_job(SimpleNamespace(bot=bot))
+    bot.error = None
+    await errors.ERRORS.digest_job(SimpleNamespace(bot=bot))
+    assert '1 / 3 <b>ValueError</b>' in bot.messages[1], (
+        'Неотправленная сводка не должна сбрасываться.'
+    )
@@ -0,0 +1,71 @@
+import asyncio
+import datetime as dt
+from types import SimpleNamespace
+from unittest.mock import AsyncMock
+
+import pytest
+
+from app import cache, handlers, keyboards, stations, timetable
+
+
+class SlowSelectSchedule:
+    def __init__(self):
+        self.running = 0
+        self.max_running = 0
+
+    async def __call__(self, from_station_id, to_station_id, is_weekend):
+        self.running += 1
+        self.max_running = max(self.max_running, self.running)
+        await asyncio.sleep(0.01)
+        self.running -= 1
+        return [dt.time(23, 59)]
+
+
+@pytest.mark.asyncio
+async def test_get_texts_with_time_to_train_concurrent(monkeypatch):
+    select_schedule = SlowSelectSchedule()
+    monkeypatch.setattr(timetable, '_timetable', None)
+    monkeypatch.setattr(cache, 'SCHEDULE_CACHE', cache.ScheduleCache(select_schedule))
+
+    routes = [(1, 9), (2, 9), (3, 9), (4, 9)]
+    texts = await handlers.get_texts_with_time_to_train(routes)
+
+    assert len(texts) == len(routes)
+    assert select_schedule.max_running == len(routes), (
+        'Маршруты избранного должны запрашиваться конкурентно.'
+    )
+
+
+@pytest.mark.asyncio
+async def test_inline_query(populate_db, monkeypatch):
+    keyboards.build_keyboards(await stations.load_stations_dict())
+    get_texts = AsyncMock(side_effect=handlers.get_texts_with_time_to_train)
+    monkeypatch.setattr(handlers, 'get_texts_with_time_to_train', get_texts)
+    monkeypatch.setattr(handlers, 'metro_is_closed', AsyncMock(return_value=False))
+    inline_answers = cache.BucketCache(handlers.get_inline_answers, bucket=60)
+    monkeypatch.setattr(handlers, 'INLINE_ANSWERS', inline_answers)
+    # Все запросы теста должны попасть в один интервал кэша
+    monkeypatch.setattr(cache, 'time', SimpleNamespace(time=lambda: 60.0))
+
+    answers = []
+    for text in ('динамо', 'ДИНАМО ', 'космонавтов'):
+        answer = AsyncMock()
+        inline_query = SimpleNamespace(query=text, answer=answer)
+        await handlers.inline_query.__wrapped__(
+            SimpleNamespace(inline_query=inline_query), None
+        )
+        answers.append(answer)
+
+    results, = answers[0].await_args.args
+    assert [result.title for result in results] == [
+        'Динамо ➡ Космонавтов',
+        'Динамо ➡ Ботаническая',
+    ]
+    cache_time = answers[0].await_args.kwargs['cache_time']
+    assert cache_time == handlers.settings.INLINE_CACHE_TIME
+    assert answers[1].await_args.args == answers[0].await_args.args
+    titles = [result.title for result in answers[2].await_args.args[0]]
+    assert titles == ['Космонавтов ➡ Ботаническая']
+    assert get_texts.await_count == 1, (
+        'Ответы для всех станций должны рассчитываться один раз за интервал.'
+    )
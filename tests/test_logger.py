@@ -0,0 +1,69 @@
+import json
+import logging
+import logging.handlers
+import queue
+import sys
+
+from app import logger
+from app.config import settings
+
+
+def test_json_formatter():
+    record = logging.makeLogRecord({
+        'name': 'app.decorators',
+        'levelname': 'INFO',
+        'msg': 'Пользователь %s',
+        'args': ('ilya',),
+        'command': '/start',
+    })
+    data = json.loads(logger.JsonFormatter().format(record))
+
+    assert data['message'] == 'Пользователь ilya'
+    assert data['command'] == '/start', 'Поля из extra должны попадать в JSON.'
+    assert data['level'] == 'INFO'
+
+
+def test_get_file_handler(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, 'LOG_FILENAME', tmp_path / 'bot.log')
+
+    monkeypatch.setattr(settings, 'LOG_ROTATION', 'size')
+    handler = logger.get_file_handler()
+    assert isinstance(handler, logging.handlers.RotatingFileHandler)
+    handler.close()
+
+    monkeypatch.setattr(settings, 'LOG_ROTATION', 'time')
+    monkeypatch.setattr(settings, 'LOG_FORMAT', 'json')
+    handler = logger.get_file_handler()
+    assert isinstance(handler, logging.handlers.TimedRotatingFileHandler)
+    assert isinstance(handler.formatter, logger.JsonFormatter)
+    handler.close()
+
+
+def test_log_queue_handler_exc_info():
+    log_queue = queue.SimpleQueue()
+    queue_handler = logger.LogQueueHandler(log_queue)
+    try:
+        raise ValueError('Некорректное значение')
+    except ValueError:
+        record = logging.getLogger('app.handlers').makeRecord(
+            'app.handlers',
+            logging.ERROR,
+            __file__,
+            0,
+            'Ошибка %s',
+            ('ilya',),
+            sys.exc_info(),
+        )
+    queue_handler.handle(record)
+    queued_record = log_queue.get_nowait()
+
+    data = json.loads(logger.JsonFormatter().format(queued_record))
+    assert data['message'] == 'Ошибка ilya', (
+        'Трейсбек не должен добавляться к сообщению.'
+    )
+    assert 'ValueError: Некорректное значение' in data['exc_info']
+
+    text = logging.Formatter(logger.LOG_FORMAT).format(queued_record)
+    assert 'ValueError: Некорректное значение' in text, (
+        'Текстовый лог должен содержать трейсбек.'
+    )
@@ -0,0 +1,72 @@
+import time
+
+import httpx
+import pytest
+
+from app import db, metrics
+
+
+def test_histogram():
+    histogram = metrics.Histogram(buckets=(0.01, 0.1, 1.0))
+    for value in (0.005, 0.05, 0.05, 0.5, 5):
+        histogram.observe(value)
+
+    assert histogram.bucket_counts == [1, 2, 1, 1]
+    assert histogram.count == 5
+    assert histogram.quantile(0.5) == 0.1
+    assert histogram.quantile(1) == float('inf')
+
+
+def test_get_statement_label():
+    select = 'SELECT station.station_id FROM station ORDER BY 1'
+    insert = 'INSERT INTO bot_user (bot_user_id) VALUES ($1)'
+    assert metrics.get_statement_label(select) == 'SELECT station'
+    assert metrics.get_statement_label(insert) == 'INSERT bot_user'
+    assert metrics.get_statement_label('select pg_catalog.version()') == 'SELECT'
+
+
+@pytest.mark.asyncio
+async def test_metrics_endpoint(populate_db, unused_tcp_port):
+    metrics.METRICS.clear()
+    await db.select_stations()
+
+    assert metrics.METRICS.query_latency['SELECT station'].count == 1
+    assert metrics.METRICS.pool_checkout_wait.count >= 1
+
+    server = metrics.start_http_server('127.0.0.1', unused_tcp_port)
+    try:
+        async with httpx.AsyncClient() as client:
+            response = await client.get(f'http://127.0.0.1:{unused_tcp_port}/metrics')
+    finally:
+        server.stop()
+
+    assert response.status_code == 200
+    assert (
+        'bot_db_query_duration_seconds_count{statement="SELECT station"} 1'
+        in response.text
+    )
+    assert 'bot_favorites_cache_hit_ratio' in response.text
+    assert 'SELECT station: 1 / 0' in metrics.METRICS.summary()
+
+
+def test_timed_queue_pool_excludes_connect():
+    class FakeConnection:
+        def rollback(self):
+            pass
+
+        def close(self):
+            pass
+
+    def slow_connect():
+        time.sleep(0.05)
+        return FakeConnection()
+
+    metrics.METRICS.clear()
+    pool = metrics.TimedQueuePool(slow_connect, pool_size=1, max_overflow=1)
+    pool.connect().close()
+    pool.connect().close()
+
+    assert metrics.METRICS.pool_checkout_wait.count == 2
+    assert metrics.METRICS.pool_checkout_wait.sum < 0.05, (
+        'Создание соединения не должно входить в ожидание.'
+    )
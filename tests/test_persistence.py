@@ -0,0 +1,89 @@
+import asyncio
+import datetime as dt
+
+import pytest
+from sqlalchemy import func, update
+
+from app import db, models, persistence
+from tests.fixtures.db import sync_session
+
+
+@pytest.mark.asyncio
+async def test_postgres_persistence():
+    postgres_persistence = persistence.PostgresPersistence()
+    await postgres_persistence.get_chat_data()
+    await asyncio.gather(
+        postgres_persistence.update_chat_data(
+            1, {'command': '/schedule', 'bot_message_id': 10}
+        ),
+        postgres_persistence.update_chat_data(
+            2, {'command': '/add_favorite', 'from_station_id': 3}
+        ),
+        postgres_persistence.update_conversation('conversation', (1, 1), 0),
+        postgres_persistence.update_conversation('conversation', (2, 2), 1),
+    )
+
+    await postgres_persistence.flush()
+
+    new_persistence = persistence.PostgresPersistence()
+    chat_data = await new_persistence.get_chat_data()
+    assert chat_data[1] == {'command': '/schedule', 'bot_message_id': 10}
+    assert chat_data[2] == {'command': '/add_favorite', 'from_station_id': 3}
+    conversations = await new_persistence.get_conversations('conversation')
+    assert conversations[(1, 1)] == 0 and conversations[(2, 2)] == 1
+    assert await new_persistence.get_conversations('other') == {}
+
+    await asyncio.gather(
+        new_persistence.drop_chat_data(1),
+        new_persistence.update_chat_data(2, {}),
+        new_persistence.update_conversation('conversation', (1, 1), None),
+    )
+    chat_data = await db.select_chat_data()
+    assert 1 not in chat_data and chat_data[2] == {}
+    conversations = await db.select_conversations('conversation')
+    assert (1, 1) not in conversations and conversations[(2, 2)] == 1
+    await new_persistence.flush()
+    assert not new_persistence.is_writer
+
+
+@pytest.mark.asyncio
+async def test_postgres_persistence_single_writer():
+    writer = persistence.PostgresPersistence()
+    await writer.update_conversation('conversation', (3, 3), 0)
+    await writer.get_chat_data()
+    assert writer.is_writer
+
+    reader = persistence.PostgresPersistence()
+    with pytest.raises(persistence.PersistenceLockError):
+        await reader.get_chat_data()
+    assert not reader.is_writer, 'Записывать состояние должен только один процесс.'
+    await reader.update_conversation('conversation', (3, 3), 1)
+    await writer.update_conversation('conversation', (4, 4), 1)
+    assert (await db.select_conversations('conversation'))[(4, 4)] == 1
+    assert (3, 3) not in await db.select_conversations('conversation')
+
+    await writer.update_conversation('conversation', (4, 4), None)
+    await writer.flush()
+    await reader.flush()
+
+
+@pytest.mark.asyncio
+async def test_postgres_persistence_expired_conversations():
+    postgres_persistence = persistence.PostgresPersistence(conversation_timeout=60)
+    await postgres_persistence.get_chat_data()
+    await postgres_persistence.update_conversation('expired', (5, 5), 0)
+    await postgres_persistence.update_conversation('expired', (6, 6), 0)
+    with sync_session() as session:
+        session.execute(
+            update(models.ConversationState).where(
+                models.ConversationState.conversation_key == [5, 5],
+            ).values(updated_at=func.now() - dt.timedelta(minutes=2))
+        )
+        session.commit()
+
+    assert await postgres_persistence.get_conversations('expired') == {(6, 6): 0}, (
+        'Диалоги старше таймаута не должны восстанавливаться.'
+    )
+    assert await db.select_conversations('expired') == {(6, 6): 0}
+    await postgres_persistence.update_conversation('expired', (6, 6), None)
+    await postgres_persistence.flush()
@@ -0,0 +1,88 @@
+import asyncio
+
+import pytest
+from telegram import Chat, Message, Update
+
+from app import metrics, processors
+
+
+def make_update(update_id, chat_id):
+    chat = Chat(id=chat_id, type=Chat.PRIVATE)
+    return Update(update_id, message=Message(update_id, date=None, chat=chat))
+
+
+@pytest.mark.asyncio
+async def test_updates_of_one_chat_are_ordered():
+    metrics.METRICS.clear()
+    processor = processors.ChatOrderedUpdateProcessor(
+        max_concurrent_handlers=10, max_pending_updates=10
+    )
+    events = []
+
+    async def handle(update_id, delay):
+        events.append(('start', update_id))
+        await asyncio.sleep(delay)
+        events.append(('end', update_id))
+
+    await asyncio.gather(
+        processor.process_update(make_update(1, 100), handle(1, 0.05)),
+        processor.process_update(make_update(2, 100), handle(2, 0)),
+        processor.process_update(make_update(3, 200), handle(3, 0)),
+    )
+
+    assert events.index(('end', 1)) < events.index(('start', 2)), (
+        'Обновления одного чата должны обрабатываться по порядку.'
+    )
+    assert events.index(('end', 3)) < events.index(('end', 1)), (
+        'Обновления разных чатов должны обрабатываться конкурентно.'
+    )
+    assert processor.stats()['processed_updates'] == 3
+    assert processor.stats()['queue_depth'] == 0
+    assert metrics.METRICS.update_wait.count == 3
+    assert metrics.METRICS.update_wait.sum >= 0.05
+    assert not processor._chat_locks, (
+        'Блокировки чатов без обновлений должны удаляться.'
+    )
+
+
+@pytest.mark.asyncio
+async def test_concurrent_handlers_limit():
+    processor = processors.ChatOrderedUpdateProcessor(
+        max_concurrent_handlers=2, max_pending_updates=10
+    )
+    running = []
+
+    async def handle():
+        running.append(processor.running_updates)
+        await asyncio.sleep(0.01)
+
+    await asyncio.gather(
+        *(processor.process_update(make_update(i, i), handle()) for i in range(5)),
+    )
+
+    assert max(running) == 2
+
+
+@pytest.mark.asyncio
+async def test_queue_depth_includes_updates_over_pending_limit():
+    metrics.METRICS.clear()
+    processor = processors.ChatOrderedUpdateProcessor(
+        max_concurrent_handlers=10, max_pending_updates=1
+    )
+    queue_depths = []
+
+    async def handle():
+        await asyncio.sleep(0.01)
+        queue_depths.append(processor.stats()['queue_depth'])
+
+    await asyncio.gather(
+        *(processor.process_update(make_update(i, i), handle()) for i in range(3)),
+    )
+
+    assert queue_depths[0] == 2, (
+        'Обновления, ожидающие семафор max_pending_updates, учитываются в очереди.'
+    )
+    assert processor.stats()['queue_depth'] == 0
+    assert metrics.METRICS.update_wait.sum >= 0.01 + 0.02, (
+        'Время ожидания должно учитываться с момента получения обновления.'
+    )
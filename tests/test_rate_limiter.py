@@ -0,0 +1,140 @@
+import asyncio
+import time
+
+import pytest
+from telegram.error import RetryAfter
+
+from app import metrics, rate_limiter
+
+
+def test_token_bucket():
+    bucket = rate_limiter.TokenBucket(rate=2, capacity=2)
+    now = bucket.updated_at
+
+    assert bucket.take(now) == 0
+    assert bucket.take(now) == 0
+    assert bucket.take(now) == pytest.approx(0.5)
+    assert not bucket.is_full(now + 0.5)
+    assert bucket.take(now + 0.5) == 0
+    assert bucket.is_full(now + 1.5)
+
+
+@pytest.mark.asyncio
+async def test_priority():
+    limiter = rate_limiter.TokenBucketRateLimiter(
+        overall_rate=20, chat_rate=100, chat_burst=100
+    )
+    limiter._overall = rate_limiter.TokenBucket(rate=20, capacity=1)
+    calls = []
+
+    async def callback(name):
+        calls.append(name)
+        return True
+
+    async def request(name, chat_id, priority):
+        return await limiter.process_request(
+            callback, (name,), {}, 'sendMessage', {'chat_id': chat_id}, priority
+        )
+
+    await asyncio.gather(
+        request('first', 1, None),
+        request('background', 2, rate_limiter.BACKGROUND),
+        request('interactive', 3, rate_limiter.INTERACTIVE),
+        request('callback', None, rate_limiter.BACKGROUND),
+    )
+
+    assert calls == ['first', 'callback', 'interactive', 'background'], (
+        'Ответы пользователям должны отправляться раньше фоновых, '
+        'а запросы без chat_id не ждать.'
+    )
+    await limiter.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_chat_limit():
+    limiter = rate_limiter.TokenBucketRateLimiter(
+        overall_rate=100, chat_rate=20, chat_burst=1
+    )
+
+    async def callback():
+        return time.monotonic()
+
+    first, second, other_chat = await asyncio.gather(
+        limiter.process_request(callback, (), {}, 'sendMessage', {'chat_id': 1}, None),
+        limiter.process_request(callback, (), {}, 'sendMessage', {'chat_id': 1}, None),
+        limiter.process_request(callback, (), {}, 'sendMessage', {'chat_id': 2}, None),
+    )
+
+    assert second - first >= 0.04, (
+        'Сообщения в один чат должны отправляться не чаще chat_rate.'
+    )
+    assert other_chat - first < 0.04
+
+
+@pytest.mark.asyncio
+async def test_throttled_metric():
+    metrics.METRICS.clear()
+    limiter = rate_limiter.TokenBucketRateLimiter(
+        overall_rate=100, chat_rate=20, chat_burst=1
+    )
+
+    async def callback():
+        return True
+
+    await limiter.process_request(callback, (), {}, 'sendMessage', {'chat_id': 1}, None)
+    await limiter.process_request(callback, (), {}, 'sendPhoto', {'chat_id': 2}, None)
+    assert not metrics.METRICS.bot_api_throttled, (
+        'Запросы без ожидания не должны считаться задержанными.'
+    )
+
+    await limiter.process_request(callback, (), {}, 'sendMessage', {'chat_id': 1}, None)
+    assert metrics.METRICS.bot_api_throttled == {'sendMessage': 1}
+    assert metrics.METRICS.bot_api_throttle_wait.count == 3
+
+
+@pytest.mark.asyncio
+async def test_retry_after():
+    metrics.METRICS.clear()
+    limiter = rate_limiter.TokenBucketRateLimiter(max_retries=1)
+    attempts = []
+
+    async def flaky():
+        attempts.append(time.monotonic())
+        if len(attempts) == 1:
+            raise RetryAfter(0)
+        return True
+
+    result = await limiter.process_request(
+        flaky, (), {}, 'sendMessage', {'chat_id': 1}, None
+    )
+    assert result is True
+    assert len(attempts) == 2
+    assert metrics.METRICS.bot_api_retries['sendMessage'] == 1
+    assert metrics.METRICS.bot_api_latency['sendMessage'].count == 1
+
+    async def flood():
+        raise RetryAfter(0)
+
+    with pytest.raises(RetryAfter):
+        await limiter.process_request(
+            flood, (), {}, 'editMessageText', {'chat_id': 2}, None
+        )
+    assert metrics.METRICS.bot_api_retries['editMessageText'] == 2
+
+
+@pytest.mark.asyncio
+async def test_pause_without_chat_id():
+    metrics.METRICS.clear()
+    limiter = rate_limiter.TokenBucketRateLimiter()
+    limiter._paused_until = time.monotonic() + 0.05
+
+    async def callback():
+        return time.monotonic()
+
+    sent_at = await limiter.process_request(
+        callback, (), {}, 'answerInlineQuery', {}, None
+    )
+    assert sent_at >= limiter._paused_until, (
+        'Пауза после 429 действует и на запросы без chat_id.'
+    )
+    assert metrics.METRICS.bot_api_throttled == {'answerInlineQuery': 1}
@@ -1,9 +1,38 @@
-from app.stations import get_stations_dict
+import pytest
 
+from app import keyboards
+from app.stations import (
+    find_stations,
+    get_stations_dict,
+    load_stations_dict,
+    set_stations_dict,
+)
 
-def test_get_stations_dict(init_db):
-    stations_dict = get_stations_dict()
+
+@pytest.mark.asyncio
+async def test_load_stations_dict(populate_db):
+    stations_dict = await load_stations_dict()
+    assert stations_dict is get_stations_dict()
     assert type(stations_dict) == dict
     assert len(stations_dict) == 9
     assert all(type(key) == int for key in stations_dict.keys())
     assert all(type(value) == str for value in stations_dict.values())
+
+
+def test_build_keyboards():
+    keyboards.build_keyboards({1: 'Космонавтов', 2: 'Уралмаш', 9: 'Ботаническая'})
+    assert len(keyboards.STATIONS_KEYBOARD) == 3
+    assert keyboards.END_STATION_DIRECTION == {1: 9, 9: 1}
+    buttons = keyboards.DIRECTION_KEYBOARD[0]
+    assert [button.text for button in buttons] == ['Космонавтов', 'Ботаническая']
+
+
+def test_find_stations(monkeypatch):
+    monkeypatch.setattr('app.stations._stations_dict', {})
+    set_stations_dict(
+        {1: 'Космонавтов', 7: 'Геологическая', 8: 'Чкаловская', 9: 'Ботаническая'}
+    )
+    assert find_stations('ЧКАЛОВ') == [8]
+    assert find_stations('ческая') == [7, 9]
+    assert find_stations('') == [1, 7, 8, 9]
+    assert find_stations('Динамо') == []
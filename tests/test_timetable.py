@@ -0,0 +1,139 @@
+import bisect
+import datetime as dt
+
+import numpy as np
+import pytest
+
+from app import timetable
+
+ROWS = [
+    (1, 9, False, dt.time(23, 50)),
+    (1, 9, False, dt.time(6, 0)),
+    (1, 9, False, dt.time(0, 10)),
+    (1, 9, False, dt.time(6, 10)),
+    (1, 9, False, dt.time(7, 30)),
+    (1, 9, True, dt.time(6, 5)),
+]
+
+
+@pytest.fixture(params=[timetable.Timetable, timetable.HeadwayTimetable])
+def simple_timetable(request):
+    return request.param.from_rows(ROWS)
+
+
+def test_from_rows(simple_timetable):
+    assert len(simple_timetable) == len(ROWS)
+    departures = list(simple_timetable.routes[(1, 9, False)])
+    assert departures == sorted(departures), (
+        'Время отправления должно быть отсортировано.'
+    )
+    assert departures[-1] == timetable.SECONDS_IN_DAY + 600, (
+        'Поезд после полуночи относится к предыдущим суткам.'
+    )
+
+
+@pytest.mark.parametrize(
+    'now, is_weekend, expected',
+    [
+        (
+            dt.datetime(2023, 5, 29, 5, 59, 30),
+            False,
+            [dt.timedelta(seconds=30), dt.timedelta(minutes=10, seconds=30)],
+        ),
+        (
+            dt.datetime(2023, 5, 29, 6, 0, 0),
+            False,
+            [dt.timedelta(0), dt.timedelta(minutes=10)],
+        ),
+        (dt.datetime(2023, 5, 29, 6, 45, 0), False, [dt.timedelta(minutes=45)]),
+        (dt.datetime(2023, 5, 29, 6, 15, 0), False, []),
+        (
+            dt.datetime(2023, 5, 29, 23, 45, 0),
+            False,
+            [dt.timedelta(minutes=5), dt.timedelta(minutes=25)],
+        ),
+        (dt.datetime(2023, 5, 30, 0, 5, 0), False, [dt.timedelta(minutes=5)]),
+        (dt.datetime(2023, 5, 27, 6, 0, 0), True, [dt.timedelta(minutes=5)]),
+    ]
+)
+def test_next_trains(simple_timetable, now, is_weekend, expected):
+    assert simple_timetable.next_trains(1, 9, is_weekend, now=now) == expected
+
+
+@pytest.mark.parametrize(
+    'now',
+    [
+        dt.datetime(2023, 5, 29, 5, 59, 30),
+        dt.datetime(2023, 5, 29, 6, 15, 0),
+        dt.datetime(2023, 5, 29, 23, 45, 0),
+        dt.datetime(2023, 5, 30, 0, 5, 0),
+    ]
+)
+def test_next_trains_batch(simple_timetable, now):
+    routes = [(1, 9), (9, 1), (1, 9)]
+    waiting_times = simple_timetable.next_trains_batch(routes, False, now=now)
+
+    assert waiting_times.shape == (len(routes), 2)
+    for (from_station_id, to_station_id), row in zip(routes, waiting_times):
+        expected = simple_timetable.next_trains(
+            from_station_id, to_station_id, False, now=now
+        )
+        times = [dt.timedelta(seconds=seconds) for seconds in row[~np.isnan(row)]]
+        assert times == expected
+
+
+@pytest.mark.asyncio
+async def test_load_timetable(populate_db):
+    loaded_timetable = await timetable.load_timetable()
+
+    assert timetable.get_timetable() is loaded_timetable
+    assert len(loaded_timetable) == 4584, 'В расписании должно быть 4584 отправления.'
+    assert len(loaded_timetable.routes) == 32, 'В расписании должно быть 32 маршрута.'
+
+
+def test_headway_route():
+    # Равномерные интервалы по 4 минуты, одиночное отправление и чередование 8 и 7 минут
+    departures = [0, 240, 480, 720, 960, 1500, 2000, 2480, 2900, 3380, 3800, 4280]
+    route = timetable.HeadwayRoute.from_departures(departures)
+
+    segments = zip(route.starts, route.ends, route.headways, route.alternate_headways)
+    assert list(segments) == [
+        (0, 960, 240, 240),
+        (2000, 4280, 480, 420),
+    ]
+    assert list(route.exceptions) == [1500]
+    assert list(route) == departures
+    assert len(route) == len(departures)
+    for value in range(-10, 4300, 10):
+        start = bisect.bisect_left(departures, value)
+        assert route.next_departures(value, 3) == departures[start:start + 3]
+        after = start + (value in departures)
+        assert route.next_departures(value + 0.5, 2) == departures[after:after + 2]
+
+
+def test_headway_timetable(schedules):
+    rows = [
+        (
+            schedule.from_station_id,
+            schedule.to_station_id,
+            schedule.is_weekend,
+            schedule.departure_time,
+        )
+        for schedule in schedules
+    ]
+    dense = timetable.Timetable.from_rows(rows)
+    compressed = timetable.HeadwayTimetable.from_rows(rows)
+
+    assert compressed.nbytes < dense.departures_matrix.nbytes, (
+        'Сжатое расписание должно занимать меньше памяти.'
+    )
+    for now in (dt.datetime(2023, 5, 29, 12, 3, 17), dt.datetime(2023, 5, 27, 23, 50)):
+        for key in dense.routes:
+            expected = dense.next_trains(*key, now=now)
+            assert compressed.next_trains(*key, now=now) == expected
+        routes = [key[:2] for key in dense.routes]
+        assert np.array_equal(
+            compressed.next_trains_batch(routes, False, now),
+            dense.next_trains_batch(routes, False, now),
+            equal_nan=True,
+        )
@@ -0,0 +1,104 @@
+import datetime as dt
+from pathlib import PurePath
+
+import numpy as np
+import pytest
+
+from app import bootstrap, db, stations, timetable, timetable_artifact
+from app.config import settings
+from tests.test_timetable import ROWS
+
+STATIONS_DICT = {1: 'Космонавтов', 9: 'Ботаническая'}
+
+
+@pytest.fixture
+def artifact_path(tmp_path):
+    path = tmp_path / 'timetable.bin'
+    timetable_artifact.write(path, ROWS, STATIONS_DICT)
+    return path
+
+
+@pytest.mark.parametrize(
+    'now',
+    [
+        dt.datetime(2023, 5, 29, 5, 59, 30),
+        dt.datetime(2023, 5, 29, 6, 15, 0),
+        dt.datetime(2023, 5, 29, 23, 45, 0),
+        dt.datetime(2023, 5, 30, 0, 5, 0),
+    ]
+)
+def test_load(artifact_path, now):
+    artifact = timetable_artifact.load(artifact_path)
+    expected_timetable = timetable.Timetable.from_rows(ROWS)
+    assert 'departures_matrix' not in vars(artifact.timetable), (
+        'Матрица отправлений не должна строиться до пакетного запроса.'
+    )
+
+    assert artifact.stations_dict == STATIONS_DICT
+    assert artifact.checksum == timetable_artifact.get_checksum(ROWS)
+    assert len(artifact.timetable) == len(ROWS)
+    for is_weekend in (False, True):
+        assert artifact.timetable.next_trains(1, 9, is_weekend, now=now) == (
+            expected_timetable.next_trains(1, 9, is_weekend, now=now)
+        )
+    np.testing.assert_array_equal(
+        artifact.timetable.next_trains_batch([(1, 9), (9, 1)], False, now=now),
+        expected_timetable.next_trains_batch([(1, 9), (9, 1)], False, now=now),
+    )
+
+
+def test_load_invalid(artifact_path, monkeypatch):
+    content = bytearray(artifact_path.read_bytes())
+    content[-1] ^= 0xFF
+    artifact_path.write_bytes(content)
+    with pytest.raises(timetable_artifact.ArtifactError, match='поврежден'):
+        timetable_artifact.load(artifact_path)
+
+    timetable_artifact.write(artifact_path, ROWS, STATIONS_DICT)
+    monkeypatch.setattr(settings, 'OPEN_TIME_METRO', dt.time(5, 0))
+    with pytest.raises(timetable_artifact.ArtifactError, match='OPEN_TIME_METRO'):
+        timetable_artifact.load(artifact_path)
+
+    with pytest.raises(timetable_artifact.ArtifactError, match='кратно минуте'):
+        timetable_artifact.build([(1, 9, False, dt.time(6, 0, 30))], STATIONS_DICT)
+
+
+@pytest.mark.asyncio
+async def test_load_checked_version(artifact_path):
+    timetable_artifact.write(artifact_path, ROWS, STATIONS_DICT, version_id=5)
+
+    artifact = await timetable_artifact.load_checked(artifact_path, 5)
+    assert artifact.version_id == 5
+    with pytest.raises(timetable_artifact.ArtifactError, match='активна версия 6'):
+        await timetable_artifact.load_checked(artifact_path, 6)
+    with pytest.raises(timetable_artifact.ArtifactError, match='активна версия None'):
+        await timetable_artifact.load_checked(artifact_path, None)
+
+
+@pytest.mark.asyncio
+async def test_checksum_and_bootstrap(populate_db, tmp_path, monkeypatch):
+    sql_file = PurePath.joinpath(settings.BASE_DIR, 'data', 'populate_db.sql')
+    with open(sql_file, encoding='utf-8') as f:
+        stations_dict, rows = timetable_artifact.parse_populate_sql(f.read())
+    db_rows = [tuple(row) for row in await db.select_timetable()]
+
+    assert len(rows) == len(db_rows)
+    assert timetable_artifact.get_checksum(rows) == await db.select_schedule_checksum()
+
+    path = tmp_path / 'timetable.bin'
+    timetable_artifact.write(path, rows, stations_dict)
+    monkeypatch.setattr(settings, 'TIMETABLE_ARTIFACT', path)
+    timings = await bootstrap.bootstrap()
+    assert 'artifact' in timings and 'timetable' not in timings
+    assert stations.get_stations_dict() == stations_dict
+    assert len(timetable.get_timetable()) == len(rows)
+
+    timetable_artifact.write(path, rows[1:], stations_dict)
+    timings = await bootstrap.bootstrap()
+    assert 'timetable' in timings, (
+        'Без активной версии расписание в БД проверяется всегда.'
+    )
+    assert len(timetable.get_timetable()) == len(rows)
+
+    with pytest.raises(timetable_artifact.ArtifactError, match='устарел'):
+        await timetable_artifact.load_checked(path, None, check_db=False)
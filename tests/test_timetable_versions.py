@@ -0,0 +1,77 @@
+import datetime as dt
+from pathlib import PurePath
+
+import pytest
+
+from app import (
+    cache,
+    db,
+    keyboards,
+    stations,
+    timetable,
+    timetable_artifact,
+    timetable_versions,
+)
+from app.config import settings
+from tests.test_timetable import ROWS
+
+STATIONS_DICT = {1: 'Космонавтов', 9: 'Ботаническая'}
+
+
+def test_validate():
+    assert timetable_versions.validate(STATIONS_DICT, ROWS) == []
+
+    errors = timetable_versions.validate(
+        {**STATIONS_DICT, 2: 'Космонавтов'},
+        [*ROWS, ROWS[0], (1, 5, False, dt.time(6, 0)), (9, 9, True, dt.time(6, 0))],
+    )
+    assert errors == [
+        'Повторяющиеся названия станций: Космонавтов',
+        'Неизвестные станции в расписании: [5]',
+        'Совпадают станции отправления и назначения: [(9, 9)]',
+        'Повторяющихся отправлений: 1',
+        'Маршруты без расписания на будни или выходные: [(1, 5), (9, 9)]',
+    ]
+
+
+@pytest.mark.asyncio
+async def test_stage_promote_reload(populate_db):
+    sql_file = PurePath.joinpath(settings.BASE_DIR, 'data', 'populate_db.sql')
+    with open(sql_file, encoding='utf-8') as f:
+        stations_dict, rows = timetable_artifact.parse_populate_sql(f.read())
+    await timetable_versions.RELOADER.reload()
+    initial_version = timetable_versions.RELOADER.version
+
+    invalid_rows = [*rows, (1, 99, False, dt.time(6))]
+    version_id, errors = await timetable_versions.stage(
+        'invalid', stations_dict, invalid_rows
+    )
+    assert errors
+    with pytest.raises(ValueError, match='invalid'):
+        await db.promote_timetable_version(version_id)
+    assert await db.select_active_timetable_version() == initial_version
+
+    new_stations_dict = {**stations_dict, 1: 'Проспект Космонавтов'}
+    new_rows = [row for row in rows if row[3] < dt.time(23)]
+    version_id, errors = await timetable_versions.stage(
+        'new', new_stations_dict, new_rows
+    )
+    assert errors == []
+    await cache.SCHEDULE_CACHE.select_schedule(1, 9)
+    await db.promote_timetable_version(version_id)
+
+    assert await db.select_active_timetable_version() == version_id
+    assert len(await db.select_timetable()) == len(new_rows)
+    assert await timetable_versions.RELOADER.reload() is True
+    assert timetable_versions.RELOADER.version == version_id
+    assert stations.get_stations_dict() == new_stations_dict
+    assert len(timetable.get_timetable()) == len(new_rows)
+    assert keyboards.STATIONS_KEYBOARD[0][0].text == 'Проспект Космонавтов'
+    assert not cache.SCHEDULE_CACHE._entries
+    assert await timetable_versions.RELOADER.reload() is False
+
+    version_id, errors = await timetable_versions.stage('restore', stations_dict, rows)
+    await db.promote_timetable_version(version_id)
+    assert await timetable_versions.RELOADER.reload() is True
+    assert stations.get_stations_dict() == stations_dict
+    assert len(timetable.get_timetable()) == len(rows)
@@ -0,0 +1,103 @@
+import datetime as dt
+from pathlib import PurePath
+
+import pytest
+
+from app import handlers, messages, stations, timetable_artifact, trips
+from app.config import settings
+from app.timetable import HeadwayTimetable, Timetable
+
+
+@pytest.fixture(scope='module')
+def planner():
+    sql_file = PurePath.joinpath(settings.BASE_DIR, 'data', 'populate_db.sql')
+    with open(sql_file, encoding='utf-8') as f:
+        _, rows = timetable_artifact.parse_populate_sql(f.read())
+    return trips.TripPlanner(Timetable.from_rows(rows))
+
+
+def make_line(stations_ids, start_minutes, headway=10, hop=2, count=6):
+    """Строит расписание линии в обоих направлениях с постоянным временем перегона."""
+    rows = []
+    for line in (stations_ids, stations_ids[::-1]):
+        for train in range(count):
+            for position, station_id in enumerate(line[:-1]):
+                minutes = start_minutes + train * headway + position * hop
+                for is_weekend in (False, True):
+                    departure_time = dt.time(minutes // 60, minutes % 60)
+                    rows.append((station_id, line[-1], is_weekend, departure_time))
+    return rows
+
+
+def test_lines(planner):
+    assert planner.lines == {9: list(range(1, 10)), 1: list(range(9, 0, -1))}
+    assert planner.get_travel_time(1, 2) == planner.get_travel_time(2, 1) == 2 * 60
+    assert planner.get_travel_time(1, 9) == sum(
+        planner.get_travel_time(station_id, station_id + 1)
+        for station_id in range(1, 9)
+    ), 'Время в пути должно складываться из времени перегонов.'
+    assert planner.get_travel_time(1, 100) == float('inf')
+
+
+def test_plan(planner):
+    now = dt.datetime(2023, 5, 29, 12, 0)
+    trip_options = planner.plan(1, 5, False, now)
+
+    assert len(trip_options) == settings.LIMIT_ROW
+    assert trip_options[0].departure_at == dt.datetime(2023, 5, 29, 12, 5)
+    travel_time = dt.timedelta(seconds=planner.get_travel_time(1, 5))
+    assert trip_options[0].arrival_at - trip_options[0].departure_at == travel_time
+    # Поезд прибывает на станцию назначения к своему отправлению с нее
+    arrival_at = trip_options[0].arrival_at
+    departures = planner.plan(
+        5, 9, False, arrival_at - dt.timedelta(seconds=30), limit=1
+    )
+    assert abs(departures[0].departure_at - arrival_at) <= dt.timedelta(minutes=1)
+
+    night = dt.datetime(2023, 5, 29, 2, 0)
+    assert planner.plan(1, 5, False, night) == [], 'Ночью поездов нет.'
+    assert planner.plan(5, 5, False, now) == []
+
+
+def test_plan_transfer():
+    # Две линии с пересадкой на станции 3: 1-2-3-4 и 5-3-6
+    rows = [
+        *make_line([1, 2, 3, 4], start_minutes=6 * 60),
+        *make_line([5, 3, 6], start_minutes=6 * 60 + 1, hop=3),
+    ]
+    planner = trips.TripPlanner(Timetable.from_rows(rows))
+
+    assert [leg.direction_id for leg in planner.legs[(1, 4)]] == [4], (
+        'Поездка по одной линии без пересадок.'
+    )
+    assert [
+        (leg.from_station_id, leg.to_station_id, leg.direction_id)
+        for leg in planner.legs[(1, 6)]
+    ] == [
+        (1, 3, 4),
+        (3, 6, 6),
+    ]
+    assert planner.get_travel_time(1, 6) == (2 + 2 + 3) * 60
+
+    trip_options = planner.plan(1, 6, False, dt.datetime(2023, 5, 29, 6, 0))
+    # Поезд от станции 1 в 06:00 прибывает на станцию 3 в 06:04 и успевает на поезд
+    # до станции 6 в 06:04
+    assert trip_options[0].departure_at == dt.datetime(2023, 5, 29, 6, 0)
+    assert trip_options[0].arrival_at == dt.datetime(2023, 5, 29, 6, 7)
+    assert trip_options[0].transfer_station_ids == (3,)
+    compressed_planner = trips.TripPlanner(HeadwayTimetable.from_rows(rows))
+    assert compressed_planner.plan(1, 6, False, dt.datetime(2023, 5, 29, 6, 0)) == (
+        trip_options
+    ), 'Планировщик по сжатому расписанию должен давать те же варианты.'
+
+
+@pytest.mark.asyncio
+async def test_get_text_with_trip(planner, monkeypatch):
+    monkeypatch.setattr(trips, '_planner', planner)
+    stations_dict = {station_id: f'Станция {station_id}' for station_id in range(1, 10)}
+    monkeypatch.setattr(stations, '_stations_dict', stations_dict)
+
+    text = await handlers.get_text_with_trip(1, 5)
+    assert text.startswith('<b>Станция 1 ➡ Станция 5</b>, в пути около 9 мин')
+    assert await handlers.get_text_with_trip(1, 1) == messages.TRIP_SAME_STATION
+    assert await handlers.get_text_with_trip(1, 100) == messages.TRIP_UNAVAILABLE
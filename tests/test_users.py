@@ -0,0 +1,85 @@
+import pytest
+from sqlalchemy import delete
+from telegram import User
+
+from app import models, users
+from tests.fixtures.bot_users import get_bot_users
+from tests.fixtures.db import sync_session
+
+
+def get_bot_user_ids():
+    return {bot_user.bot_user_id for bot_user in get_bot_users()}
+
+
+@pytest.mark.asyncio
+async def test_users_buffer_flush():
+    users_buffer = users.UsersBuffer(maxsize=10)
+    telegram_users = [
+        User(id=1000 + i, first_name=f'User {i}', is_bot=False) for i in range(3)
+    ]
+
+    for telegram_user in telegram_users + telegram_users:
+        users_buffer.add(telegram_user)
+    assert len(users_buffer) == 3, (
+        'Повторные пользователи не должны дублироваться в буфере.'
+    )
+    assert not get_bot_user_ids() & {1000, 1001, 1002}
+
+    await users_buffer.flush()
+    assert len(users_buffer) == 0
+    assert get_bot_user_ids() >= {1000, 1001, 1002}
+
+    users_buffer.add(telegram_users[0])
+    assert len(users_buffer) == 0, 'Известный пользователь не должен попадать в буфер.'
+
+
+@pytest.mark.asyncio
+async def test_users_buffer_ensure_and_warm_up():
+    users_buffer = users.UsersBuffer(maxsize=10)
+    telegram_user = User(id=2000, first_name='User', is_bot=False)
+
+    users_buffer.add(telegram_user)
+    await users_buffer.ensure(telegram_user)
+    assert len(users_buffer) == 0
+    assert 2000 in get_bot_user_ids()
+
+    warmed_users_buffer = users.UsersBuffer(maxsize=10)
+    await warmed_users_buffer.warm_up()
+    assert 2000 in warmed_users_buffer.known_users
+
+
+@pytest.mark.asyncio
+async def test_users_buffer_flush_many_users():
+    users_buffer = users.UsersBuffer(maxsize=10, max_pending=10_000)
+    telegram_user_ids = set(range(100_000, 107_000))
+    for telegram_user_id in telegram_user_ids:
+        users_buffer.add(User(id=telegram_user_id, first_name='User', is_bot=False))
+
+    await users_buffer.flush()
+    assert len(users_buffer) == 0
+    assert get_bot_user_ids() >= telegram_user_ids, (
+        'Все пользователи должны быть записаны частями.'
+    )
+
+    with sync_session() as session:
+        statement = delete(models.BotUser).where(
+            models.BotUser.bot_user_id.in_(telegram_user_ids)
+        )
+        session.execute(statement)
+        session.commit()
+
+
+@pytest.mark.asyncio
+async def test_users_buffer_flush_error(monkeypatch):
+    async def fail_insert_users(*args):
+        raise ConnectionError
+
+    monkeypatch.setattr(users.db, 'insert_users', fail_insert_users)
+    users_buffer = users.UsersBuffer(maxsize=10, max_pending=3)
+    for telegram_user_id in range(3000, 3005):
+        users_buffer.add(User(id=telegram_user_id, first_name='User', is_bot=False))
+    assert len(users_buffer) == 3, 'Размер буфера не должен превышать max_pending.'
+
+    with pytest.raises(ConnectionError):
+        await users_buffer.flush()
+    assert len(users_buffer) == 3, 'После ошибки пользователи должны вернуться в буфер.'
@@ -35,3 +35,57 @@ async def test_metro_is_closed(time, expected):
     current_dt = dt.datetime.now()
     with freezegun.freeze_time(current_dt.replace(hour=time.hour, minute=time.minute, second=time.second)):
         assert await utils.metro_is_closed() == expected
+
+
+@pytest.mark.parametrize(
+    'departure_time, now, expected',
+    [
+        (dt.time(12, 5), dt.datetime(2023, 5, 29, 12, 0, 0), dt.timedelta(minutes=5)),
+        (
+            dt.time(0, 2),
+            dt.datetime(2023, 5, 29, 23, 58, 30),
+            dt.timedelta(minutes=3, seconds=30),
+        ),
+    ]
+)
+def test_get_time_to_train(departure_time, now, expected):
+    assert utils.get_time_to_train(departure_time, now) == expected
+
+
+@pytest.mark.parametrize(
+    'now, expected',
+    [
+        (dt.datetime(2023, 5, 29, 12, 0, 0), [(dt.time(12, 0), dt.time(12, 20))]),
+        (
+            dt.datetime(2023, 5, 29, 23, 50, 0),
+            [(dt.time(23, 50), dt.time.max), (dt.time.min, dt.time(0, 10))],
+        ),
+    ]
+)
+def test_get_departure_ranges(now, expected, monkeypatch):
+    monkeypatch.setattr(utils.settings, 'MAX_WAITING_TIME', 20)
+    assert utils.get_departure_ranges(now) == expected
+
+
+def test_lru_cache():
+    cache = utils.LRUCache(maxsize=2)
+    cache.set('a', 1)
+    cache.set('b', 2)
+    assert cache.get('a') == 1
+    cache.set('c', 3)
+
+    assert 'b' not in cache, 'Давно не использованная запись должна быть вытеснена.'
+    assert cache.get('b') is None
+    assert cache.get('c') == 3
+    assert cache.hit_ratio == 2 / 3
+
+
+def test_lru_cache_ttl():
+    cache = utils.LRUCache(maxsize=2, ttl=60)
+    with freezegun.freeze_time(dt.datetime(2023, 5, 29, 12, 0, 0)) as frozen_time:
+        cache.set('a', 1)
+        frozen_time.tick(59)
+        assert cache.get('a') == 1
+        frozen_time.tick(1)
+        assert 'a' not in cache, 'Устаревшая запись не должна считаться сохраненной.'
+        assert cache.get('a') is None, 'Запись должна устареть через ttl секунд.'